@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from comments.models import Comment, CommentReaction, CommentTally
+
+
+def count_per_comment(model, field, **filters):
+    """
+    Returns a correlated subquery counting the `model` rows whose `field`
+    is each comment.
+    """
+    counts = model.objects.filter(
+        **{field: OuterRef('pk')}, **filters
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts), 0)
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the stored `likes_count`, `dislikes_count` and
+    `replies_count` of every comment from the CommentReaction and Comment
+    tables, and drops the reaction tallies they replace, including those
+    of deleted comments.
+
+    Comments are updated in primary key batches, each in its own
+    transaction, so the rebuild never holds locks on the whole table.
+    Their tallies are locked first, so reactions being counted finish
+    before the recount reads them.
+    """
+    help = 'Rebuild the stored reaction and reply counters on comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of comments to update per transaction.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        comment_ids = Comment.objects.order_by('pk').values_list(
+            'pk', flat=True
+        )
+        last_id = 0
+        updated = 0
+        while True:
+            batch = list(comment_ids.filter(pk__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                tallies = CommentTally.objects.filter(
+                    comment_id__gte=batch[0], comment_id__lte=batch[-1]
+                )
+                list(tallies.select_for_update().values_list('pk'))
+                tallies.delete()
+                updated += Comment.objects.filter(
+                    pk__gte=batch[0], pk__lte=batch[-1]
+                ).update(
+                    likes_count=count_per_comment(
+                        CommentReaction, 'comment', kind=CommentReaction.LIKE
+                    ),
+                    dislikes_count=count_per_comment(
+                        CommentReaction, 'comment',
+                        kind=CommentReaction.DISLIKE,
+                    ),
+                    replies_count=count_per_comment(Comment, 'parent'),
+                )
+            last_id = batch[-1]
+        orphans, _ = CommentTally.objects.exclude(
+            comment_id__in=Comment.objects.values('pk')
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt counters for {updated} comments and dropped '
+            f'{orphans} tallies of deleted comments.'
+        ))
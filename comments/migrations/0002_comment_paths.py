@@ -0,0 +1,70 @@
+# Generated by Django 3.2.4 on 2026-10-17 03:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+PATH_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def path_segment(comment_id):
+    # Frozen copy of comments.models.path_segment
+    segment = ''
+    while comment_id:
+        comment_id, digit = divmod(comment_id, len(PATH_DIGITS))
+        segment = PATH_DIGITS[digit] + segment
+    return segment.rjust(7, '0')
+
+
+def populate_paths(apps, schema_editor):
+    Comment = apps.get_model('comments', 'Comment')
+    # Parents are created before their replies, so in id order every
+    # parent's path is known by the time its replies are reached
+    paths = {}
+    batch = []
+    rows = Comment.objects.order_by('pk').only('pk', 'parent_id')
+    for comment in rows.iterator():
+        parent_path = paths.get(comment.parent_id, '')
+        comment.path = parent_path + path_segment(comment.pk)
+        comment.depth = len(parent_path) // 7
+        paths[comment.pk] = comment.path
+        batch.append(comment)
+        if len(batch) == 1000:
+            Comment.objects.bulk_update(batch, ['path', 'depth'])
+            batch = []
+    Comment.objects.bulk_update(batch, ['path', 'depth'])
+
+    replies = Comment.objects.filter(
+        parent=OuterRef('pk')
+    ).order_by().values('parent').annotate(total=Count('pk')).values('total')
+    Comment.objects.update(replies_count=Coalesce(Subquery(replies), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='replies_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_post_path_idx'),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,47 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
 from django.contrib.auth.models import User
-from posts.models import Post
+from posts.models import Post, adjust_post_counter
+
+
+# Materialized paths are made of one fixed-width base-36 segment per
+# level, so they sort depth-first, in creation order among siblings, with
+# only digits and lowercase letters under any collation.
+PATH_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+PATH_SEGMENT_LENGTH = 7
+
+
+def path_segment(comment_id):
+    """
+    Returns the fixed-width base-36 path segment of a comment id.
+    """
+    segment = ''
+    while comment_id:
+        comment_id, digit = divmod(comment_id, len(PATH_DIGITS))
+        segment = PATH_DIGITS[digit] + segment
+    return segment.rjust(PATH_SEGMENT_LENGTH, '0')
+
+
+def subtree_end(path):
+    """
+    Returns the smallest path sorting after `path` and every path below
+    it, the exclusive upper bound of its subtree.
+    """
+    prefix = path.rstrip(PATH_DIGITS[-1])
+    return prefix[:-1] + PATH_DIGITS[PATH_DIGITS.index(prefix[-1]) + 1]
 
 
 class Comment(models.Model):
     """
         Represents a comment on a post, with likes, and dislikes.
         Each comment is linked to a user and a post.
+
+        Replies form threads through `parent`. Each comment also stores
+        its materialized `path`, the path segments of its ancestors and
+        itself, and its `depth`, so a whole thread is one range scan over
+        the `(post, path)` index. `replies_count` counts direct replies.
     """
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
@@ -19,9 +54,124 @@ class Comment(models.Model):
         on_delete=models.CASCADE, related_name='replies')
     likes_count = models.PositiveIntegerField(default=0)
     dislikes_count = models.PositiveIntegerField(default=0)
+    path = models.CharField(max_length=255, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    replies_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['post', 'path'], name='comment_post_path_idx'
+            ),
+            models.Index(
+                fields=['post', 'created_at', 'id'],
+                name='comment_post_created_id_idx',
+            ),
+            models.Index(
+                fields=['created_at'], name='comment_created_at_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.description[:50]
+
+
+def increment_post_comments_count(sender, instance, created, **kwargs):
+    """
+    Signal handler that increments the post's `comments_count`
+    when a new Comment is created.
+    """
+    if created:
+        adjust_post_counter(instance.post_id, 'comments_count', 1)
+
+
+def decrement_post_comments_count(sender, instance, **kwargs):
+    """
+    Signal handler that decrements the post's `comments_count`
+    when a Comment is deleted, including cascaded deletes.
+    """
+    adjust_post_counter(instance.post_id, 'comments_count', -1)
+
+
+def set_comment_path(sender, instance, created, **kwargs):
+    """
+    Signal handler that stores the materialized path and depth of a new
+    Comment, once its id is known, and counts it as a reply of its parent.
+    """
+    if not created:
+        return
+    parent_path, depth = '', 0
+    if instance.parent_id:
+        parent = instance.parent
+        parent_path, depth = parent.path, parent.depth + 1
+        Comment.objects.filter(pk=instance.parent_id).update(
+            replies_count=F('replies_count') + 1
+        )
+    instance.path = parent_path + path_segment(instance.pk)
+    instance.depth = depth
+    Comment.objects.filter(pk=instance.pk).update(
+        path=instance.path, depth=depth
+    )
+
+
+def decrement_parent_replies_count(sender, instance, **kwargs):
+    """
+    Signal handler that decrements the parent's `replies_count` when a
+    reply is deleted.
+    """
+    if instance.parent_id:
+        Comment.objects.filter(pk=instance.parent_id).update(
+            replies_count=Greatest(F('replies_count') - 1, 0)
+        )
+
+
+post_save.connect(increment_post_comments_count, sender=Comment)
+post_delete.connect(decrement_post_comments_count, sender=Comment)
+post_save.connect(set_comment_path, sender=Comment)
+post_delete.connect(decrement_parent_replies_count, sender=Comment)
+
+
+class CommentReaction(models.Model):
+    """
+    A like or dislike of a comment. Each user has at most one reaction
+    per comment; switching from one kind to the other replaces it.
+
+    Reactions are counted into `CommentTally` shards rather than straight
+    into the comment's counters, see `comments.reactions`.
+    """
+    LIKE = 'like'
+    DISLIKE = 'dislike'
+    KIND_CHOICES = [(LIKE, 'Like'), (DISLIKE, 'Dislike')]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    comment = models.ForeignKey(
+        Comment, related_name='reactions', on_delete=models.CASCADE
+    )
+    kind = models.CharField(max_length=7, choices=KIND_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ['owner', 'comment']
+
+    def __str__(self):
+        return f'{self.owner} {self.kind}d "{self.comment}"'
+
+
+class CommentTally(models.Model):
+    """
+    One shard of the reactions of a comment not yet added to its
+    `likes_count` and `dislikes_count`. The amounts are deltas and may be
+    negative.
+    """
+    # Not a foreign key: reactions deleted along with their comment are
+    # still taken out of its tally, which the comment's deletion must not
+    # trip over. Shards of deleted comments are dropped on rebuild.
+    comment_id = models.BigIntegerField()
+    shard = models.PositiveSmallIntegerField()
+    likes = models.IntegerField(default=0)
+    dislikes = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['comment_id', 'shard']
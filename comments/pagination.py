@@ -0,0 +1,86 @@
+from collections import OrderedDict
+from django.db.models import F
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from drf_api.pagination import KeysetPagination
+
+
+class CommentStreamPagination(KeysetPagination):
+    """
+    Keyset pagination over the comments of a post, seeking on the
+    `(post, created_at, id)` index newest or oldest first.
+
+    Every page also links to `latest`, a `?since=` URL returning the
+    comments created after the newest one on the page, oldest first, so
+    clients can poll a post for new comments with one range query. Pages
+    of `?since=` continue with `next` while there are more new comments,
+    and their `latest` is the URL to poll next. `latest` is null while
+    there are no comments to poll from.
+    """
+    since_query_param = 'since'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.since_query_param not in request.query_params:
+            results = super().paginate_queryset(queryset, request, view)
+            if results is not None:
+                self.latest_position = max((
+                    [comment.created_at, comment.pk] for comment in results
+                ), default=None)
+            return results
+
+        self.page_size = self.get_page_size(request)
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.previous_position = None
+
+        queryset = queryset.order_by('created_at')
+        terms = self.get_terms(queryset)
+        queryset = queryset.annotate(
+            **{alias: F(field) for alias, field, *_ in terms}
+        )
+        position, _ = self.decode_position(
+            request.query_params[self.since_query_param], queryset, terms
+        )
+        results = list(
+            self.seek(queryset, terms, position)[:self.page_size + 1]
+        )
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        self.latest_position = position
+        if results:
+            self.latest_position = [results[-1].created_at, results[-1].pk]
+        self.next_position = self.latest_position if has_more else None
+        return results
+
+    def get_next_link(self):
+        if self.since_query_param not in self.request.query_params:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        return self.encode_since(self.next_position)
+
+    def get_latest_link(self):
+        if self.latest_position is None:
+            return None
+        return self.encode_since(self.latest_position)
+
+    def encode_since(self, position):
+        url = remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(
+            url, self.since_query_param, self.encode_position(position)
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('latest', self.get_latest_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['latest'] = {
+            'type': 'string', 'nullable': True,
+        }
+        return response_schema
@@ -0,0 +1,188 @@
+import random
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete, post_save
+from drf_api.cache import invalidate_dependents
+from .models import Comment, CommentReaction, CommentTally
+
+"""
+Comment likes and dislikes with contention-safe counters.
+
+Adding every reaction straight to `Comment.likes_count` would make all
+reactions to a popular comment queue on its row lock. Instead, the
+reaction is counted, in its own transaction, into one of
+`COMMENT_REACTIONS['SHARDS']` `CommentTally` rows of the comment picked
+at random, so concurrent reactions rarely wait on each other. After
+commit the shards are folded into the comment's counters by whichever
+request gets the comment's row lock first; the others skip folding
+rather than wait, so a burst of reactions becomes a few counter updates.
+
+Shards left unfolded at the end of a burst are picked up by the next
+reaction, and by the `rebuild_comment_counters` command, which also
+recounts the counters from the reactions to repair any drift.
+
+Functions:
+    toggle_reaction(user, comment, kind): Adds, switches or removes a
+        user's reaction.
+    add_to_tally(comment_id, kind, delta): Counts reactions into a shard.
+    fold_tallies(comment_id): Adds a comment's shards to its counters.
+    reaction_counts(comment_id): A comment's counters, shards included.
+    connect_signals(): Counts reactions as they are created and deleted.
+"""
+
+TALLY_FIELDS = {
+    CommentReaction.LIKE: 'likes',
+    CommentReaction.DISLIKE: 'dislikes',
+}
+
+
+def toggle_reaction(user, comment, kind):
+    """
+    Toggles `user`'s reaction of `kind` to `comment`: adds it, replaces
+    a reaction of the other kind with it, or removes it if it is there.
+    Both counters change in the same transaction.
+
+    Returns:
+        str: The user's reaction after the toggle, or None.
+    """
+    with transaction.atomic():
+        existing = CommentReaction.objects.select_for_update().filter(
+            owner=user, comment=comment
+        ).first()
+        if existing is not None:
+            existing.delete()
+            if existing.kind == kind:
+                return None
+        try:
+            with transaction.atomic():
+                CommentReaction.objects.create(
+                    owner=user, comment=comment, kind=kind
+                )
+        except IntegrityError:
+            # A concurrent request by the same user reacted first
+            return CommentReaction.objects.filter(
+                owner=user, comment=comment
+            ).values_list('kind', flat=True).first()
+    return kind
+
+
+def add_to_tally(comment_id, kind, delta):
+    """
+    Adds `delta` reactions of `kind` to a random shard of a comment's
+    tally, creating the shard if needed.
+    """
+    field = TALLY_FIELDS[kind]
+    shard = random.randrange(settings.COMMENT_REACTIONS['SHARDS'])
+    shards = CommentTally.objects.filter(comment_id=comment_id, shard=shard)
+    while not shards.update(**{field: F(field) + delta}):
+        try:
+            with transaction.atomic():
+                CommentTally.objects.create(
+                    comment_id=comment_id, shard=shard, **{field: delta}
+                )
+            return
+        except IntegrityError:
+            # Created by a concurrent reaction since the update
+            continue
+
+
+def fold_tallies(comment_id):
+    """
+    Adds the shards of a comment's tally to its `likes_count` and
+    `dislikes_count` and resets them.
+
+    Shards still being written and comments another request is folding
+    are skipped instead of waited for.
+
+    Returns:
+        bool: True if the counters changed.
+    """
+    with transaction.atomic():
+        # FOR NO KEY UPDATE, so reactions inserted meanwhile, which take
+        # FOR KEY SHARE on the comment through their foreign key, do not
+        # wait for the fold
+        locked = Comment.objects.select_for_update(
+            no_key=True, skip_locked=True
+        ).filter(pk=comment_id).values_list('pk', flat=True)
+        if not list(locked):
+            return False
+        shards = list(
+            CommentTally.objects.select_for_update(skip_locked=True).filter(
+                comment_id=comment_id
+            ).exclude(likes=0, dislikes=0)
+        )
+        if not shards:
+            return False
+        likes = sum(shard.likes for shard in shards)
+        dislikes = sum(shard.dislikes for shard in shards)
+        CommentTally.objects.filter(
+            pk__in=[shard.pk for shard in shards]
+        ).update(likes=0, dislikes=0)
+        Comment.objects.filter(pk=comment_id).update(
+            likes_count=Greatest(F('likes_count') + likes, 0),
+            dislikes_count=Greatest(F('dislikes_count') + dislikes, 0),
+        )
+    invalidate_dependents(Comment)
+    return True
+
+
+def pending(field):
+    """
+    Returns a correlated subquery summing the unfolded `field` of the
+    shards of each comment.
+    """
+    totals = CommentTally.objects.filter(
+        comment_id=OuterRef('pk')
+    ).order_by().values('comment_id').annotate(total=Sum(field)).values(
+        'total'
+    )
+    return Coalesce(Subquery(totals), 0)
+
+
+def reaction_counts(comment_id):
+    """
+    Returns a comment's `likes_count` and `dislikes_count` including the
+    shards not folded in yet, or None if the comment does not exist.
+    """
+    counts = Comment.objects.filter(pk=comment_id).annotate(
+        pending_likes=pending('likes'),
+        pending_dislikes=pending('dislikes'),
+    ).values(
+        'likes_count', 'dislikes_count', 'pending_likes', 'pending_dislikes'
+    ).first()
+    if counts is None:
+        return None
+    return {
+        'likes_count': max(counts['likes_count'] + counts['pending_likes'],
+                           0),
+        'dislikes_count': max(
+            counts['dislikes_count'] + counts['pending_dislikes'], 0
+        ),
+    }
+
+
+def count_reaction(sender, instance, created, **kwargs):
+    """
+    Signal handler counting a new reaction into its comment's tally.
+    """
+    if created:
+        add_to_tally(instance.comment_id, instance.kind, 1)
+
+
+def uncount_reaction(sender, instance, **kwargs):
+    """
+    Signal handler taking a deleted reaction, including cascaded deletes,
+    out of its comment's tally.
+    """
+    add_to_tally(instance.comment_id, instance.kind, -1)
+
+
+def connect_signals():
+    """
+    Connects the tally handlers to CommentReaction. Called from
+    `CommentsConfig.ready()`.
+    """
+    post_save.connect(count_reaction, sender=CommentReaction)
+    post_delete.connect(uncount_reaction, sender=CommentReaction)
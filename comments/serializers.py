@@ -1,10 +1,40 @@
+from django.conf import settings
 from django.contrib.humanize.templatetags.humanize import naturaltime
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Comment
 from profiles.models import Profile
+from drf_api.sparse import SparseFieldsetSerializerMixin
+from media.resolver import MediaURLField
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class HumanizedTimes:
+    """
+    Memoizes `naturaltime()` for one response.
+
+    Timestamps are bucketed by their distance from the response's `now`
+    in the finest unit `naturaltime()` shows at that distance (seconds,
+    minutes, then hours), so every timestamp in a bucket reads the same
+    and is humanized once.
+    """
+
+    def __init__(self):
+        self.now = timezone.now()
+        self.strings = {}
+
+    def __call__(self, value):
+        seconds = int((self.now - value).total_seconds())
+        distance = abs(seconds)
+        unit = 1 if distance < 60 else 60 if distance < 3600 else 3600
+        key = (seconds < 0, distance // unit)
+        string = self.strings.get(key)
+        if string is None:
+            string = self.strings[key] = naturaltime(value)
+        return string
+
+
+class CommentSerializer(SparseFieldsetSerializerMixin,
+                        serializers.ModelSerializer):
     """
     Serializer for Comment model.
 
@@ -22,17 +52,23 @@ class CommentSerializer(serializers.ModelSerializer):
         the comment, read-only.
         - `description` (str): Content of the comment.
         - `parent` (int): ID of the parent comment if it's a reply, or null
-        if it's a top-level comment.
+        if it's a top-level comment. It must be a comment on the same post.
+        - `depth` (int): Nesting level, 0 for top-level comments, read-only.
+        - `replies_count` (int): Number of direct replies, read-only.
         - `likes_count` (int): Number of likes on the comment, read-only.
         - `dislikes_count` (int): Number of dislikes on the comment, read-only.
 
+    Reads can be restricted to some of these with `?fields=` or `?omit=`.
+
     Methods:
-        - `get_is_owner`: Checks if the logged-in user is the owner of the
-        comment.
+        - `get_is_owner`: Compares the logged-in user's id with the comment's
+        `owner_id`, without loading the owner.
         - `get_created_at`: Returns the created timestamp in a human-readable
-        format.
+        format, memoized for the response by `HumanizedTimes`.
         - `get_updated_at`: Returns the updated timestamp in a human-readable
-        format.
+        format, memoized for the response by `HumanizedTimes`.
+        - `validate`: Checks that a reply stays on its parent's post and
+        within `COMMENT_TREE['MAX_DEPTH']`.
         - `create`: Associates the logged-in user as the owner of the new
         comment upon creation.
     """
@@ -40,10 +76,17 @@ class CommentSerializer(serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source='owner.username')
     is_owner = serializers.SerializerMethodField()
     profile_id = serializers.ReadOnlyField(source='owner.profile.id')
-    profile_image = serializers.ReadOnlyField(source='owner.profile.image.url')
+    profile_image = MediaURLField(source='owner.profile.image')
     created_at = serializers.SerializerMethodField()
     updated_at = serializers.SerializerMethodField()
 
+    # Model fields read by the method fields, for sparse querysets
+    sparse_sources = {
+        'is_owner': ['owner'],
+        'created_at': ['created_at'],
+        'updated_at': ['updated_at'],
+    }
+
     def get_is_owner(self, obj):
         """
         Check if the logged-in user is the owner of the comment.
@@ -56,7 +99,17 @@ class CommentSerializer(serializers.ModelSerializer):
             False otherwise.
         """
         request = self.context['request']
-        return request.user == obj.owner
+        return request.user.id == obj.owner_id
+
+    def humanize(self, value):
+        """
+        Humanize a timestamp with the `HumanizedTimes` shared by every
+        comment of the response.
+        """
+        times = self.context.get('humanized_times')
+        if times is None:
+            times = self.context['humanized_times'] = HumanizedTimes()
+        return times(value)
 
     def get_created_at(self, obj):
         """
@@ -69,7 +122,7 @@ class CommentSerializer(serializers.ModelSerializer):
         Returns:
             str: Human-readable timestamp for when the comment was created.
         """
-        return naturaltime(obj.created_at)
+        return self.humanize(obj.created_at)
 
     def get_updated_at(self, obj):
         """
@@ -83,7 +136,30 @@ class CommentSerializer(serializers.ModelSerializer):
             str: Human-readable timestamp for when the comment was last
             updated.
         """
-        return naturaltime(obj.updated_at)
+        return self.humanize(obj.updated_at)
+
+    def validate(self, attrs):
+        """
+        Check that a reply is on the same post as its parent and not nested
+        deeper than `COMMENT_TREE['MAX_DEPTH']`.
+
+        Args:
+            attrs (dict): Field values being validated.
+
+        Returns:
+            dict: The validated field values.
+        """
+        parent = attrs.get('parent')
+        if parent is not None:
+            if parent.post_id != attrs['post'].pk:
+                raise serializers.ValidationError(
+                    {'parent': 'Replies must be on the same post.'}
+                )
+            if parent.depth >= settings.COMMENT_TREE['MAX_DEPTH']:
+                raise serializers.ValidationError(
+                    {'parent': 'Replies cannot be nested any deeper.'}
+                )
+        return attrs
 
     def create(self, validated_data):
         """
@@ -112,6 +188,8 @@ class CommentSerializer(serializers.ModelSerializer):
             'updated_at',
             'description',
             'parent',
+            'depth',
+            'replies_count',
             'likes_count',
             'dislikes_count'
         ]
@@ -119,6 +197,7 @@ class CommentSerializer(serializers.ModelSerializer):
             'id',
             'created_at',
             'updated_at',
+            'replies_count',
             'likes_count',
             'dislikes_count']
 
@@ -127,5 +206,18 @@ class CommentDetailSerializer(CommentSerializer):
     """
     Serializer for the Comment model used in Detail view
     Post is a read only field so that we dont have to set it on each update
+    Parent is read only too, as moving a reply would invalidate its path
     """
     post = serializers.ReadOnlyField(source='post.id')
+    parent = serializers.ReadOnlyField(source='parent_id')
+
+
+class CommentTreeSerializer(CommentSerializer):
+    """
+    Serializer for the comments of a comment tree. The view nests them
+    by their materialized path and depth, which are read whichever fields
+    `?fields=` / `?omit=` keep.
+    """
+
+    def get_source_paths(self):
+        return super().get_source_paths() | {'path', 'depth'}
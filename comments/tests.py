@@ -1,5 +1,16 @@
+from io import StringIO
+from unittest import mock
 from django.contrib.auth.models import User
-from .models import Comment
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from .models import (
+    Comment, CommentReaction, CommentTally, path_segment, subtree_end,
+)
+from .reactions import add_to_tally, fold_tallies, reaction_counts
 from posts.models import Post
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -193,3 +204,373 @@ class CommentDetailViewTest(APITestCase):
         self.client.login(username="tester1", password="password1")
         response = self.client.delete("/comments/2/")
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_matching_etag_returns_not_modified(self):
+        """
+        Test that a conditional GET of an unchanged comment gets a 304.
+        """
+        etag = self.client.get("/comments/1/")["ETag"]
+        response = self.client.get("/comments/1/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_reply_changes_etag(self):
+        """
+        Test that replying to a comment invalidates its ETag, as the
+        reply only updates the stored replies_count.
+        """
+        etag = self.client.get("/comments/1/")["ETag"]
+        parent = Comment.objects.get(pk=1)
+        Comment.objects.create(
+            owner=parent.owner, post=parent.post, parent=parent,
+            description="A reply",
+        )
+        response = self.client.get("/comments/1/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["replies_count"], 1)
+
+    def test_etag_follows_humanized_timestamps(self):
+        """
+        Test that the ETag changes once the humanized timestamps read
+        differently, although the comment itself is unchanged.
+        """
+        with mock.patch(
+            "drf_api.conditional.naturaltime", return_value="a minute ago"
+        ):
+            etag = self.client.get("/comments/1/")["ETag"]
+        with mock.patch(
+            "drf_api.conditional.naturaltime", return_value="an hour ago"
+        ):
+            response = self.client.get(
+                "/comments/1/", HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+@override_settings(COMMENT_TREE={
+    'PAGE_SIZE': 2, 'DEPTH': 3, 'MAX_DEPTH': 4, 'MAX_NODES': 50,
+})
+class CommentTreeViewTest(APITestCase):
+    """
+    Tests for materialized comment paths and the CommentTree view
+    """
+
+    def setUp(self):
+        self.tester = User.objects.create_user(
+            username="tester",
+            password="password",
+        )
+        self.test_post = Post.objects.create(
+            owner=self.tester,
+            event="post event",
+            date="2024-08-29",
+            time="14:00:00",
+        )
+        self.url = f'/posts/{self.test_post.id}/comment-tree/'
+
+    def comment(self, parent=None, post=None):
+        return Comment.objects.create(
+            owner=self.tester, post=post or self.test_post,
+            parent=parent, description="A comment",
+        )
+
+    def test_paths_sort_threads_depth_first(self):
+        first = self.comment()
+        reply = self.comment(first)
+        nested = self.comment(reply)
+        second = self.comment()
+        self.assertEqual(reply.path, first.path + path_segment(reply.id))
+        self.assertEqual(nested.depth, 2)
+        ordered = Comment.objects.order_by('path')
+        self.assertEqual(list(ordered), [first, reply, nested, second])
+        self.assertEqual(subtree_end('000000z'), '000001')
+        self.assertEqual(subtree_end('0000010000000z'), '0000010000001')
+
+    def test_reply_counts_follow_inserts_and_deletes(self):
+        first = self.comment()
+        reply = self.comment(first)
+        self.comment(first)
+        first.refresh_from_db()
+        self.assertEqual(first.replies_count, 2)
+        reply.delete()
+        first.refresh_from_db()
+        self.assertEqual(first.replies_count, 1)
+
+    def test_tree_is_nested_and_depth_limited(self):
+        first = self.comment()
+        reply = self.comment(first)
+        nested = self.comment(reply)
+        self.comment(nested)
+        response = self.client.get(self.url, {'depth': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        [node] = response.data['results']
+        self.assertEqual(node['id'], first.id)
+        self.assertEqual(node['replies_count'], 1)
+        [reply_node] = node['replies']
+        self.assertEqual(reply_node['id'], reply.id)
+        [nested_node] = reply_node['replies']
+        self.assertEqual(nested_node['id'], nested.id)
+        self.assertEqual(nested_node['replies_count'], 1)
+        self.assertEqual(nested_node['replies'], [])
+
+    def test_tree_is_paginated_by_top_level_comment(self):
+        roots = [self.comment() for _ in range(3)]
+        self.comment(roots[1])
+        self.comment(post=Post.objects.create(owner=self.tester))
+        response = self.client.get(self.url)
+        self.assertEqual(
+            [node['id'] for node in response.data['results']],
+            [roots[0].id, roots[1].id],
+        )
+        self.assertEqual(len(response.data['results'][1]['replies']), 1)
+        self.assertIn(f'after={roots[1].id}', response.data['next'])
+        response = self.client.get(self.url, {'after': roots[1].id})
+        self.assertEqual(
+            [node['id'] for node in response.data['results']],
+            [roots[2].id],
+        )
+        self.assertIsNone(response.data['next'])
+
+    def test_tree_is_read_in_one_range_scan(self):
+        for root in [self.comment() for _ in range(3)]:
+            self.comment(self.comment(root))
+        for params in [{}, {'fields': 'id,description'}]:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            # The post lookup, then the page itself
+            self.assertEqual(len(queries), 2)
+            self.assertEqual(len(response.data['results'][0]['replies']), 1)
+
+    def test_unknown_post_returns_404(self):
+        response = self.client.get('/posts/999/comment-tree/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_root_returns_one_thread(self):
+        first = self.comment()
+        reply = self.comment(first)
+        self.comment(reply)
+        self.comment()
+        response = self.client.get(self.url, {'root': reply.id})
+        [node] = response.data['results']
+        self.assertEqual(node['id'], reply.id)
+        self.assertEqual(len(node['replies']), 1)
+
+    @override_settings(COMMENT_TREE={
+        'PAGE_SIZE': 2, 'DEPTH': 3, 'MAX_DEPTH': 4, 'MAX_NODES': 3,
+    })
+    def test_large_pages_are_truncated(self):
+        first = self.comment()
+        for _ in range(3):
+            self.comment(first)
+        second = self.comment()
+        response = self.client.get(self.url)
+        self.assertTrue(response.data['truncated'])
+        self.assertEqual(len(response.data['results'][0]['replies']), 2)
+        self.assertIn(f'after={first.id}', response.data['next'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results'][0]['id'], second.id)
+
+    def test_replies_must_stay_on_the_post_and_depth(self):
+        self.client.login(username="tester", password="password")
+        other = self.comment(post=Post.objects.create(owner=self.tester))
+        response = self.client.post('/comments/', {
+            'post': self.test_post.id, 'parent': other.id,
+            'description': 'A reply',
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        parent = None
+        for _ in range(5):
+            parent = self.comment(parent)
+        response = self.client.post('/comments/', {
+            'post': self.test_post.id, 'parent': parent.id,
+            'description': 'A reply',
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CommentReactionTest(APITestCase):
+    """
+    Tests for comment reactions and their sharded tallies
+    """
+
+    def setUp(self):
+        self.tester = User.objects.create_user(
+            username="tester",
+            password="password",
+        )
+        post = Post.objects.create(owner=self.tester, event="post event")
+        self.comment = Comment.objects.create(
+            owner=self.tester, post=post, description="A comment",
+        )
+        self.client.login(username="tester", password="password")
+
+    def react(self, kind):
+        return self.client.post(f'/comments/{self.comment.id}/{kind}/')
+
+    def test_toggles_update_both_counters(self):
+        response = self.react('like')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'reaction': 'like', 'likes_count': 1, 'dislikes_count': 0,
+        })
+        response = self.react('dislike')
+        self.assertEqual(response.data, {
+            'reaction': 'dislike', 'likes_count': 0, 'dislikes_count': 1,
+        })
+        response = self.react('dislike')
+        self.assertEqual(response.data, {
+            'reaction': None, 'likes_count': 0, 'dislikes_count': 0,
+        })
+        self.assertFalse(CommentReaction.objects.exists())
+
+    def test_reactions_are_folded_into_the_comment(self):
+        self.react('like')
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.likes_count, 1)
+        self.assertFalse(CommentTally.objects.exclude(likes=0).exists())
+
+    def test_unfolded_shards_are_counted(self):
+        for _ in range(5):
+            add_to_tally(self.comment.id, CommentReaction.LIKE, 1)
+        add_to_tally(self.comment.id, CommentReaction.DISLIKE, 1)
+        self.assertEqual(reaction_counts(self.comment.id), {
+            'likes_count': 5, 'dislikes_count': 1,
+        })
+        self.assertTrue(fold_tallies(self.comment.id))
+        self.assertFalse(fold_tallies(self.comment.id))
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.likes_count, 5)
+
+    def test_anonymous_users_cannot_react(self):
+        self.client.logout()
+        response = self.react('like')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_rebuild_command_repairs_drift(self):
+        self.react('like')
+        Comment.objects.filter(pk=self.comment.pk).update(
+            likes_count=7, dislikes_count=3, replies_count=2
+        )
+        add_to_tally(self.comment.id, CommentReaction.LIKE, 4)
+        add_to_tally(self.comment.id + 1, CommentReaction.LIKE, 1)
+        call_command('rebuild_comment_counters', stdout=StringIO())
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.likes_count, 1)
+        self.assertEqual(self.comment.dislikes_count, 0)
+        self.assertEqual(self.comment.replies_count, 0)
+        self.assertFalse(CommentTally.objects.exists())
+
+
+class CommentListQueryTest(APITestCase):
+    """
+    Tests that a page of comments costs the same queries whatever its size
+    """
+
+    def setUp(self):
+        self.viewer = User.objects.create_user(
+            username="viewer", password="password",
+        )
+        self.post = Post.objects.create(owner=self.viewer, event="event")
+        self.client.login(username="viewer", password="password")
+
+    def add_comments(self, count):
+        for index in range(count):
+            owner = User.objects.create_user(
+                username=f"commenter{Comment.objects.count()}",
+                password="password",
+            )
+            Comment.objects.create(
+                owner=owner, post=self.post, description="A comment",
+            )
+
+    def test_page_queries_do_not_grow_with_comments(self):
+        self.add_comments(1)
+        # Session, user, the filtered post and the page, without a COUNT
+        with self.assertNumQueries(4):
+            response = self.client.get('/comments/', {'post': self.post.id})
+        self.assertEqual(len(response.data['results']), 1)
+        self.add_comments(9)
+        with self.assertNumQueries(4):
+            response = self.client.get('/comments/', {'post': self.post.id})
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertTrue(all(
+            comment['profile_id'] and not comment['is_owner']
+            for comment in response.data['results']
+        ))
+
+    def test_timestamps_are_humanized_once_per_bucket(self):
+        self.add_comments(5)
+        Comment.objects.update(updated_at=Comment.objects.first().created_at)
+        Comment.objects.update(created_at=F('updated_at'))
+        with mock.patch(
+            'comments.serializers.naturaltime', return_value='now'
+        ) as naturaltime:
+            response = self.client.get('/comments/')
+        self.assertEqual(naturaltime.call_count, 1)
+        self.assertEqual(response.data['results'][4]['updated_at'], 'now')
+
+
+class CommentStreamTest(APITestCase):
+    """
+    Tests for the cursor-paginated comment stream of a post
+    """
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.tester = User.objects.create_user(
+            username="tester", password="password",
+        )
+        self.post = Post.objects.create(owner=self.tester, event="event")
+        self.comments = [
+            Comment.objects.create(
+                owner=self.tester, post=self.post, description=str(index),
+            )
+            for index in range(12)
+        ]
+        # Ties on created_at are broken by id
+        Comment.objects.filter(pk__in=[
+            comment.pk for comment in self.comments[4:8]
+        ]).update(created_at=self.comments[4].created_at)
+
+    def ids(self, response):
+        return [comment['id'] for comment in response.data['results']]
+
+    def test_pages_newest_first_without_count(self):
+        response = self.client.get('/comments/', {'post': self.post.id})
+        self.assertNotIn('count', response.data)
+        expected = [comment.id for comment in reversed(self.comments)]
+        self.assertEqual(self.ids(response), expected[:10])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(self.ids(response), expected[10:])
+        self.assertIsNone(response.data['next'])
+
+    def test_pages_oldest_first(self):
+        response = self.client.get(
+            '/comments/', {'post': self.post.id, 'ordering': 'created_at'}
+        )
+        expected = [comment.id for comment in self.comments]
+        self.assertEqual(self.ids(response), expected[:10])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(self.ids(response), expected[10:])
+
+    def test_since_returns_new_comments_oldest_first(self):
+        response = self.client.get('/comments/', {'post': self.post.id})
+        latest = response.data['latest']
+        response = self.client.get(latest)
+        self.assertEqual(self.ids(response), [])
+        self.assertEqual(response.data['latest'], latest)
+        with self.captureOnCommitCallbacks(execute=True):
+            new = [
+                Comment.objects.create(
+                    owner=self.tester, post=self.post, description="new",
+                )
+                for _ in range(2)
+            ]
+        response = self.client.get(latest)
+        self.assertEqual(self.ids(response), [comment.id for comment in new])
+        response = self.client.get(response.data['latest'])
+        self.assertEqual(self.ids(response), [])
+
+    def test_invalid_since_returns_not_found(self):
+        response = self.client.get('/comments/', {'since': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,7 +1,15 @@
 from django.urls import path
 from comments import views
+from comments.models import CommentReaction
 
 urlpatterns = [
     path('comments/', views.CommentList.as_view()),
-    path('comments/<int:pk>/', views.CommentDetail.as_view())
+    path('comments/<int:pk>/', views.CommentDetail.as_view()),
+    path('comments/<int:pk>/like/', views.CommentReactionToggle.as_view(
+        kind=CommentReaction.LIKE
+    )),
+    path('comments/<int:pk>/dislike/', views.CommentReactionToggle.as_view(
+        kind=CommentReaction.DISLIKE
+    )),
+    path('posts/<int:pk>/comment-tree/', views.CommentTree.as_view()),
 ]
@@ -1,28 +1,205 @@
-from rest_framework import generics, permissions
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Subquery, Value
+from django.db.models.functions import Coalesce
+from django.shortcuts import get_object_or_404
+from rest_framework import filters, generics, permissions, serializers
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Comment
-from .serializers import CommentSerializer, CommentDetailSerializer
+from .models import PATH_SEGMENT_LENGTH, Comment, path_segment, subtree_end
+from .pagination import CommentStreamPagination
+from .reactions import fold_tallies, reaction_counts, toggle_reaction
+from .serializers import (
+    CommentSerializer, CommentDetailSerializer, CommentTreeSerializer,
+)
+from drf_api.cache import CachedListMixin
+from drf_api.conditional import ConditionalRetrieveMixin
 from drf_api.permissions import IsOwnerOrReadOnly
+from drf_api.sparse import SparseFieldsetMixin
+from posts.models import Post
 
 
-class CommentList(generics.ListCreateAPIView):
+class CommentList(CachedListMixin, SparseFieldsetMixin,
+                  generics.ListCreateAPIView):
     """
     List comments or create a comment if logged in.
+    - `?post=` lists a post's comments from the `(post, created_at, id)`
+      index, newest first or oldest first with `?ordering=created_at`.
+    - Pages with a keyset cursor and links to `latest`, which polls for
+      comments created since the page with `?since=`.
+    Reads can be restricted with `?fields=` / `?omit=`.
     """
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    queryset = Comment.objects.all()
-    filter_backends = [DjangoFilterBackend]
+    pagination_class = CommentStreamPagination
+    queryset = Comment.objects.select_related('owner__profile')
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['post']
+    ordering_fields = ['created_at']
+    cache_scope = 'comments'
 
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+        # Save the comment and bump the post's comments_count together
+        with transaction.atomic():
+            serializer.save(owner=self.request.user)
 
 
-class CommentDetail(generics.RetrieveUpdateDestroyAPIView):
+class CommentDetail(ConditionalRetrieveMixin, SparseFieldsetMixin,
+                    generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve a comment, or update or delete it by id if you own it.
+    Conditional GETs are answered with a 304 while it is unchanged and
+    its humanized timestamps still read the same.
     """
     permission_classes = [IsOwnerOrReadOnly]
     serializer_class = CommentDetailSerializer
-    queryset = Comment.objects.all()
+    queryset = Comment.objects.select_related('owner__profile')
+    validator_fields = (
+        'created_at', 'updated_at', 'replies_count', 'likes_count',
+        'dislikes_count', 'owner__username', 'owner__profile__updated_at',
+    )
+    humanized_fields = ('created_at', 'updated_at')
+
+
+class CommentReactionToggle(generics.GenericAPIView):
+    """
+    Toggle the logged-in user's like or dislike of a comment.
+    - POSTing adds the reaction, replaces a reaction of the other kind,
+      or removes it if it was already there.
+    - Returns the user's `reaction` afterwards (or null) and the comment's
+      `likes_count` and `dislikes_count`.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    queryset = Comment.objects.only('pk')
+    kind = None
+
+    def post(self, request, pk):
+        comment = self.get_object()
+        reaction = toggle_reaction(request.user, comment, self.kind)
+        # After commit, so folding never holds up the reaction itself
+        fold_tallies(comment.pk)
+        return Response({
+            'reaction': reaction,
+            **reaction_counts(comment.pk),
+        })
+
+
+# Sorts after every materialized path, which are at most 255 characters
+# of digits and lowercase letters
+PATH_MAX = Value('z' * 256)
+
+
+class CommentTree(SparseFieldsetMixin, generics.GenericAPIView):
+    """
+    Retrieve the comments of a post as nested threads.
+    - Each comment carries its `replies`, oldest first, and its
+      `replies_count`, which also counts replies below `?depth=`.
+    - Pages hold `COMMENT_TREE['PAGE_SIZE']` top-level comments, oldest
+      first, with their replies down to `?depth=` levels; `next` links to
+      the following page.
+    - `?root=<id>` returns the thread below one comment instead.
+    - At most `COMMENT_TREE['MAX_NODES']` comments are returned; if a page
+      is cut short, `truncated` is set and `next` continues after the
+      last top-level comment returned, whose remaining replies can be
+      fetched with `?root=`.
+    - The whole page is read by one range scan over the `(post, path)`
+      index, after checking the post exists.
+    Reads can be restricted with `?fields=` / `?omit=`.
+    """
+    serializer_class = CommentTreeSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    queryset = Comment.objects.select_related('owner__profile')
+
+    def get_int_param(self, name, default, minimum, maximum):
+        value = self.request.query_params.get(name)
+        if value is None:
+            return default
+        try:
+            value = int(value)
+        except ValueError:
+            value = minimum - 1
+        if not minimum <= value <= maximum:
+            raise serializers.ValidationError({name: [
+                f'Must be between {minimum} and {maximum}.'
+            ]})
+        return value
+
+    def get(self, request, pk):
+        depth = self.get_int_param(
+            'depth', settings.COMMENT_TREE['DEPTH'], 1,
+            settings.COMMENT_TREE['MAX_DEPTH'],
+        )
+        root_id = self.get_int_param('root', None, 1, 2 ** 63 - 1)
+        after = self.get_int_param('after', None, 1, 2 ** 63 - 1)
+        max_nodes = settings.COMMENT_TREE['MAX_NODES']
+        get_object_or_404(Post.objects.only('pk'), pk=pk)
+        comments = self.get_queryset().filter(post=pk).order_by('path')
+
+        if root_id is not None:
+            root = get_object_or_404(
+                Comment.objects.only('path', 'depth'), pk=root_id, post=pk
+            )
+            top_depth = root.depth
+            comments = comments.filter(
+                path__gte=root.path, path__lt=subtree_end(root.path)
+            )
+        else:
+            top_depth = 0
+            start = subtree_end(path_segment(after)) if after else ''
+            # The first top-level comment of the next page bounds this
+            # one; it is read too, to tell whether there is a next page
+            following = Comment.objects.filter(
+                post=pk, depth=0, path__gte=start
+            ).order_by('path').values('path')[
+                settings.COMMENT_TREE['PAGE_SIZE']:
+            ][:1]
+            comments = comments.filter(
+                path__gte=start,
+                path__lte=Coalesce(Subquery(following), PATH_MAX),
+            )
+        comments = list(
+            comments.filter(depth__lt=top_depth + depth)[:max_nodes + 1]
+        )
+
+        has_next = False
+        roots = [comment for comment in comments if comment.depth == 0]
+        if (root_id is None and
+                len(roots) > settings.COMMENT_TREE['PAGE_SIZE']):
+            # Drop the next page's first top-level comment
+            comments.pop()
+            roots.pop()
+            has_next = True
+        truncated = len(comments) > max_nodes
+        if truncated:
+            comments = comments[:max_nodes]
+            has_next = root_id is None
+
+        next_url = None
+        if has_next:
+            last_root = [
+                comment for comment in comments if comment.depth == 0
+            ][-1]
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'after', last_root.pk
+            )
+        return Response({
+            'next': next_url,
+            'truncated': truncated,
+            'results': self.nest(comments),
+        })
+
+    def nest(self, comments):
+        """
+        Serializes comments ordered by path and nests each one in the
+        `replies` of its parent.
+        """
+        serializer = self.get_serializer(comments, many=True)
+        results = []
+        nodes = {}
+        for comment, node in zip(comments, serializer.data):
+            node['replies'] = []
+            parent = nodes.get(comment.path[:-PATH_SEGMENT_LENGTH])
+            (results if parent is None else parent['replies']).append(node)
+            nodes[comment.path] = node
+        return results
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class DrfApiConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'drf_api'
+
+    def ready(self):
+        # Invalidate cached responses whenever the models behind them change
+        from .cache import connect_signals
+        connect_signals()
@@ -0,0 +1,168 @@
+from functools import partial
+from uuid import uuid4
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework.response import Response
+
+"""
+Response cache for anonymous list endpoints.
+
+Anonymous visitors all see the same list responses, so they are cached
+by scope, host, path and normalized query string. Each scope has a
+generation token that is part of every key. Saving or deleting any model
+the scope depends on replaces the token, which invalidates the whole
+scope at once without having to find its keys. The token is replaced
+once the write commits, so a request reading the old rows meanwhile
+cannot cache them under the new token.
+
+The cache alias, timeout and key prefix come from `RESPONSE_CACHE`; the
+alias defaults to a local-memory cache and can point at any shared
+backend through `CACHES`.
+
+Functions:
+    normalize_query(query_params): Canonical form of a query string.
+    invalidate_scope(scope): Drops every cached response of a scope.
+    response_cache_stats(): Hit and miss counts.
+
+Classes:
+    CachedListMixin: List view mixin serving anonymous requests from the
+                     cache.
+"""
+
+# The models each scope's responses are built from.
+SCOPE_DEPENDENCIES = {
+    'posts': [
+        'posts.Post', 'comments.Comment', 'likes.Like', 'shares.Share',
+        'followers.Follower', 'profiles.Profile', 'auth.User',
+    ],
+    'profiles': [
+        'profiles.Profile', 'posts.Post', 'followers.Follower', 'auth.User',
+    ],
+    'comments': ['comments.Comment', 'profiles.Profile', 'auth.User'],
+}
+
+
+def get_response_cache():
+    return caches[settings.RESPONSE_CACHE['ALIAS']]
+
+
+def make_key(*parts):
+    return ':'.join([settings.RESPONSE_CACHE['KEY_PREFIX'], *parts])
+
+
+def normalize_query(query_params):
+    """
+    Returns the query string with empty values dropped and parameters
+    sorted, so equivalent requests share a cache entry.
+    """
+    return urlencode(sorted(
+        (key, value)
+        for key, values in query_params.lists()
+        for value in values
+        if value != ''
+    ))
+
+
+def get_generation(scope):
+    cache = get_response_cache()
+    key = make_key(scope, 'generation')
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def invalidate_scope(scope):
+    """
+    Drops every cached response of `scope` by replacing its generation.
+    """
+    get_response_cache().set(make_key(scope, 'generation'), uuid4().hex, None)
+
+
+def record(outcome):
+    cache = get_response_cache()
+    key = make_key('stats', outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def response_cache_stats():
+    """
+    Returns the response cache's hit and miss counts and hit rate.
+    """
+    cache = get_response_cache()
+    hits = cache.get(make_key('stats', 'hits'), 0)
+    misses = cache.get(make_key('stats', 'misses'), 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else None,
+    }
+
+
+class CachedListMixin:
+    """
+    List view mixin that serves anonymous GET requests from the response
+    cache. Views set `cache_scope` to a key of `SCOPE_DEPENDENCIES`.
+    Responses carry an `X-Cache: HIT` or `X-Cache: MISS` header.
+    """
+    cache_scope = None
+
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+
+        cache = get_response_cache()
+        key = make_key(
+            self.cache_scope, get_generation(self.cache_scope),
+            request.get_host(), request.path, normalize_query(request.GET),
+        )
+        data = cache.get(key)
+        if data is not None:
+            record('hits')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        record('misses')
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE['TIMEOUT'])
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+def invalidate_dependents(sender, update_fields=None, using=None, **kwargs):
+    """
+    Signal handler that invalidates every scope depending on the saved or
+    deleted model when the transaction commits. Saves that only record a
+    login are ignored.
+    """
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    label = sender._meta.label
+    for scope, dependencies in SCOPE_DEPENDENCIES.items():
+        if label in dependencies:
+            transaction.on_commit(partial(invalidate_scope, scope), using)
+
+
+def connect_signals():
+    """
+    Connects `invalidate_dependents` to every model a scope depends on.
+    Called from `DrfApiConfig.ready()`.
+    """
+    labels = {
+        label for dependencies in SCOPE_DEPENDENCIES.values()
+        for label in dependencies
+    }
+    for label in labels:
+        post_save.connect(invalidate_dependents, sender=label)
+        post_delete.connect(invalidate_dependents, sender=label)
@@ -0,0 +1,145 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Exists, OuterRef
+from django.db.models.constants import LOOKUP_SEP
+from django_filters.constants import EMPTY_VALUES
+from django_filters.rest_framework import DjangoFilterBackend, FilterSet
+from rest_framework.settings import api_settings
+
+"""
+Filtering across multi-valued relationships without row multiplication.
+
+Functions:
+    split_at_multi_valued(model, path): Splits a lookup path at its first
+                                        reverse foreign key.
+    semi_join(model, path, lookup_expr, value): Compiles a relationship
+                                                filter into an EXISTS
+                                                subquery.
+
+Classes:
+    SemiJoinFilterSet: FilterSet that filters reverse relations with EXISTS.
+    SemiJoinFilterBackend: DjangoFilterBackend using SemiJoinFilterSet.
+"""
+
+
+def split_at_multi_valued(model, path):
+    """
+    Splits `path` at its first reverse foreign key.
+
+    Returns:
+        tuple: `(prefix, relation, rest)` where `prefix` and `rest` are
+        lists of path parts around the reverse relation, or None if the
+        path never crosses a reverse foreign key.
+    """
+    parts = path.split(LOOKUP_SEP)
+    opts = model._meta
+    for index, part in enumerate(parts):
+        try:
+            field = opts.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        if field.one_to_many and field.auto_created:
+            return parts[:index], field, parts[index + 1:]
+        if not field.is_relation or field.many_to_many:
+            return None
+        opts = field.related_model._meta
+    return None
+
+
+def semi_join(model, path, lookup_expr, value):
+    """
+    Compiles `path__lookup_expr=value` into an EXISTS subquery when the
+    path crosses a reverse foreign key, so the outer query is filtered
+    without joining, and therefore without multiplying, its rows.
+
+    For example `owner__followed__owner__profile=3` on Post becomes::
+
+        EXISTS (SELECT 1 FROM followers_follower U0
+                INNER JOIN profiles_profile U2 ON U0.owner_id = U2.owner_id
+                WHERE U0.followed_id = posts_post.owner_id AND U2.id = 3)
+
+    Returns:
+        Exists: The condition, or None if the path is single-valued.
+    """
+    split = split_at_multi_valued(model, path)
+    if split is None:
+        return None
+    prefix, relation, rest = split
+    lookup = LOOKUP_SEP.join(rest or ['pk'])
+    if lookup_expr != 'exact':
+        lookup = f'{lookup}{LOOKUP_SEP}{lookup_expr}'
+    outer = LOOKUP_SEP.join(prefix) or 'pk'
+    return Exists(relation.related_model._default_manager.filter(**{
+        relation.field.name: OuterRef(outer),
+        lookup: value,
+    }))
+
+
+class SemiJoinFilterSet(FilterSet):
+    """
+    FilterSet that compiles filters across reverse foreign keys into
+    EXISTS subqueries instead of JOINs.
+
+    The JOIN is kept when the request also orders across the same
+    relation (e.g. `likes__owner__profile` with
+    `ordering=likes__created_at`), since the ordering has to read the
+    very rows the filter matched.
+    """
+
+    def filter_queryset(self, queryset):
+        ordered_paths = self.get_ordered_paths()
+        for name, value in self.form.cleaned_data.items():
+            filter_ = self.filters[name]
+            condition = None
+            if (
+                value not in EMPTY_VALUES and
+                not filter_.exclude and
+                filter_.method is None
+            ):
+                split = split_at_multi_valued(
+                    queryset.model, filter_.field_name
+                )
+                if split and not self.shares_relation(split, ordered_paths):
+                    condition = semi_join(
+                        queryset.model, filter_.field_name,
+                        filter_.lookup_expr, value,
+                    )
+            if condition is None:
+                queryset = filter_.filter(queryset, value)
+            else:
+                queryset = queryset.filter(condition)
+        return queryset
+
+    def get_ordered_paths(self):
+        """
+        Returns the field paths named in the request's ordering parameter.
+        """
+        if self.request is None:
+            return []
+        ordering = self.request.query_params.get(
+            api_settings.ORDERING_PARAM, ''
+        )
+        return [
+            term.strip().lstrip('-') for term in ordering.split(',')
+            if term.strip()
+        ]
+
+    @staticmethod
+    def shares_relation(split, ordered_paths):
+        """
+        Returns True if any ordered path crosses the split's relation.
+        """
+        prefix, relation, _ = split
+        relation_path = LOOKUP_SEP.join(prefix + [relation.name])
+        return any(
+            path == relation_path or
+            path.startswith(relation_path + LOOKUP_SEP)
+            for path in ordered_paths
+        )
+
+
+class SemiJoinFilterBackend(DjangoFilterBackend):
+    """
+    DjangoFilterBackend whose generated FilterSets use EXISTS subqueries
+    for filters across reverse foreign keys.
+    """
+    filterset_base = SemiJoinFilterSet
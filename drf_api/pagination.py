@@ -0,0 +1,268 @@
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.db.models.expressions import OrderBy
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+"""
+Keyset (seek) pagination for large, append-heavy lists.
+
+Classes:
+    KeysetPagination: Pages through a queryset by filtering on the values of
+                      the ordering columns of the last row seen, instead of
+                      using OFFSET, and never runs a COUNT query.
+"""
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks on the ordering columns.
+
+    The ordering is taken from the queryset itself, so it follows whatever
+    `OrderingFilter` applied, and falls back to `ordering`. `unique_field`,
+    the primary key by default, is appended as a tie-breaker so every row
+    has a unique position, which lets non-unique orderings such as
+    `likes_count` page without skipping or repeating rows. Each page is a
+    single indexed range query whatever its depth.
+
+    The response keeps the `next` / `previous` / `results` shape of the
+    page number paginator, without the `count`.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = None
+    max_page_size = None
+    ordering = ('-created_at',)
+    unique_field = 'pk'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        terms = self.get_terms(queryset)
+        queryset = queryset.annotate(
+            **{alias: F(field) for alias, field, *_ in terms}
+        )
+        position, reverse = self.decode_cursor(request, queryset, terms)
+        if reverse:
+            # Walk backwards from the cursor with every direction flipped
+            terms = [
+                (alias, field, not descending, nullable)
+                for alias, field, descending, nullable in terms
+            ]
+        queryset = self.seek(queryset, terms, position, reverse)
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        positions = [
+            [getattr(obj, alias) for alias, *_ in terms] for obj in results
+        ]
+        self.next_position = None
+        self.previous_position = None
+        if results and (has_more or reverse):
+            self.next_position = positions[-1]
+        if results and (has_more if reverse else position is not None):
+            self.previous_position = positions[0]
+        return results
+
+    def seek(self, queryset, terms, position, reverse=False):
+        """
+        Orders the annotated queryset by `terms` and keeps only the rows
+        after `position`, if there is one.
+        """
+        queryset = queryset.order_by(*self.get_order_by(terms, reverse))
+        if position is not None:
+            queryset = queryset.filter(
+                self.rows_after(terms, position, nulls_last=not reverse)
+            )
+        return queryset
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_terms(self, queryset):
+        """
+        Returns the keyset terms for the queryset's ordering as
+        `(alias, field, descending, nullable)` tuples, ending with
+        `unique_field`.
+        """
+        ordering = list(queryset.query.order_by) or list(self.ordering)
+        assert all(isinstance(term, str) for term in ordering), (
+            'KeysetPagination only supports orderings of field names.'
+        )
+        opts = queryset.model._meta
+        fields = [
+            opts.pk.name if field == 'pk' else field
+            for field in (term.lstrip('-') for term in ordering)
+        ]
+        unique_field = self.unique_field
+        if unique_field == 'pk':
+            unique_field = opts.pk.name
+        if unique_field not in fields:
+            direction = '-' if ordering[-1].startswith('-') else ''
+            ordering.append(direction + unique_field)
+            fields.append(unique_field)
+
+        terms = []
+        for index, (term, field) in enumerate(zip(ordering, fields)):
+            if '__' in field:
+                # Values reached through a relation can be missing
+                nullable = True
+            elif field in queryset.query.annotations:
+                nullable = False
+            else:
+                nullable = opts.get_field(field).null
+            terms.append(
+                (f'keyset_{index}', field, term.startswith('-'), nullable)
+            )
+        return terms
+
+    def get_order_by(self, terms, reverse):
+        order_by = []
+        for alias, _, descending, nullable in terms:
+            if nullable:
+                # Pin NULLs to one end so they page the same on every backend
+                order_by.append(OrderBy(
+                    F(alias), descending=descending,
+                    nulls_last=not reverse, nulls_first=reverse,
+                ))
+            else:
+                order_by.append(F(alias).desc() if descending else F(alias))
+        return order_by
+
+    def rows_after(self, terms, position, nulls_last):
+        """
+        Builds the filter matching every row that sorts strictly after
+        `position`:
+
+            a > x OR (a = x AND (b > y OR (b = y AND ...)))
+
+        with NULLs kept at the end (or the start) of each nullable term.
+        """
+        (alias, _, descending, nullable), rest = terms[0], terms[1:]
+        value = position[0]
+        is_null = Q(**{f'{alias}__isnull': True})
+        tail = None
+        if rest:
+            tail = self.rows_after(rest, position[1:], nulls_last)
+
+        if value is None:
+            after = is_null & tail if tail is not None else Q(pk__in=[])
+            if not nulls_last:
+                after |= ~is_null
+            return after
+
+        lookup = 'lt' if descending else 'gt'
+        after = Q(**{f'{alias}__{lookup}': value})
+        if tail is not None:
+            after |= Q(**{alias: value}) & tail
+        if nullable and nulls_last:
+            after |= is_null
+        return after
+
+    def encode_cursor(self, position, reverse):
+        return replace_query_param(
+            self.base_url, self.cursor_query_param,
+            self.encode_position(position, reverse),
+        )
+
+    def encode_position(self, position, reverse=False):
+        payload = {'p': [self.to_json(value) for value in position]}
+        if reverse:
+            payload['r'] = 1
+        return b64encode(
+            json.dumps(payload, separators=(',', ':')).encode('ascii')
+        ).decode('ascii')
+
+    def decode_cursor(self, request, queryset, terms):
+        """
+        Returns the `(position, reverse)` encoded in the request's cursor,
+        or `(None, False)` for the first page.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        return self.decode_position(encoded, queryset, terms)
+
+    def decode_position(self, encoded, queryset, terms):
+        """
+        Returns the `(position, reverse)` encoded by `encode_position()`.
+
+        Raises:
+            NotFound: If `encoded` is not a position in `terms`.
+        """
+        try:
+            payload = json.loads(b64decode(encoded.encode('ascii')))
+            raw = payload['p']
+            if len(raw) != len(terms):
+                raise ValueError('Cursor does not match the ordering')
+            annotations = queryset.query.annotations
+            position = [
+                None if value is None
+                else annotations[alias].output_field.to_python(value)
+                for (alias, *_), value in zip(terms, raw)
+            ]
+            return position, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def to_json(value):
+        if isinstance(value, (datetime, date, time)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
@@ -1,5 +1,6 @@
 from dj_rest_auth.serializers import UserDetailsSerializer
 from rest_framework import serializers
+from media.resolver import MediaURLField
 
 
 class CurrentUserSerializer(UserDetailsSerializer):
@@ -13,7 +14,7 @@ class CurrentUserSerializer(UserDetailsSerializer):
     """
 
     profile_id = serializers.ReadOnlyField(source='profile.id')
-    profile_image = serializers.ReadOnlyField(source='profile.image.url')
+    profile_image = MediaURLField(source='profile.image')
 
     class Meta(UserDetailsSerializer.Meta):
         fields = UserDetailsSerializer.Meta.fields + (
@@ -21,10 +21,14 @@ CLOUDINARY_STORAGE = {
     'CLOUDINARY_URL': os.environ.get('CLOUDINARY_URL')
 }
 MEDIA_URL = '/media/'
-DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+# MEDIA_STORAGE=media.storage.LocalMediaStorage keeps uploads on local disk
+DEFAULT_FILE_STORAGE = os.environ.get(
+    'MEDIA_STORAGE', 'cloudinary_storage.storage.MediaCloudinaryStorage'
+)
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', str(BASE_DIR / 'mediafiles'))
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -44,6 +48,132 @@ if 'DEV' not in os.environ:
         'rest_framework.renderers.JSONRenderer',
     ]
 
+# Image intake: uploads are checked from their header while they stream
+# in, and skipped without being buffered once they fail a check.
+FILE_UPLOAD_HANDLERS = [
+    'media.intake.ImageIntakeUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+IMAGE_MAX_UPLOAD_BYTES = 2 * 1024 * 1024
+IMAGE_MAX_DIMENSION = 4096
+IMAGE_HEADER_BYTES = 256 * 1024
+IMAGE_FORMATS = ['JPEG', 'MPO', 'PNG', 'GIF', 'WEBP']
+
+# Media upload pipeline: uploads are staged in SCRATCH_DIR and pushed to
+# DEFAULT_FILE_STORAGE by WORKERS background threads, retrying RETRIES
+# times with exponential backoff from RETRY_DELAY seconds. EAGER uploads
+# right after the request's transaction commits, in the same thread.
+MEDIA_PIPELINE = {
+    'SCRATCH_DIR': os.environ.get(
+        'MEDIA_SCRATCH_DIR', str(BASE_DIR / 'scratch')
+    ),
+    'WORKERS': int(os.environ.get('MEDIA_PIPELINE_WORKERS', 4)),
+    'RETRIES': 3,
+    'RETRY_DELAY': 1,
+    'EAGER': False,
+}
+
+# Post image derivatives rendered after upload, by name and width. WORKERS
+# processes render them (0 renders inline); BAKE_FILTER applies the
+# post's image_filter to them.
+IMAGE_DERIVATIVES = {
+    'SIZES': {'thumb': 320, 'feed': 1080, 'full': 2048},
+    'QUALITY': 82,
+    'WORKERS': int(os.environ.get('IMAGE_DERIVATIVE_WORKERS', 2)),
+    'BAKE_FILTER': False,
+}
+
+# Most media URLs media.resolver keeps per process, besides the default
+# images' URLs, which are always kept.
+MEDIA_URL_CACHE_SIZE = 10000
+
+# Resumable chunked image uploads (media.chunked): files of up to
+# MAX_BYTES sent in chunks of at most CHUNK_BYTES. Uploads left incomplete
+# are removed after EXPIRY_HOURS by the expire_chunked_uploads command.
+CHUNKED_UPLOADS = {
+    'MAX_BYTES': 20 * 1024 * 1024,
+    'CHUNK_BYTES': 1024 * 1024,
+    'EXPIRY_HOURS': 24,
+}
+
+# Most posts /posts/batch/ returns in one request
+POST_BATCH_MAX_SIZE = 50
+
+# Comments and likers embedded in each post with ?include=comment_preview
+# and ?include=liker_preview
+POST_PREVIEWS = {
+    'COMMENTS': 2,
+    'LIKERS': 3,
+}
+
+# Follow suggestions: the in-memory follow graph is rebuilt from the table
+# after MAX_AGE seconds, counts at most MAX_EDGES follows per request and
+# returns LIMIT suggestions by default, MAX_LIMIT at most.
+FOLLOW_GRAPH = {
+    'MAX_AGE': int(os.environ.get('FOLLOW_GRAPH_MAX_AGE', 300)),
+    'MAX_EDGES': 250000,
+    'LIMIT': 10,
+    'MAX_LIMIT': 50,
+}
+
+# Comment trees: /posts/<id>/comment-tree/ returns PAGE_SIZE top-level
+# comments per page with replies down to DEPTH levels (at most MAX_DEPTH)
+# and at most MAX_NODES comments in all. Replies nest MAX_DEPTH levels at
+# most, which keeps materialized paths within their column.
+COMMENT_TREE = {
+    'PAGE_SIZE': 10,
+    'DEPTH': 3,
+    'MAX_DEPTH': 30,
+    'MAX_NODES': 500,
+}
+
+# Comment reactions are counted into SHARDS rows per comment before being
+# folded into its counters, so bursts do not queue on one row lock.
+COMMENT_REACTIONS = {
+    'SHARDS': 8,
+}
+
+# Home timeline fan-out: posts of accounts with more followers than the
+# limit are merged into followers' feeds at read time instead of written
+# to every timeline. Timelines over the maximum length are cut back by
+# the trim_timelines management command, which should run periodically.
+TIMELINE_FANOUT_LIMIT = int(os.environ.get('TIMELINE_FANOUT_LIMIT', 1000))
+TIMELINE_BACKFILL_SIZE = 100
+TIMELINE_MAX_LENGTH = 800
+
+# Trending posts: activity loses half its weight every half-life.
+TRENDING_HALF_LIFE_HOURS = 24
+TRENDING_WEIGHTS = {'likes': 1, 'comments': 2, 'shares': 3}
+TRENDING_WINDOW_DAYS = 14
+TRENDING_REBASE_DAYS = 30
+# Runs stop this far behind now, so activity stamped before a run but
+# committed after it is still picked up by the next one.
+TRENDING_SETTLE_SECONDS = 60
+TRENDING_DEFAULT_RESULTS = 10
+TRENDING_MAX_RESULTS = 50
+
+# Response cache for anonymous list endpoints. Local memory by default;
+# point RESPONSE_CACHE_BACKEND/LOCATION at a shared cache (e.g. memcached)
+# so every worker shares entries and invalidations.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': os.environ.get(
+            'RESPONSE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('RESPONSE_CACHE_LOCATION', 'responses'),
+    },
+}
+RESPONSE_CACHE = {
+    'ALIAS': 'responses',
+    'TIMEOUT': 60,
+    'KEY_PREFIX': 'response',
+}
+
 REST_USE_JWT = True
 JWT_AUTH_SECURE = True
 JWT_AUTH_COOKIE = 'my-app-auth'
@@ -82,6 +212,9 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'django.contrib.sites',
 
+    # Project-wide utilities (response cache invalidation)
+    'drf_api',
+
     # Third-party apps
     'cloudinary_storage',
     'cloudinary',
@@ -101,6 +234,9 @@ INSTALLED_APPS = [
     'followers',
     'reports',
     'shares',
+    'timelines',
+    'trending',
+    'media',
 ]
 
 
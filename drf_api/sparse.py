@@ -0,0 +1,167 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+
+"""
+Sparse fieldsets through the `?fields=` and `?omit=` query parameters.
+
+`?fields=id,event,owner` keeps only the listed serializer fields and
+`?omit=description` drops the listed ones. The serializer mixin prunes
+its fields, so dropped method fields never run their queries; the view
+mixin derives the columns and joins the remaining fields read and
+restricts the queryset to them with `only()` and `select_related()`,
+adding only the annotations that are still needed.
+
+Writes are never pruned, so `?fields=` on a POST or PUT has no effect.
+
+Functions:
+    is_sparse(request): Whether a request restricts its fields.
+    get_sparse_fieldset(request, names): Names of the requested fields.
+
+Classes:
+    SparseFieldsetSerializerMixin: Serializer mixin pruning its fields.
+    SparseFieldsetMixin: View mixin restricting the queryset to the
+                         pruned serializer's fields.
+"""
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def split_param(request, param):
+    value = request.query_params.get(param, '')
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def is_sparse(request):
+    """
+    Returns True if `request` is a read restricting its fields.
+    """
+    return (
+        request is not None and
+        request.method in SAFE_METHODS and
+        bool(split_param(request, FIELDS_PARAM) or
+             split_param(request, OMIT_PARAM))
+    )
+
+
+def get_sparse_fieldset(request, names):
+    """
+    Returns the subset of `names` the request asks for, or None if the
+    request does not restrict its fields.
+
+    Raises:
+        ValidationError: If the request names an unknown field.
+    """
+    if not is_sparse(request):
+        return None
+    fields = split_param(request, FIELDS_PARAM)
+    omit = split_param(request, OMIT_PARAM)
+    unknown = [name for name in fields + omit if name not in names]
+    if unknown:
+        raise serializers.ValidationError({
+            FIELDS_PARAM: [f'Unknown field: {name}.' for name in unknown]
+        })
+    kept = fields or names
+    return [name for name in names if name in kept and name not in omit]
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Serializer mixin keeping only the fields a read request asks for.
+
+    Only the top-level serializer (or the child of a top-level list) is
+    pruned. Method fields read model fields the view cannot infer, so
+    serializers list those in `sparse_sources`, mapping a field name to
+    the ORM paths its method reads.
+    """
+    sparse_sources = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        root = self.parent if isinstance(
+            self.parent, serializers.ListSerializer
+        ) else self
+        if root.parent is not None:
+            return fields
+        kept = get_sparse_fieldset(self.context.get('request'), list(fields))
+        if kept is None:
+            return fields
+        return {name: fields[name] for name in kept}
+
+    def get_source_paths(self):
+        """
+        Returns the ORM paths the serializer's current fields read.
+        """
+        model = self.Meta.model
+        paths = set()
+        for name, field in self.fields.items():
+            if name in self.sparse_sources:
+                paths.update(self.sparse_sources[name])
+                continue
+            parts = []
+            opts = model._meta
+            for attr in field.source_attrs:
+                try:
+                    model_field = opts.get_field(attr)
+                except FieldDoesNotExist:
+                    break
+                parts.append(attr)
+                if not model_field.is_relation or model_field.many_to_many:
+                    break
+                opts = model_field.related_model._meta
+            if parts:
+                paths.add(LOOKUP_SEP.join(parts))
+        return paths
+
+
+class SparseFieldsetMixin:
+    """
+    View mixin restricting the queryset to the columns and joins the
+    sparse serializer reads.
+
+    Views move annotations the serializer exposes into
+    `sparse_annotations`; they are added when their field is kept or the
+    request orders by them.
+    """
+    sparse_annotations = {}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer = self.get_serializer()
+        sparse = is_sparse(self.request)
+        ordering = [
+            term.lstrip('-') for term in split_param(
+                self.request, api_settings.ORDERING_PARAM
+            )
+        ]
+        annotations = {
+            name: expression
+            for name, expression in self.sparse_annotations.items()
+            if not sparse or name in serializer.fields or name in ordering
+        }
+        queryset = queryset.annotate(**annotations)
+        if not sparse:
+            return queryset
+
+        model = queryset.model
+        columns = set()
+        relations = set()
+        for path in serializer.get_source_paths():
+            if path in annotations:
+                continue
+            columns.add(path)
+            parts = path.split(LOOKUP_SEP)
+            # Every relation traversed on the way must be joined
+            relations.update(
+                LOOKUP_SEP.join(parts[:end]) for end in range(1, len(parts))
+            )
+        columns.add(model._meta.pk.name)
+        queryset = queryset.select_related(None)
+        if relations:
+            # select_related() without arguments would follow every
+            # foreign key
+            queryset = queryset.select_related(*sorted(relations))
+        return queryset.only(*columns)
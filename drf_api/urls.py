@@ -15,11 +15,12 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from .views import root_route, logout_route
+from .views import root_route, logout_route, metrics_route
 
 urlpatterns = [
     path('', root_route),
     path('admin/', admin.site.urls),
+    path('metrics/', metrics_route),
     path('api-auth/', include('rest_framework.urls')),
     path('dj-rest-auth/logout/', logout_route),
     path('dj-rest-auth/', include('dj_rest_auth.urls')),
@@ -27,9 +28,12 @@ urlpatterns = [
          include('dj_rest_auth.registration.urls')),
     path('', include('profiles.urls')),
     path('', include('posts.urls')),
+    path('', include('trending.urls')),
     path('', include('comments.urls')),
     path('', include('likes.urls')),
     path('', include('followers.urls')),
     path('', include('reports.urls')),
     path('', include('shares.urls')),
+    path('', include('timelines.urls')),
+    path('', include('media.urls')),
 ]
@@ -1,5 +1,9 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
+from media.pipeline import pipeline_stats
+from media.resolver import resolver_stats
+from .cache import response_cache_stats
 from .settings import (
     JWT_AUTH_COOKIE, JWT_AUTH_REFRESH_COOKIE, JWT_AUTH_SAMESITE,
     JWT_AUTH_SECURE,
@@ -15,6 +19,8 @@ Functions:
     logout_route(request): Handles user logout by clearing JWT authentication
                            and refresh cookies, ensuring secure logout
                            from the API.
+
+    metrics_route(request): Returns runtime statistics for staff users.
 """
 
 
@@ -48,3 +54,13 @@ def logout_route(request):
         secure=JWT_AUTH_SECURE,
     )
     return response
+
+
+@api_view()
+@permission_classes([IsAdminUser])
+def metrics_route(request):
+    return Response({
+        'response_cache': response_cache_stats(),
+        'media_pipeline': pipeline_stats(),
+        'media_urls': resolver_stats(),
+    })
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class FollowersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'followers'
+
+    def ready(self):
+        # Keep the in-memory follow graph up to date with follows
+        from .graph import connect_signals
+        connect_signals()
@@ -1,5 +1,7 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
 from django.contrib.auth.models import User
+from profiles.models import adjust_profile_counter
 
 
 class Follower(models.Model):
@@ -25,3 +27,26 @@ class Follower(models.Model):
 
     def __str__(self):
         return f'{self.owner} {self.followed}'
+
+
+def increment_follow_counts(sender, instance, created, **kwargs):
+    """
+    Signal handler that increments the followed user's `followers_count`
+    and the follower's `following_count` when a new Follower is created.
+    """
+    if created:
+        adjust_profile_counter(instance.followed_id, 'followers_count', 1)
+        adjust_profile_counter(instance.owner_id, 'following_count', 1)
+
+
+def decrement_follow_counts(sender, instance, **kwargs):
+    """
+    Signal handler that decrements both counts when a Follower is deleted,
+    including cascaded deletes.
+    """
+    adjust_profile_counter(instance.followed_id, 'followers_count', -1)
+    adjust_profile_counter(instance.owner_id, 'following_count', -1)
+
+
+post_save.connect(increment_follow_counts, sender=Follower)
+post_delete.connect(decrement_follow_counts, sender=Follower)
@@ -1,4 +1,9 @@
+from unittest import mock
 from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from .graph import (
+    FollowGraph, apply_change, get_follow_graph, reset_follow_graph,
+)
 from .models import Follower
 from posts.models import Post
 from rest_framework import status
@@ -171,3 +176,66 @@ class FollowerDetailViewTest(APITestCase):
         """
         response = self.client.delete('/followers/1/')
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class FollowGraphTest(SimpleTestCase):
+    """
+    Tests for the in-memory follow graph.
+    """
+
+    def setUp(self):
+        self.graph = FollowGraph()
+        for owner_id, followed_id in [
+            (1, 2), (1, 3), (2, 4), (3, 4), (3, 5), (2, 1), (3, 2),
+        ]:
+            self.graph.add(owner_id, followed_id)
+
+    def test_suggestions_rank_by_mutual_follows(self):
+        """
+        Ensure friends of friends are ranked by mutual count, excluding
+        the user and the users they already follow.
+        """
+        self.assertEqual(self.graph.suggest(1, 10), [(4, 2), (5, 1)])
+        self.assertEqual(self.graph.suggest(1, 1), [(4, 2)])
+
+    def test_incremental_updates_keep_arrays_sorted(self):
+        """
+        Ensure follows and unfollows update the sorted arrays in place.
+        """
+        self.graph.add(1, 5)
+        self.graph.add(1, 5)
+        self.graph.remove(1, 2)
+        self.assertEqual(list(self.graph.follows(1)), [3, 5])
+        self.assertEqual(self.graph.suggest(1, 10), [(2, 1), (4, 1)])
+
+    def test_stale_graph_is_served_while_rebuilding(self):
+        """
+        Ensure a stale graph is rebuilt in the background, keeps being
+        served meanwhile, and the new graph gets the follows committed
+        during the rebuild.
+        """
+        reset_follow_graph()
+        self.addCleanup(reset_follow_graph)
+        old, new = FollowGraph(), FollowGraph()
+        with mock.patch.object(FollowGraph, 'build', return_value=old):
+            self.assertIs(get_follow_graph(), old)
+        old.built_at -= 3600
+        with mock.patch('followers.graph.threading.Thread') as thread:
+            self.assertIs(get_follow_graph(), old)
+            self.assertIs(get_follow_graph(), old)
+        thread.assert_called_once()
+        apply_change('add', 1, 2)
+        self.assertEqual(list(old.follows(1)), [2])
+        with mock.patch.object(FollowGraph, 'build', return_value=new):
+            thread.call_args.kwargs['target']()
+        self.assertIs(get_follow_graph(), new)
+        self.assertEqual(list(new.follows(1)), [2])
+
+    @override_settings(FOLLOW_GRAPH={'MAX_EDGES': 3})
+    def test_edge_budget_samples_friends(self):
+        """
+        Ensure no more follows than the budget are counted.
+        """
+        sample = self.graph.sample(1, self.graph.follows(1))
+        self.assertEqual(len(sample), 1)
+        self.assertLessEqual(len(sample[0]), 3)
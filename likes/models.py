@@ -1,6 +1,7 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
 from django.contrib.auth.models import User
-from posts.models import Post
+from posts.models import Post, adjust_post_counter
 
 
 class Like(models.Model):
@@ -21,6 +22,8 @@ class Like(models.Model):
     latest likes appear first.
     - `constraints`: Ensures a unique constraint on the `owner` and `post`
     fields so that each user can only like a specific post once.
+    - `indexes`: Indexes `created_at` so the trending computation reads
+    recent likes with a range scan.
 
     Methods:
     - `__str__`: Returns a readable string representation of the like instance,
@@ -36,6 +39,30 @@ class Like(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['owner', 'post']
+        indexes = [
+            models.Index(fields=['created_at'], name='like_created_at_idx'),
+        ]
 
     def __str__(self):
         return f'{self.owner} liked "{self.post}"'
+
+
+def increment_post_likes_count(sender, instance, created, **kwargs):
+    """
+    Signal handler that increments the post's `likes_count`
+    when a new Like is created.
+    """
+    if created:
+        adjust_post_counter(instance.post_id, 'likes_count', 1)
+
+
+def decrement_post_likes_count(sender, instance, **kwargs):
+    """
+    Signal handler that decrements the post's `likes_count`
+    when a Like is deleted, including cascaded deletes.
+    """
+    adjust_post_counter(instance.post_id, 'likes_count', -1)
+
+
+post_save.connect(increment_post_likes_count, sender=Like)
+post_delete.connect(decrement_post_likes_count, sender=Like)
@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import generics, permissions
 from drf_api.permissions import IsOwnerOrReadOnly
 from likes.models import Like
@@ -22,7 +23,9 @@ class LikeList(generics.ListCreateAPIView):
     queryset = Like.objects.all()
 
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+        # Save the like and bump the post's likes_count together
+        with transaction.atomic():
+            serializer.save(owner=self.request.user)
 
 
 class LikeDetail(generics.RetrieveDestroyAPIView):
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class MediaConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'media'
+
+    def ready(self):
+        # Default images are shared by most rows; keep their URLs cached
+        from .resolver import pin_default_images
+        pin_default_images(self.apps.get_models())
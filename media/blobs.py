@@ -0,0 +1,120 @@
+import hashlib
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import MediaBlob
+
+"""
+Content-addressed deduplication of stored images.
+
+Uploads are hashed while they stream in and `MediaBlob` indexes stored
+files by that hash, so an image that is already stored is referenced
+again instead of being uploaded a second time. Each image field pointing
+at a blob holds one reference; a blob's file is deleted from storage
+when its last reference is released, because its object was deleted or
+its image replaced.
+
+Files that are not in the index, such as the default images and uploads
+stored before deduplication, are never deleted.
+
+Functions:
+    file_digest(file): SHA-256 of a file's content.
+    acquire(digest): Takes a reference to an already stored file.
+    store(digest, name, size, storage): Indexes a newly stored file.
+    release(name, storage): Drops a reference to a stored file.
+    release_image(sender, instance, **kwargs): Releases the image of a
+        deleted object.
+"""
+
+
+def file_digest(file):
+    """
+    Returns the hex SHA-256 of `file`, which is rewound afterwards.
+    """
+    sha256 = hashlib.sha256()
+    for chunk in file.chunks():
+        sha256.update(chunk)
+    file.seek(0)
+    return sha256.hexdigest()
+
+
+def acquire(digest):
+    """
+    Takes a reference to the stored file with content `digest`.
+
+    Returns:
+        str: The file's name in storage, or None if it is not stored.
+    """
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().filter(
+            digest=digest
+        ).first()
+        if blob is None:
+            return None
+        MediaBlob.objects.filter(pk=blob.pk).update(
+            refcount=F('refcount') + 1
+        )
+    return blob.name
+
+
+def store(digest, name, size, storage):
+    """
+    Indexes a file just saved to `storage` as `name`, holding one
+    reference to it.
+
+    If an identical file was indexed concurrently, that one is referenced
+    instead and the new copy is deleted.
+
+    Returns:
+        str: The name of the stored file to use.
+    """
+    while True:
+        existing = acquire(digest)
+        if existing is not None:
+            storage.delete(name)
+            return existing
+        try:
+            with transaction.atomic():
+                MediaBlob.objects.create(
+                    digest=digest, name=name, size=size, refcount=1
+                )
+            return name
+        except IntegrityError:
+            # Indexed by another upload since acquire() looked
+            continue
+
+
+def release(name, storage):
+    """
+    Drops a reference to the file stored as `name`, deleting it from
+    `storage` once nothing references it.
+
+    Returns:
+        bool: True if the file was deleted.
+    """
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().filter(
+            name=name
+        ).first()
+        if blob is None:
+            return False
+        if blob.refcount > 1:
+            MediaBlob.objects.filter(pk=blob.pk).update(
+                refcount=F('refcount') - 1
+            )
+            return False
+        blob.delete()
+    storage.delete(name)
+    return True
+
+
+def release_image(sender, instance, **kwargs):
+    """
+    Releases the image of a deleted object once the deletion commits.
+
+    This function is connected to the Django `post_delete` signal of
+    models with an `image` field.
+    """
+    name = instance.image.name
+    storage = instance.image.storage
+    if name:
+        transaction.on_commit(lambda: release(name, storage))
@@ -0,0 +1,280 @@
+import hashlib
+import os
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+from .intake import (
+    ImageInfo, ImageRejected, IntakeImageField, check_image, open_header,
+)
+from .models import ChunkedUpload
+
+"""
+Resumable chunked image uploads.
+
+A client creates an upload with the file's name, size and SHA-256, then
+sends the file in chunks, each as the raw body of a `PUT` with an
+`Upload-Offset` header giving its position. A `GET` reports how many
+bytes have been received, so an interrupted upload resumes where it
+stopped instead of starting over.
+
+Chunks are streamed to a file in scratch storage in reads of
+`READ_SIZE`, so a worker holds no more than that of an upload in memory,
+however large the file. The header checks of `media.intake` run as soon
+as the image header has arrived, and the checksum is verified once the
+last chunk is in. The upload's token is then accepted in place of a file
+by `UploadTokenField`, for files of up to `CHUNKED_UPLOADS['MAX_BYTES']`.
+
+Functions:
+    chunk_path(upload): Where an upload's chunks are kept.
+    append_chunk(upload, stream, offset, length): Writes one chunk.
+    discard(upload): Deletes an upload and its chunks.
+
+Classes:
+    OffsetConflict: Raised for chunks that do not continue the upload.
+    ChunkedUploadSerializer: Creates uploads and reports their progress.
+    ChunkedUploadFile: A completed upload, as an uploaded file.
+    UploadTokenField: Accepts the token of a completed upload.
+"""
+
+READ_SIZE = 64 * 1024
+
+
+class OffsetConflict(APIException):
+    """
+    Raised when a chunk does not start where the upload left off. The
+    response tells the client the offset to resume from.
+    """
+    status_code = status.HTTP_409_CONFLICT
+    default_code = 'offset_conflict'
+
+    def __init__(self, received):
+        super().__init__(
+            {'detail': 'Chunk does not start at the received offset.'}
+        )
+        self.detail['received'] = received
+
+
+def chunk_path(upload):
+    return os.path.join(
+        settings.MEDIA_PIPELINE['SCRATCH_DIR'], 'chunks', upload.token
+    )
+
+
+def discard(upload):
+    """
+    Deletes an upload and the chunks received for it.
+    """
+    try:
+        os.remove(chunk_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def rejection(code):
+    return serializers.ValidationError({
+        'image': IntakeImageField.default_error_messages[code].format(
+            max_mb=settings.IMAGE_MAX_UPLOAD_BYTES // (1024 * 1024),
+            max_dimension=settings.IMAGE_MAX_DIMENSION,
+        )
+    })
+
+
+def append_chunk(upload, stream, offset, length):
+    """
+    Appends `length` bytes read from `stream` to an upload.
+
+    A chunk may be resent after an interrupted request: anything written
+    past the last acknowledged offset is overwritten. The upload is
+    discarded if its header fails the intake checks or the checksum does
+    not match.
+
+    Raises:
+        OffsetConflict: If `offset` is not the number of bytes received.
+        ValidationError: If the chunk is too large, incomplete, or the
+        file is rejected.
+    """
+    if upload.completed_at is not None:
+        raise serializers.ValidationError(
+            {'detail': 'Upload is already complete.'}
+        )
+    if offset != upload.received:
+        raise OffsetConflict(upload.received)
+    if length > settings.CHUNKED_UPLOADS['CHUNK_BYTES']:
+        raise serializers.ValidationError({'detail': (
+            'Chunks may be at most '
+            f'{settings.CHUNKED_UPLOADS["CHUNK_BYTES"]} bytes.'
+        )})
+    if offset + length > upload.size:
+        raise serializers.ValidationError(
+            {'detail': 'Chunk extends past the declared size.'}
+        )
+
+    path = chunk_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    remaining = length
+    with open(path, 'ab') as file:
+        file.truncate(offset)
+        while remaining:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            file.write(data)
+            remaining -= len(data)
+    if remaining:
+        raise serializers.ValidationError(
+            {'detail': 'Chunk ended before its Content-Length.'}
+        )
+
+    received = offset + length
+    claimed = ChunkedUpload.objects.filter(
+        pk=upload.pk, received=offset, completed_at__isnull=True
+    ).update(received=received, updated_at=timezone.now())
+    if not claimed:
+        # Another request wrote this chunk first
+        upload.refresh_from_db()
+        raise OffsetConflict(upload.received)
+    upload.received = received
+
+    try:
+        if upload.image_format == '':
+            inspect_header(upload, path)
+        if upload.received == upload.size:
+            verify(upload, path)
+    except serializers.ValidationError:
+        discard(upload)
+        raise
+
+
+def inspect_header(upload, path):
+    """
+    Runs the intake checks once the image header has arrived.
+    """
+    with open(path, 'rb') as file:
+        header = file.read(settings.IMAGE_HEADER_BYTES)
+    try:
+        info = open_header(header)
+        if info is None:
+            if (len(header) >= settings.IMAGE_HEADER_BYTES
+                    or upload.received == upload.size):
+                raise ImageRejected('invalid_image')
+            return
+        check_image(info)
+    except ImageRejected as rejected:
+        raise rejection(rejected.code)
+    upload.image_width, upload.image_height = info.width, info.height
+    upload.image_format = info.format
+    upload.save(update_fields=[
+        'image_width', 'image_height', 'image_format', 'updated_at',
+    ])
+
+
+def verify(upload, path):
+    """
+    Completes an upload whose checksum matches the declared one.
+    """
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for data in iter(lambda: file.read(READ_SIZE), b''):
+            sha256.update(data)
+    if sha256.hexdigest() != upload.sha256:
+        raise serializers.ValidationError(
+            {'sha256': 'Checksum does not match the uploaded file.'}
+        )
+    upload.completed_at = timezone.now()
+    upload.save(update_fields=['completed_at', 'updated_at'])
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    """
+    Serializer for chunked uploads. Creating one declares the file;
+    `received` and `complete` report progress.
+    """
+    complete = serializers.SerializerMethodField()
+
+    def get_complete(self, obj):
+        return obj.completed_at is not None
+
+    def validate_filename(self, value):
+        return os.path.basename(value)
+
+    def validate_size(self, value):
+        max_bytes = settings.CHUNKED_UPLOADS['MAX_BYTES']
+        if not 0 < value <= max_bytes:
+            raise serializers.ValidationError(
+                f'Size must be between 1 and {max_bytes} bytes.'
+            )
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if len(value) != 64 or value.strip('0123456789abcdef'):
+            raise serializers.ValidationError(
+                'Expected a hex-encoded SHA-256.'
+            )
+        return value
+
+    class Meta:
+        model = ChunkedUpload
+        fields = [
+            'token', 'filename', 'size', 'sha256', 'received', 'complete',
+            'created_at',
+        ]
+        read_only_fields = ['token', 'received']
+
+
+class ChunkedUploadFile(UploadedFile):
+    """
+    A completed chunked upload, passed through serializers like any
+    uploaded file. Storages saving it move the chunk file in place
+    instead of copying it.
+    """
+
+    def __init__(self, upload):
+        super().__init__(
+            open(chunk_path(upload), 'rb'), name=upload.filename,
+            size=upload.size,
+        )
+        self.upload = upload
+        self.sha256 = upload.sha256
+        self.image_info = ImageInfo(
+            upload.image_width, upload.image_height, upload.image_format
+        )
+
+    def temporary_file_path(self):
+        return self.file.name
+
+    def consume(self):
+        """
+        Closes the file and deletes the upload once it has been staged.
+        """
+        self.close()
+        discard(self.upload)
+
+
+class UploadTokenField(serializers.Field):
+    """
+    Write-only field accepting the token of a completed chunked upload of
+    the requesting user, validated as a `ChunkedUploadFile`.
+    """
+    default_error_messages = {
+        'invalid': 'Unknown or expired upload token.',
+        'incomplete': 'Upload is not complete yet.',
+    }
+
+    def __init__(self, **kwargs):
+        kwargs['write_only'] = True
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        user = self.context['request'].user
+        upload = ChunkedUpload.objects.filter(
+            token=str(data), owner__pk=user.pk
+        ).first()
+        if upload is None or not os.path.exists(chunk_path(upload)):
+            self.fail('invalid')
+        if upload.completed_at is None:
+            self.fail('incomplete')
+        return ChunkedUploadFile(upload)
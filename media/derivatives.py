@@ -0,0 +1,150 @@
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from .render import render
+from .resolver import resolve
+
+"""
+Pre-rendered image derivatives.
+
+Every uploaded post image is rendered at the widths in
+`IMAGE_DERIVATIVES['SIZES']`, optionally with the post's `image_filter`
+baked in, so clients can download the smallest variant that fits instead
+of the full-resolution original.
+
+Derivatives are stored under content-addressed names: the SHA-256 of the
+original plus the width, filter and renderer version. A derivative that
+already exists in storage is never rendered again, so re-uploads of the
+same image and repeated runs cost nothing. Rendering is CPU-bound and
+runs in a process pool of `IMAGE_DERIVATIVES['WORKERS']` processes, or
+inline when that is 0.
+
+Functions:
+    derivative_name(digest, width, filter_name): Content-addressed name.
+    generate_derivatives(source, original_width, filter_name, storage):
+        Renders and stores the missing variants of an image.
+    update_derivatives(model, pk, image_name, source, storage): Generates
+        and records the variants of an object's image.
+    srcset(derivatives, storage): Maps widths to derivative URLs.
+"""
+
+# Bump to re-render every derivative after changing the renderer
+RENDER_VERSION = 1
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned workers do not inherit the web process's threads,
+            # database connections or locks
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_DERIVATIVES['WORKERS'],
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def derivative_name(digest, width, filter_name):
+    return (
+        f'derivatives/{digest[:2]}/'
+        f'{digest}-{width}w-{filter_name}-v{RENDER_VERSION}.jpg'
+    )
+
+
+def target_widths(original_width):
+    """
+    Returns the distinct widths to render, never wider than the original.
+    """
+    widths = {
+        min(width, original_width)
+        for width in settings.IMAGE_DERIVATIVES['SIZES'].values()
+    }
+    return sorted(widths)
+
+
+def generate_derivatives(source, original_width, filter_name, storage):
+    """
+    Renders and stores the derivatives of an image that are not in
+    storage yet.
+
+    Args:
+        source (bytes): The original image.
+        original_width (int): Its width, as read at intake.
+        filter_name (str): The post's `image_filter`; baked in only when
+                           `IMAGE_DERIVATIVES['BAKE_FILTER']` is set.
+        storage (Storage): Where derivatives are kept.
+
+    Returns:
+        dict: `{'filter': ..., 'widths': {width: name}}`, the value stored
+        in `Post.image_derivatives`.
+    """
+    if not settings.IMAGE_DERIVATIVES['BAKE_FILTER']:
+        filter_name = 'normal'
+    digest = hashlib.sha256(source).hexdigest()
+    quality = settings.IMAGE_DERIVATIVES['QUALITY']
+    names = {}
+    missing = []
+    for width in target_widths(original_width):
+        name = derivative_name(digest, width, filter_name)
+        names[str(width)] = name
+        if not storage.exists(name):
+            missing.append((width, name))
+
+    if settings.IMAGE_DERIVATIVES['WORKERS']:
+        executor = get_executor()
+        rendered = [
+            (name, executor.submit(render, source, width, filter_name,
+                                   quality))
+            for width, name in missing
+        ]
+        rendered = [(name, future.result()) for name, future in rendered]
+    else:
+        rendered = [
+            (name, render(source, width, filter_name, quality))
+            for width, name in missing
+        ]
+    for name, (data, *_) in rendered:
+        # Content-addressed names must be stored exactly as computed
+        if not storage.exists(name):
+            storage.save(name, ContentFile(data))
+    return {'filter': filter_name, 'widths': names}
+
+
+def srcset(derivatives, storage):
+    """
+    Maps `'<width>w'` to the URL of each derivative, for use as a
+    `srcset`. Empty when the image has no derivatives.
+    """
+    return {
+        f'{width}w': resolve(storage, name, RENDER_VERSION)
+        for width, name in derivatives.get('widths', {}).items()
+    }
+
+
+def update_derivatives(model, pk, image_name, source, storage):
+    """
+    Generates the derivatives of the image of `model` row `pk` from its
+    original bytes and records them in its `image_derivatives`.
+
+    Returns:
+        bool: True if the row still has `image_name` as its image and was
+        updated.
+    """
+    rows = model._default_manager.filter(pk=pk, image=image_name)
+    row = rows.values('image_width', 'image_filter').first()
+    if row is None or row['image_width'] is None:
+        return False
+    derivatives = generate_derivatives(
+        source, row['image_width'], row['image_filter'], storage
+    )
+    return bool(rows.update(
+        image_derivatives=derivatives, updated_at=timezone.now()
+    ))
@@ -0,0 +1,273 @@
+import hashlib
+import io
+from collections import namedtuple
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from PIL import Image
+from rest_framework import serializers
+from .resolver import media_url
+
+"""
+Header-only image intake.
+
+Uploaded images are checked from their header alone: Pillow's
+`Image.open()` only parses the header, so the size, dimensions and format
+of an upload are known after the first few kilobytes without decoding a
+single pixel. `ImageIntakeUploadHandler` runs these checks while the
+request body streams in and skips a file as soon as it is too large or
+not an image, before the rest of it is buffered. `IntakeImageField`
+repeats the header check on the stored upload and reports why a file was
+rejected.
+
+The handler also hashes each upload as it streams in, for content-addressed
+deduplication (see `media.blobs`); the validated file carries the digest
+as `sha256`.
+
+Functions:
+    probe_chunks(chunks): Reads an image header from an iterable of bytes.
+    probe_image(file): Reads an image header from a file.
+    check_image(info): Checks dimensions and format against the settings.
+
+Classes:
+    ImageRejected: Raised for uploads failing the intake checks.
+    ImageIntakeUploadHandler: Upload handler checking images as they
+                              stream in.
+    IntakeImageField: Image field validated from the header only.
+    ImageIntakeSerializerMixin: Stores the upload's dimensions on the
+                                model.
+"""
+
+ImageInfo = namedtuple('ImageInfo', ['width', 'height', 'format'])
+
+READ_SIZE = 16 * 1024
+
+
+class ImageRejected(Exception):
+    """
+    Raised when an upload fails an intake check. `code` names the check,
+    matching an error message of `IntakeImageField`.
+    """
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+def probe_chunks(chunks):
+    """
+    Identifies an image from its first bytes.
+
+    Args:
+        chunks (iterable): Byte strings making up the start of the file.
+
+    Returns:
+        ImageInfo: The image's width, height and format.
+
+    Raises:
+        ImageRejected: If no image header is found within
+        `IMAGE_HEADER_BYTES`, or the image is a decompression bomb.
+    """
+    header = b''
+    for chunk in chunks:
+        header += chunk
+        info = open_header(header)
+        if info is not None:
+            return info
+        if len(header) >= settings.IMAGE_HEADER_BYTES:
+            break
+    raise ImageRejected('invalid_image')
+
+
+def open_header(header):
+    try:
+        with Image.open(io.BytesIO(header)) as image:
+            return ImageInfo(image.width, image.height, image.format)
+    except Image.DecompressionBombError:
+        raise ImageRejected('too_many_pixels')
+    except (OSError, SyntaxError, ValueError):
+        # Not an image, or the header is not complete yet
+        return None
+
+
+def probe_image(file):
+    """
+    Identifies an image from the start of `file`, which is rewound
+    afterwards.
+    """
+    file.seek(0)
+    try:
+        return probe_chunks(iter(lambda: file.read(READ_SIZE), b''))
+    finally:
+        file.seek(0)
+
+
+def check_image(info):
+    """
+    Raises ImageRejected if `info` is not an accepted format or exceeds
+    `IMAGE_MAX_DIMENSION` on either side.
+    """
+    if info.format not in settings.IMAGE_FORMATS:
+        raise ImageRejected('invalid_format')
+    if info.height > settings.IMAGE_MAX_DIMENSION:
+        raise ImageRejected('too_tall')
+    if info.width > settings.IMAGE_MAX_DIMENSION:
+        raise ImageRejected('too_wide')
+
+
+class ImageIntakeUploadHandler(FileUploadHandler):
+    """
+    Upload handler that checks each uploaded file while it streams in.
+
+    It passes every chunk on to the next handler unchanged, so it has to
+    come first in `FILE_UPLOAD_HANDLERS`. A file larger than
+    `IMAGE_MAX_UPLOAD_BYTES`, or whose header is not an accepted image
+    within reasonable limits, is skipped; the rest of its body is read and
+    discarded rather than buffered. The reason is recorded in
+    `request.rejected_uploads` for `IntakeImageField` to report, and the
+    SHA-256 of accepted files in `request.upload_digests`.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.header = b''
+        self.checked = False
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        self.sha256.update(raw_data)
+        try:
+            if self.received > settings.IMAGE_MAX_UPLOAD_BYTES:
+                raise ImageRejected('too_large')
+            if not self.checked:
+                self.header += raw_data
+                info = open_header(self.header)
+                if info is not None:
+                    check_image(info)
+                    self.checked = True
+                    self.header = b''
+                elif len(self.header) >= settings.IMAGE_HEADER_BYTES:
+                    raise ImageRejected('invalid_image')
+        except ImageRejected as rejected:
+            self.reject(rejected.code)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not self.checked:
+            # The whole file was shorter than an image header. It is too
+            # late to skip it, but it is still reported as rejected.
+            self.record(self.field_name, 'invalid_image')
+        else:
+            if not hasattr(self.request, 'upload_digests'):
+                self.request.upload_digests = {}
+            self.request.upload_digests[self.field_name] = (
+                self.sha256.hexdigest()
+            )
+        return None
+
+    def reject(self, code):
+        self.record(self.field_name, code)
+        raise SkipFile()
+
+    def record(self, field_name, code):
+        if not hasattr(self.request, 'rejected_uploads'):
+            self.request.rejected_uploads = {}
+        self.request.rejected_uploads[field_name] = code
+
+
+class RejectedUpload:
+    """
+    Placeholder for a file skipped by `ImageIntakeUploadHandler`.
+    """
+
+    def __init__(self, code):
+        self.code = code
+
+
+class IntakeImageField(serializers.FileField):
+    """
+    Image field validated from the header only.
+
+    Unlike `serializers.ImageField`, the image is never verified or decoded
+    by Pillow, and the URL is served by the memoized resolver. The
+    validated file carries its `ImageInfo` as
+    `image_info` and, when it was hashed while streaming in, its SHA-256
+    as `sha256`.
+    """
+    default_error_messages = {
+        'too_large': 'Image size larger than {max_mb}MB!',
+        'too_tall': 'Image height larger than {max_dimension}px!',
+        'too_wide': 'Image width larger than {max_dimension}px!',
+        'too_many_pixels': 'Image has too many pixels.',
+        'invalid_format': 'Unsupported image format.',
+        'invalid_image': (
+            'Upload a valid image. The file you uploaded was either not an '
+            'image or a corrupted image.'
+        ),
+    }
+
+    def get_value(self, dictionary):
+        request = self.context.get('request')
+        rejected = getattr(request, 'rejected_uploads', {})
+        if self.field_name in rejected:
+            return RejectedUpload(rejected[self.field_name])
+        return super().get_value(dictionary)
+
+    def to_internal_value(self, data):
+        if isinstance(data, RejectedUpload):
+            self.reject(data.code)
+        file = super().to_internal_value(data)
+        try:
+            if file.size > settings.IMAGE_MAX_UPLOAD_BYTES:
+                raise ImageRejected('too_large')
+            info = probe_image(file)
+            check_image(info)
+        except ImageRejected as rejected:
+            self.reject(rejected.code)
+        file.image_info = info
+        request = self.context.get('request')
+        digests = getattr(request, 'upload_digests', {})
+        file.sha256 = digests.get(self.field_name)
+        return file
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        url = media_url(value)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def reject(self, code):
+        self.fail(
+            code,
+            max_mb=settings.IMAGE_MAX_UPLOAD_BYTES // (1024 * 1024),
+            max_dimension=settings.IMAGE_MAX_DIMENSION,
+        )
+
+
+class ImageIntakeSerializerMixin:
+    """
+    ModelSerializer mixin copying the dimensions of a newly uploaded
+    `image` into the model's `image_width` and `image_height` fields.
+
+    A completed chunked upload sent as `image_upload` is used as the
+    `image`.
+    """
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        upload = attrs.pop('image_upload', None)
+        if upload is not None:
+            if attrs.get('image'):
+                raise serializers.ValidationError({
+                    'image_upload': 'Send either image or image_upload.'
+                })
+            attrs['image'] = upload
+        info = getattr(attrs.get('image'), 'image_info', None)
+        if info is not None:
+            attrs['image_width'] = info.width
+            attrs['image_height'] = info.height
+        return attrs
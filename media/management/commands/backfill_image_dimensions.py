@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from media.intake import ImageRejected, probe_image
+from posts.models import Post
+from profiles.models import Profile
+
+
+class Command(BaseCommand):
+    """
+    Stores `image_width` and `image_height` for posts and profiles
+    uploaded before image intake recorded them.
+
+    Only the header of each stored image is read. Default images are
+    skipped, and images that cannot be identified are reported and left
+    without dimensions.
+    """
+    help = 'Read missing image dimensions from stored image headers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Number of rows to load per query.',
+        )
+
+    def handle(self, *args, **options):
+        for model in (Post, Profile):
+            self.backfill(model, options['batch_size'])
+
+    def backfill(self, model, batch_size):
+        default = model._meta.get_field('image').default
+        rows = model.objects.filter(image_width__isnull=True).exclude(
+            image=default
+        ).exclude(image='').order_by('pk').only('pk', 'image')
+        last_id = 0
+        updated = 0
+        while True:
+            batch = list(rows.filter(pk__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            for row in batch:
+                try:
+                    with row.image.open('rb') as file:
+                        info = probe_image(file)
+                except (ImageRejected, OSError) as error:
+                    self.stderr.write(
+                        f'{model.__name__} {row.pk}: {row.image.name} '
+                        f'skipped ({error})'
+                    )
+                    continue
+                model.objects.filter(pk=row.pk).update(
+                    image_width=info.width, image_height=info.height
+                )
+                updated += 1
+            last_id = batch[-1].pk
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored image dimensions for {updated} '
+            f'{model._meta.verbose_name_plural}.'
+        ))
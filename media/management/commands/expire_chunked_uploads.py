@@ -0,0 +1,28 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from media.chunked import discard
+from media.models import ChunkedUpload
+
+
+class Command(BaseCommand):
+    """
+    Deletes chunked uploads, and the chunks received for them, that have
+    not been touched for `CHUNKED_UPLOADS['EXPIRY_HOURS']`: abandoned
+    uploads and completed ones never used by a post or profile.
+    """
+    help = 'Delete abandoned chunked uploads.'
+
+    def handle(self, *args, **options):
+        expired = timezone.now() - timedelta(
+            hours=settings.CHUNKED_UPLOADS['EXPIRY_HOURS']
+        )
+        uploads = ChunkedUpload.objects.filter(updated_at__lt=expired)
+        deleted = 0
+        for upload in uploads.iterator():
+            discard(upload)
+            deleted += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} chunked uploads.'
+        ))
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q, Value
+from django.db.models.fields.json import KeyTextTransform
+from media.derivatives import update_derivatives
+from media.models import ImageState
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    """
+    Renders image derivatives for posts that have none, or whose baked-in
+    filter no longer matches their `image_filter`. With `--all`, every
+    uploaded post image is processed; derivatives already in storage are
+    reused rather than rendered again.
+    """
+    help = 'Render missing or stale post image derivatives.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Process every uploaded image, not only stale ones.',
+        )
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.filter(
+            image_state=ImageState.READY, image_width__isnull=False
+        )
+        if not options['all']:
+            expected = F('image_filter') if settings.IMAGE_DERIVATIVES[
+                'BAKE_FILTER'
+            ] else Value('normal')
+            posts = posts.annotate(
+                baked_filter=KeyTextTransform('filter', 'image_derivatives')
+            ).filter(Q(image_derivatives={}) | ~Q(baked_filter=expected))
+        posts = posts.order_by('pk').only('pk', 'image')
+        storage = Post._meta.get_field('image').storage
+        last_id = 0
+        updated = 0
+        while True:
+            batch = list(posts.filter(pk__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            for post in batch:
+                try:
+                    with post.image.open('rb') as file:
+                        source = file.read()
+                except OSError as error:
+                    self.stderr.write(f'Post {post.pk}: skipped ({error})')
+                    continue
+                if update_derivatives(
+                    Post, post.pk, post.image.name, source, storage
+                ):
+                    updated += 1
+            last_id = batch[-1].pk
+        self.stdout.write(
+            self.style.SUCCESS(f'Rendered derivatives for {updated} posts.')
+        )
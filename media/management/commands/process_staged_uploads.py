@@ -0,0 +1,49 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from media.models import StagedUpload
+from media.pipeline import process
+
+
+class Command(BaseCommand):
+    """
+    Processes staged uploads left behind in scratch storage, e.g. by a
+    restart of the web process that owned the worker pool.
+
+    Uploads whose last attempt started more than `--stale-minutes` ago
+    are reset from `uploading` to `pending` first. Failed uploads are
+    retried with `--failed`.
+    """
+    help = 'Upload staged media left behind by the worker pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-minutes', type=int, default=30,
+            help='Age after which an upload in progress is considered lost.',
+        )
+        parser.add_argument(
+            '--failed', action='store_true',
+            help='Also retry uploads that have failed.',
+        )
+
+    def handle(self, *args, **options):
+        stale = timezone.now() - timedelta(minutes=options['stale_minutes'])
+        StagedUpload.objects.filter(
+            state=StagedUpload.UPLOADING, updated_at__lt=stale
+        ).update(state=StagedUpload.PENDING)
+        if options['failed']:
+            StagedUpload.objects.filter(state=StagedUpload.FAILED).update(
+                state=StagedUpload.PENDING
+            )
+        uploaded = failed = 0
+        pending = StagedUpload.objects.filter(
+            state=StagedUpload.PENDING
+        ).values_list('pk', flat=True)
+        for staged_id in list(pending):
+            if process(staged_id):
+                uploaded += 1
+            else:
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Uploaded {uploaded} staged files, {failed} not swapped in.'
+        ))
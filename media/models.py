@@ -0,0 +1,145 @@
+import secrets
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+
+class ImageState(models.TextChoices):
+    """
+    Where an object's image is in the upload pipeline.
+    """
+    READY = 'ready', 'Ready'
+    PENDING = 'pending', 'Pending'
+    FAILED = 'failed', 'Failed'
+
+
+class StagedUpload(models.Model):
+    """
+    An uploaded file waiting in local scratch storage to be pushed to the
+    configured storage backend.
+
+    The request that receives an image only writes it to scratch storage
+    and records a StagedUpload; a background worker uploads it and swaps
+    the stored name into the target object's image field.
+
+    Attributes:
+        content_type, object_id, target: The object whose image this is.
+        field_name (CharField): The image field on the target.
+        scratch_name (CharField): The file's name in scratch storage.
+        upload_name (CharField): The name the file is uploaded under.
+        state (CharField): Progress through the pipeline.
+        digest (CharField): SHA-256 of the file, computed as it streamed
+                            in.
+        attempts (PositiveIntegerField): Upload attempts made so far.
+        error (TextField): The last upload error, if any.
+
+    Meta:
+        ordering: Oldest uploads first, the order they are processed in.
+    """
+    PENDING = 'pending'
+    UPLOADING = 'uploading'
+    DONE = 'done'
+    FAILED = 'failed'
+    SUPERSEDED = 'superseded'
+    STATE_CHOICES = [
+        (PENDING, 'Pending'), (UPLOADING, 'Uploading'), (DONE, 'Done'),
+        (FAILED, 'Failed'), (SUPERSEDED, 'Superseded'),
+    ]
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    target = GenericForeignKey('content_type', 'object_id')
+    field_name = models.CharField(max_length=64)
+    scratch_name = models.CharField(max_length=255)
+    upload_name = models.CharField(max_length=255)
+    digest = models.CharField(max_length=64, blank=True)
+    state = models.CharField(
+        max_length=16, choices=STATE_CHOICES, default=PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(
+                fields=['content_type', 'object_id', 'field_name'],
+                name='staged_upload_target_idx',
+            ),
+            models.Index(fields=['state'], name='staged_upload_state_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.upload_name} ({self.state})'
+
+
+class MediaBlob(models.Model):
+    """
+    A stored file, indexed by the hash of its content.
+
+    Uploads of a file that is already stored reuse the stored object
+    instead of uploading it again. `refcount` counts the image fields
+    pointing at it; the file is deleted from storage once nothing does.
+
+    Attributes:
+        digest (CharField): SHA-256 of the file's content.
+        name (CharField): The file's name in storage.
+        size (PositiveIntegerField): The file's size in bytes.
+        refcount (PositiveIntegerField): Image fields referencing the file.
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount})'
+
+
+def new_upload_token():
+    return secrets.token_urlsafe(32)
+
+
+class ChunkedUpload(models.Model):
+    """
+    A resumable upload of an image sent in chunks.
+
+    The chunks received so far are kept in a file in scratch storage.
+    Once complete and verified, the token is accepted in place of an
+    uploaded file by the post and profile serializers.
+
+    Attributes:
+        token (CharField): Identifies the upload to its owner.
+        owner (ForeignKey): The user uploading the file.
+        filename (CharField): The file's original name.
+        size (PositiveBigIntegerField): The file's declared size in bytes.
+        sha256 (CharField): The file's declared SHA-256, verified once the
+                            last chunk is in.
+        received (PositiveBigIntegerField): Bytes received so far.
+        image_width, image_height, image_format: Read from the file's
+            header as soon as it has arrived.
+        completed_at (DateTimeField): When the last chunk was verified.
+    """
+    token = models.CharField(
+        max_length=64, unique=True, default=new_upload_token
+    )
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='chunked_uploads'
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    received = models.PositiveBigIntegerField(default=0)
+    image_width = models.PositiveIntegerField(null=True, blank=True)
+    image_height = models.PositiveIntegerField(null=True, blank=True)
+    image_format = models.CharField(max_length=16, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.filename} ({self.received}/{self.size})'
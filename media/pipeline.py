@@ -0,0 +1,342 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import UploadedFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from drf_api.cache import invalidate_dependents
+from .blobs import acquire, file_digest, release, store
+from .derivatives import update_derivatives
+from .models import ImageState, StagedUpload
+
+"""
+Asynchronous media upload pipeline.
+
+Pushing an image to the storage backend (Cloudinary in production) can
+take seconds, so requests only stage uploads: the file is written to
+local scratch storage, the target object is saved with
+`image_state='pending'`, and once the transaction commits a background
+thread pool uploads the file, with retries, and swaps the stored name
+into the object's image field. Objects with `image_derivatives` then get
+their derivatives rendered from the scratch copy.
+
+Files are deduplicated by content (see `media.blobs`): an upload whose
+hash is already indexed references the stored file instead of being
+uploaded again, and the image it replaces is released.
+
+The pool lives in the web process. Uploads left behind by a restart are
+picked up again by the `process_staged_uploads` command.
+
+Functions:
+    stage_upload(instance, field_name, file): Stages an uploaded file.
+    process(staged_id): Uploads a staged file and swaps it in.
+    pipeline_stats(): Counters of this process's pipeline.
+
+Classes:
+    StagedImageSerializerMixin: Stages uploaded images instead of saving
+                                them during the request.
+"""
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {
+    'staged': 0,
+    'uploaded': 0,
+    'failed': 0,
+    'retried': 0,
+    'deduplicated': 0,
+    'upload_seconds': 0.0,
+}
+
+
+def get_scratch_storage():
+    return FileSystemStorage(location=settings.MEDIA_PIPELINE['SCRATCH_DIR'])
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.MEDIA_PIPELINE['WORKERS'],
+                thread_name_prefix='media-upload',
+            )
+        return _executor
+
+
+def count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def pipeline_stats():
+    """
+    Returns this process's pipeline counters and the number of uploads
+    still waiting in scratch storage.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    uploaded = stats.pop('upload_seconds')
+    stats['mean_upload_seconds'] = (
+        uploaded / stats['uploaded'] if stats['uploaded'] else None
+    )
+    stats['waiting'] = StagedUpload.objects.filter(
+        state__in=[StagedUpload.PENDING, StagedUpload.UPLOADING]
+    ).count()
+    return stats
+
+
+def stage_upload(instance, field_name, file):
+    """
+    Writes `file` to scratch storage and schedules its upload as the
+    image of `instance`, which must already be saved.
+
+    Older uploads for the same field that have not been swapped in yet
+    are superseded, so the newest image always wins.
+
+    Returns:
+        StagedUpload: The staged upload.
+    """
+    field = instance._meta.get_field(field_name)
+    upload_name = field.generate_filename(instance, file.name)
+    # Hashed while streaming in by ImageIntakeUploadHandler
+    digest = getattr(file, 'sha256', None) or file_digest(file)
+    scratch_name = get_scratch_storage().save(
+        os.path.basename(upload_name), file
+    )
+    content_type = ContentType.objects.get_for_model(instance)
+    StagedUpload.objects.filter(
+        content_type=content_type, object_id=instance.pk,
+        field_name=field_name,
+        state__in=[StagedUpload.PENDING, StagedUpload.UPLOADING],
+    ).update(state=StagedUpload.SUPERSEDED)
+    staged = StagedUpload.objects.create(
+        content_type=content_type, object_id=instance.pk,
+        field_name=field_name, scratch_name=scratch_name,
+        upload_name=upload_name, digest=digest,
+    )
+    count('staged')
+    transaction.on_commit(lambda: submit(staged.pk))
+    return staged
+
+
+def submit(staged_id):
+    """
+    Hands a staged upload to the worker pool, or processes it right away
+    when `MEDIA_PIPELINE['EAGER']` is set.
+    """
+    if settings.MEDIA_PIPELINE['EAGER']:
+        process(staged_id)
+    else:
+        get_executor().submit(run_in_worker, staged_id)
+
+
+def run_in_worker(staged_id):
+    close_old_connections()
+    try:
+        process(staged_id)
+    except Exception:
+        logger.exception('Staged upload %s crashed', staged_id)
+    finally:
+        close_old_connections()
+
+
+def process(staged_id):
+    """
+    Uploads a staged file to its field's storage, retrying with
+    exponential backoff, then swaps the stored name into the target.
+    Files that are already stored are referenced instead of uploaded.
+
+    Returns:
+        bool: True if the file was stored and swapped in.
+    """
+    claimed = StagedUpload.objects.filter(
+        pk=staged_id, state=StagedUpload.PENDING
+    ).update(state=StagedUpload.UPLOADING, updated_at=timezone.now())
+    if not claimed:
+        return False
+    staged = StagedUpload.objects.select_related('content_type').get(
+        pk=staged_id
+    )
+    model = staged.content_type.model_class()
+    storage = model._meta.get_field(staged.field_name).storage
+    scratch = get_scratch_storage()
+
+    name = acquire(staged.digest) if staged.digest else None
+    if name is None:
+        name = upload(staged, model, storage, scratch)
+        if name is None:
+            return False
+    else:
+        count('deduplicated')
+
+    has_derivatives = any(
+        field.name == 'image_derivatives' for field in model._meta.fields
+    )
+    swap = {
+        staged.field_name: name,
+        'image_state': ImageState.READY,
+        'updated_at': timezone.now(),
+    }
+    if has_derivatives:
+        # The old image's derivatives no longer apply
+        swap['image_derivatives'] = {}
+    with transaction.atomic():
+        current = StagedUpload.objects.filter(
+            pk=staged.pk, state=StagedUpload.UPLOADING
+        ).update(
+            state=StagedUpload.DONE, attempts=staged.attempts, error=''
+        )
+        target = model._default_manager.select_for_update().filter(
+            pk=staged.object_id
+        )
+        previous = current and target.values_list(
+            staged.field_name, flat=True
+        ).first()
+        swapped = current and target.update(**swap)
+    if not swapped:
+        # Superseded by a newer upload, or the target was deleted
+        discard(staged, name, storage)
+    else:
+        if previous:
+            release(previous, storage)
+        if has_derivatives:
+            render_derivatives(staged, model, name, storage, scratch)
+    scratch.delete(staged.scratch_name)
+    invalidate_dependents(model)
+    return bool(swapped)
+
+
+def upload(staged, model, storage, scratch):
+    """
+    Uploads a staged file, retrying with exponential backoff, and indexes
+    it by its digest. Each attempt bumps the staged upload's `updated_at`,
+    so `process_staged_uploads` does not take it for a lost upload.
+
+    Returns:
+        str: The stored name, or None if every attempt failed.
+    """
+    retries = settings.MEDIA_PIPELINE['RETRIES']
+    for attempt in range(retries + 1):
+        staged.attempts += 1
+        StagedUpload.objects.filter(
+            pk=staged.pk, state=StagedUpload.UPLOADING
+        ).update(attempts=staged.attempts, updated_at=timezone.now())
+        started = time.monotonic()
+        try:
+            with scratch.open(staged.scratch_name, 'rb') as file:
+                name = storage.save(staged.upload_name, file)
+        except Exception as error:
+            staged.error = repr(error)
+            if attempt == retries:
+                fail(staged, model)
+                return None
+            count('retried')
+            time.sleep(settings.MEDIA_PIPELINE['RETRY_DELAY'] * 2 ** attempt)
+        else:
+            count('uploaded')
+            count('upload_seconds', time.monotonic() - started)
+            break
+    if not staged.digest:
+        return name
+    return store(staged.digest, name, scratch.size(staged.scratch_name),
+                 storage)
+
+
+def discard(staged, name, storage):
+    """
+    Drops a stored file that was not swapped in.
+    """
+    if staged.digest:
+        release(name, storage)
+    else:
+        storage.delete(name)
+
+
+def render_derivatives(staged, model, name, storage, scratch):
+    """
+    Renders the derivatives of a freshly swapped-in image from its scratch
+    copy. The upload stands even if rendering fails; the derivatives can
+    be rebuilt with the `generate_derivatives` command.
+    """
+    try:
+        with scratch.open(staged.scratch_name, 'rb') as file:
+            update_derivatives(
+                model, staged.object_id, name, file.read(), storage
+            )
+    except Exception:
+        logger.exception('Derivatives of %s failed', staged.upload_name)
+
+
+def fail(staged, model):
+    """
+    Marks a staged upload and its target as failed. The scratch file is
+    kept so the upload can be retried.
+    """
+    logger.error(
+        'Upload of %s failed after %s attempts: %s',
+        staged.upload_name, staged.attempts, staged.error,
+    )
+    count('failed')
+    with transaction.atomic():
+        current = StagedUpload.objects.filter(
+            pk=staged.pk, state=StagedUpload.UPLOADING
+        ).update(
+            state=StagedUpload.FAILED, attempts=staged.attempts,
+            error=staged.error,
+        )
+        if current:
+            model._default_manager.filter(pk=staged.object_id).update(
+                image_state=ImageState.FAILED, updated_at=timezone.now()
+            )
+    invalidate_dependents(model)
+
+
+class StagedImageSerializerMixin:
+    """
+    ModelSerializer mixin that stages an uploaded `image` instead of
+    uploading it during the request.
+
+    The object is saved with `image_state='pending'` and its previous (or
+    default) image; the new image is swapped in once the pipeline has
+    uploaded it.
+    """
+
+    def create(self, validated_data):
+        upload = self.pop_upload(validated_data)
+        instance = super().create(validated_data)
+        if upload is not None:
+            self.stage(instance, upload)
+        return instance
+
+    def update(self, instance, validated_data):
+        upload = self.pop_upload(validated_data)
+        instance = super().update(instance, validated_data)
+        if upload is not None:
+            self.stage(instance, upload)
+        return instance
+
+    @staticmethod
+    def stage(instance, upload):
+        stage_upload(instance, 'image', upload)
+        # Chunked uploads are done with once moved to scratch storage
+        consume = getattr(upload, 'consume', None)
+        if consume is not None:
+            consume()
+
+    @staticmethod
+    def pop_upload(validated_data):
+        upload = validated_data.get('image')
+        if not isinstance(upload, UploadedFile):
+            return None
+        del validated_data['image']
+        validated_data['image_state'] = ImageState.PENDING
+        return upload
@@ -0,0 +1,118 @@
+import io
+from PIL import Image, ImageEnhance, ImageOps
+
+"""
+Image rendering for derivatives.
+
+Kept free of Django imports so worker processes can import it cheaply.
+
+Each `Post.image_filter` is approximated with Pillow from the CSS filters
+the frontend applies: brightness, contrast and saturation adjustments,
+sepia and grayscale blends, and a colour wash for the tinted filters.
+
+Functions:
+    render(source, width, filter_name, quality): Renders one derivative.
+"""
+
+FILTER_STEPS = {
+    'normal': [],
+    '_1977': [
+        ('contrast', 1.1), ('brightness', 1.1), ('saturation', 1.3),
+        ('tint', (243, 106, 188), 0.1),
+    ],
+    'brannan': [
+        ('sepia', 0.5), ('contrast', 1.4), ('tint', (161, 44, 199), 0.12),
+    ],
+    'earlybird': [
+        ('contrast', 0.9), ('sepia', 0.2), ('tint', (208, 186, 142), 0.15),
+    ],
+    'hudson': [
+        ('brightness', 1.2), ('contrast', 0.9), ('saturation', 1.1),
+        ('tint', (166, 177, 255), 0.1),
+    ],
+    'inkwell': [
+        ('sepia', 0.3), ('contrast', 1.1), ('brightness', 1.1),
+        ('grayscale', 1.0),
+    ],
+    'lofi': [('saturation', 1.1), ('contrast', 1.5)],
+    'kelvin': [('tint', (183, 125, 33), 0.25), ('brightness', 1.05)],
+    'nashville': [
+        ('sepia', 0.2), ('contrast', 1.2), ('brightness', 1.05),
+        ('saturation', 1.2), ('tint', (247, 176, 153), 0.15),
+    ],
+    'rise': [
+        ('brightness', 1.05), ('sepia', 0.2), ('contrast', 0.9),
+        ('saturation', 0.9), ('tint', (236, 205, 169), 0.12),
+    ],
+    'toaster': [
+        ('contrast', 1.5), ('brightness', 0.9),
+        ('tint', (128, 78, 15), 0.15),
+    ],
+    'valencia': [
+        ('contrast', 1.08), ('brightness', 1.08), ('sepia', 0.08),
+        ('tint', (58, 3, 57), 0.08),
+    ],
+    'walden': [
+        ('brightness', 1.1), ('sepia', 0.3), ('saturation', 1.6),
+        ('tint', (0, 68, 204), 0.1),
+    ],
+    'xpro2': [('sepia', 0.3), ('tint', (230, 231, 224), 0.1)],
+}
+
+
+def sepia(image):
+    gray = ImageOps.grayscale(image)
+    return ImageOps.colorize(gray, (20, 12, 0), (255, 240, 192))
+
+
+def apply_filter(image, filter_name):
+    """
+    Applies the steps approximating `filter_name` to an RGB image.
+    """
+    for step, *args in FILTER_STEPS.get(filter_name, []):
+        if step == 'brightness':
+            image = ImageEnhance.Brightness(image).enhance(args[0])
+        elif step == 'contrast':
+            image = ImageEnhance.Contrast(image).enhance(args[0])
+        elif step == 'saturation':
+            image = ImageEnhance.Color(image).enhance(args[0])
+        elif step == 'sepia':
+            image = Image.blend(image, sepia(image), args[0])
+        elif step == 'grayscale':
+            image = Image.blend(
+                image, ImageOps.grayscale(image).convert('RGB'), args[0]
+            )
+        elif step == 'tint':
+            colour, amount = args
+            image = Image.blend(
+                image, Image.new('RGB', image.size, colour), amount
+            )
+    return image
+
+
+def render(source, width, filter_name='normal', quality=82):
+    """
+    Renders a JPEG derivative of an image.
+
+    Args:
+        source (bytes): The original image.
+        width (int): The derivative's width; never wider than the original.
+        filter_name (str): The `image_filter` to bake in.
+        quality (int): JPEG quality.
+
+    Returns:
+        tuple: `(data, width, height)` of the rendered JPEG.
+    """
+    with Image.open(io.BytesIO(source)) as original:
+        # Decode JPEGs at a reduced scale no smaller than the target on
+        # either side, whichever way the image turns out to be rotated
+        original.draft('RGB', (width, width))
+        image = ImageOps.exif_transpose(original)
+        if width < image.width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        image = apply_filter(image.convert('RGB'), filter_name)
+    output = io.BytesIO()
+    image.save(output, 'JPEG', quality=quality, optimize=True,
+               progressive=True)
+    return output.getvalue(), image.width, image.height
@@ -0,0 +1,159 @@
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import FileField
+from rest_framework import serializers
+
+"""
+Memoized media URL resolution.
+
+Every image URL in a response is built by the storage backend, which for
+Cloudinary means assembling and signing the URL in Python on every call,
+many times per page for the same few profile images. `resolve()` keeps
+built URLs in a bounded LRU cache keyed on the storage, the stored name
+and a version. Stored names are never reused for different content (the
+upload pipeline and derivatives use unique or content-addressed names),
+so entries never go stale; backends that overwrite files in place should
+pass a `version`.
+
+The shared default images of image fields (`default_post_xxhr8e`,
+`default_profile_twcgma`) appear on most rows; their URLs are pinned
+outside the LRU so they are never evicted. Hits and misses are reported
+on `/metrics/` through `resolver_stats()`.
+
+Functions:
+    resolve(storage, name, version): The URL of a stored file.
+    media_url(file, version): The URL of a model's FieldFile.
+    pin_default_images(models): Pins the default images of image fields.
+    resolver_stats(): Cache counters of this process.
+
+Classes:
+    MediaURLField: Read-only serializer field for a file's URL.
+"""
+
+
+class MediaURLResolver:
+    """
+    Bounded LRU cache of storage URLs, plus a set of pinned names whose
+    URLs are kept regardless of the size limit.
+
+    Attributes:
+        maxsize (int): Most URLs kept in the LRU.
+        pinned_names (set): Names whose URLs are never evicted.
+        hits, misses (int): Lookup counters.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.pinned_names = set()
+        self.pinned = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def resolve(self, storage, name, version=None):
+        key = (storage, name, version)
+        with self.lock:
+            url = self.pinned.get(key)
+            if url is None:
+                url = self.entries.get(key)
+                if url is not None:
+                    self.entries.move_to_end(key)
+            if url is not None:
+                self.hits += 1
+                return url
+            self.misses += 1
+        # Built outside the lock; a concurrent miss just builds it twice
+        url = storage.url(name)
+        with self.lock:
+            if name in self.pinned_names:
+                self.pinned[key] = url
+            else:
+                self.entries[key] = url
+                if len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+        return url
+
+    def pin(self, name):
+        with self.lock:
+            self.pinned_names.add(name)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.pinned.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'pinned': len(self.pinned),
+            }
+
+
+_resolver = MediaURLResolver(settings.MEDIA_URL_CACHE_SIZE)
+
+
+def resolve(storage, name, version=None):
+    """
+    Returns the URL of the file stored as `name` in `storage`.
+    """
+    return _resolver.resolve(storage, name, version)
+
+
+def media_url(file, version=None):
+    """
+    Returns the URL of a FieldFile, or None if the field is empty.
+    """
+    if not file:
+        return None
+    return _resolver.resolve(file.storage, file.name, version)
+
+
+def pin_default_images(models):
+    """
+    Pins the default file names of the file fields of `models`.
+    """
+    for model in models:
+        for field in model._meta.fields:
+            if isinstance(field, FileField) and isinstance(
+                field.default, str
+            ):
+                _resolver.pin(field.default)
+
+
+def resolver_stats():
+    """
+    Returns this process's media URL cache counters.
+    """
+    return _resolver.stats()
+
+
+def clear_on_storage_change(setting, **kwargs):
+    """
+    Signal handler dropping cached URLs when a setting they are built from
+    changes, as it does in tests.
+    """
+    if setting in ('DEFAULT_FILE_STORAGE', 'MEDIA_URL', 'MEDIA_ROOT'):
+        _resolver.clear()
+
+
+setting_changed.connect(clear_on_storage_change)
+
+
+class MediaURLField(serializers.ReadOnlyField):
+    """
+    Read-only field serializing a FieldFile, e.g.
+    `source='owner.profile.image'`, as its memoized URL.
+    """
+
+    def to_representation(self, value):
+        return media_url(value)
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+
+class LocalMediaStorage(FileSystemStorage):
+    """
+    Local filesystem stand-in for the Cloudinary media storage.
+
+    Set `MEDIA_STORAGE=media.storage.LocalMediaStorage` to keep uploads
+    under `MEDIA_ROOT`, so the upload pipeline can run and be tested
+    without network access.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('location', settings.MEDIA_ROOT)
+        kwargs.setdefault('base_url', settings.MEDIA_URL)
+        super().__init__(**kwargs)
@@ -0,0 +1,556 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import FileSystemStorage
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+from posts.models import Post
+from .derivatives import derivative_name, generate_derivatives
+from .intake import ImageRejected, probe_chunks, probe_image
+from .models import ChunkedUpload, ImageState, MediaBlob, StagedUpload
+from .pipeline import process, stage_upload
+from .render import render
+from .resolver import MediaURLResolver, _resolver
+from .storage import LocalMediaStorage
+
+
+def image_bytes(width, height, format='PNG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height)).save(buffer, format)
+    return buffer.getvalue()
+
+
+class ProbeTest(SimpleTestCase):
+    """
+    Tests for reading image headers.
+    """
+
+    def test_reads_dimensions_from_header(self):
+        """
+        Ensure dimensions and format come from the header alone.
+        """
+        data = image_bytes(640, 480, 'JPEG')
+        info = probe_chunks([data[:2048]])
+        self.assertEqual((info.width, info.height, info.format),
+                         (640, 480, 'JPEG'))
+
+    def test_header_split_across_chunks(self):
+        """
+        Ensure a header arriving in small chunks is still identified.
+        """
+        data = image_bytes(30, 20)
+        chunks = [data[i:i + 8] for i in range(0, len(data), 8)]
+        self.assertEqual(probe_chunks(chunks)[:2], (30, 20))
+
+    def test_rejects_files_that_are_not_images(self):
+        """
+        Ensure a file without an image header is rejected.
+        """
+        with self.assertRaises(ImageRejected):
+            probe_image(io.BytesIO(b'not an image' * 100))
+
+
+class MediaTestCase(APITestCase):
+    """
+    Logs a user in and keeps media storage and scratch files in a
+    temporary directory, uploading and rendering derivatives eagerly.
+    """
+
+    def setUp(self):
+        User.objects.create_user(username='tester', password='password')
+        self.client.login(username='tester', password='password')
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(
+            DEFAULT_FILE_STORAGE='media.storage.LocalMediaStorage',
+            MEDIA_ROOT=os.path.join(self.media_root, 'media'),
+            MEDIA_PIPELINE={
+                'SCRATCH_DIR': os.path.join(self.media_root, 'scratch'),
+                'WORKERS': 1,
+                'RETRIES': 2,
+                'RETRY_DELAY': 0,
+                'EAGER': True,
+            },
+            IMAGE_DERIVATIVES={
+                'SIZES': {'thumb': 16, 'feed': 24},
+                'QUALITY': 82,
+                'WORKERS': 0,
+                'BAKE_FILTER': False,
+            },
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def create_post(self, name, content):
+        return self.client.post('/posts/', {
+            'event': 'Jazz night',
+            'location': 'Hall',
+            'date': date.today() + timedelta(days=1),
+            'time': '15:00',
+            'image': SimpleUploadedFile(name, content),
+        })
+
+
+class ImageIntakeUploadTest(MediaTestCase):
+    """
+    Tests for image uploads through the post endpoints.
+    """
+
+    def test_stores_image_dimensions(self):
+        """
+        Ensure an accepted upload stores its dimensions on the post.
+        """
+        response = self.create_post('flyer.png', image_bytes(300, 200))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        post = Post.objects.get()
+        self.assertEqual((post.image_width, post.image_height), (300, 200))
+        self.assertEqual(response.data['image_width'], 300)
+
+    def test_rejects_oversized_dimensions(self):
+        """
+        Ensure an image wider than the limit is rejected.
+        """
+        response = self.create_post('wide.png', image_bytes(5000, 10))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data['image'], ['Image width larger than 4096px!']
+        )
+
+    def test_rejects_oversized_file(self):
+        """
+        Ensure a file over the size limit is rejected while streaming.
+        """
+        content = image_bytes(10, 10) + b'\0' * (2 * 1024 * 1024)
+        response = self.create_post('large.png', content)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data['image'], ['Image size larger than 2MB!']
+        )
+        self.assertFalse(Post.objects.exists())
+
+    def test_rejects_malformed_file(self):
+        """
+        Ensure a file that is not an image is rejected.
+        """
+        response = self.create_post('flyer.png', b'\x89PNG broken' * 10)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Post.objects.exists())
+
+
+class MediaPipelineTest(MediaTestCase):
+    """
+    Tests for the staged upload pipeline.
+    """
+
+    def scratch_files(self):
+        scratch = os.path.join(self.media_root, 'scratch')
+        return os.listdir(scratch) if os.path.isdir(scratch) else []
+
+    def test_upload_is_swapped_in_after_commit(self):
+        """
+        Ensure the request answers with a pending image, which is uploaded
+        and swapped in once the transaction commits.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.create_post('flyer.png', image_bytes(30, 20))
+        self.assertEqual(response.data['image_state'], ImageState.PENDING)
+        post = Post.objects.get()
+        self.assertEqual(post.image_state, ImageState.READY)
+        self.assertTrue(post.image.name.startswith('images/flyer'))
+        self.assertTrue(post.image.storage.exists(post.image.name))
+        self.assertEqual(self.scratch_files(), [])
+
+    def test_failed_attempts_are_retried(self):
+        """
+        Ensure a failing upload is retried until it succeeds.
+        """
+        save = FileSystemStorage._save
+        attempts = []
+
+        def flaky_save(storage, name, content):
+            if name.startswith('derivatives/'):
+                return save(storage, name, content)
+            attempts.append(name)
+            if len(attempts) < 3:
+                raise OSError('storage unavailable')
+            return save(storage, name, content)
+
+        with mock.patch.object(LocalMediaStorage, '_save', flaky_save), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.create_post('flyer.png', image_bytes(30, 20))
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(Post.objects.get().image_state, ImageState.READY)
+        self.assertEqual(StagedUpload.objects.get().attempts, 3)
+
+    def test_exhausted_retries_mark_the_image_failed(self):
+        """
+        Ensure the image is marked failed and the scratch copy kept when
+        every attempt fails.
+        """
+        with self.assertLogs('media.pipeline', 'ERROR'), mock.patch.object(
+            LocalMediaStorage, '_save', side_effect=OSError('down')
+        ), self.captureOnCommitCallbacks(execute=True):
+            self.create_post('flyer.png', image_bytes(30, 20))
+        post = Post.objects.get()
+        self.assertEqual(post.image_state, ImageState.FAILED)
+        self.assertEqual(post.image.name, '../default_post_xxhr8e')
+        staged = StagedUpload.objects.get()
+        self.assertEqual(staged.state, StagedUpload.FAILED)
+        self.assertEqual(self.scratch_files(), [staged.scratch_name])
+
+    def test_attempts_keep_the_upload_fresh(self):
+        """
+        Ensure claiming and retrying an upload staged long ago bump its
+        updated_at, so it is not reset as lost while in progress.
+        """
+        post = Post.objects.create(
+            owner=User.objects.get(), event='Jazz night'
+        )
+        staged = stage_upload(post, 'image', SimpleUploadedFile(
+            'flyer.png', image_bytes(10, 10)
+        ))
+        long_ago = timezone.now() - timedelta(hours=1)
+        StagedUpload.objects.filter(pk=staged.pk).update(updated_at=long_ago)
+        save = FileSystemStorage._save
+        seen = []
+
+        def flaky_save(storage, name, content):
+            if name.startswith('derivatives/'):
+                return save(storage, name, content)
+            seen.append(StagedUpload.objects.get(pk=staged.pk).updated_at)
+            if len(seen) < 2:
+                raise OSError('storage unavailable')
+            return save(storage, name, content)
+
+        with mock.patch.object(LocalMediaStorage, '_save', flaky_save):
+            self.assertTrue(process(staged.pk))
+        self.assertEqual(len(seen), 2)
+        self.assertGreater(seen[0], long_ago)
+        self.assertGreaterEqual(seen[1], seen[0])
+        self.assertEqual(StagedUpload.objects.get().attempts, 2)
+
+    def test_newer_upload_supersedes_older(self):
+        """
+        Ensure an upload superseded by a newer one is never swapped in.
+        """
+        post = Post.objects.create(
+            owner=User.objects.get(), event='Jazz night'
+        )
+        old = stage_upload(post, 'image', SimpleUploadedFile(
+            'old.png', image_bytes(10, 10)
+        ))
+        new = stage_upload(post, 'image', SimpleUploadedFile(
+            'new.png', image_bytes(10, 10)
+        ))
+        self.assertTrue(process(new.pk))
+        self.assertFalse(process(old.pk))
+        post.refresh_from_db()
+        self.assertTrue(post.image.name.startswith('images/new'))
+
+
+class DerivativeTest(MediaTestCase):
+    """
+    Tests for pre-rendered image derivatives.
+    """
+
+    def test_render_scales_down_only(self):
+        """
+        Ensure derivatives keep the aspect ratio and are never upscaled.
+        """
+        data, width, height = render(image_bytes(40, 20), 16, 'inkwell')
+        self.assertEqual((width, height), (16, 8))
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(render(image_bytes(10, 20), 16)[1:], (10, 20))
+
+    def test_upload_renders_derivatives(self):
+        """
+        Ensure an uploaded image gets a derivative per configured width,
+        listed in the post's srcset.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.create_post('flyer.png', image_bytes(30, 20))
+        post = Post.objects.get()
+        self.assertEqual(post.image_derivatives['filter'], 'normal')
+        self.assertEqual(set(post.image_derivatives['widths']), {'16', '24'})
+        for name in post.image_derivatives['widths'].values():
+            self.assertTrue(post.image.storage.exists(name))
+        response = self.client.get(f'/posts/{response.data["id"]}/')
+        self.assertEqual(set(response.data['srcset']), {'16w', '24w'})
+        self.assertEqual(response.data['srcset_filter'], 'normal')
+
+    def test_existing_derivatives_are_reused(self):
+        """
+        Ensure derivatives already in storage are not rendered again.
+        """
+        source = image_bytes(30, 20)
+        storage = LocalMediaStorage()
+        first = generate_derivatives(source, 30, 'normal', storage)
+        with mock.patch('media.derivatives.render') as render_mock:
+            second = generate_derivatives(source, 30, 'normal', storage)
+        render_mock.assert_not_called()
+        self.assertEqual(first, second)
+
+    def test_small_images_share_one_derivative(self):
+        """
+        Ensure widths above the original collapse into one derivative at
+        the original width.
+        """
+        derivatives = generate_derivatives(
+            image_bytes(12, 12), 12, 'normal', LocalMediaStorage()
+        )
+        self.assertEqual(list(derivatives['widths']), ['12'])
+        digest = hashlib.sha256(image_bytes(12, 12)).hexdigest()
+        self.assertEqual(
+            derivatives['widths']['12'], derivative_name(digest, 12, 'normal')
+        )
+
+
+class MediaBlobTest(MediaTestCase):
+    """
+    Tests for content-addressed deduplication of uploads.
+    """
+
+    def upload_post(self, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.create_post('flyer.png', content)
+        return Post.objects.get(pk=response.data['id'])
+
+    def test_identical_uploads_share_one_file(self):
+        """
+        Ensure an image that is already stored is referenced instead of
+        uploaded again.
+        """
+        content = image_bytes(30, 20)
+        first = self.upload_post(content)
+        with mock.patch.object(LocalMediaStorage, '_save') as save:
+            second = self.upload_post(content)
+        save.assert_not_called()
+        self.assertEqual(first.image.name, second.image.name)
+        blob = MediaBlob.objects.get()
+        self.assertEqual(blob.name, first.image.name)
+        self.assertEqual(blob.refcount, 2)
+        self.assertEqual(
+            blob.digest, hashlib.sha256(content).hexdigest()
+        )
+
+    def test_file_is_deleted_with_its_last_reference(self):
+        """
+        Ensure a shared file outlives all but the last post using it.
+        """
+        content = image_bytes(30, 20)
+        first = self.upload_post(content)
+        second = self.upload_post(content)
+        storage = first.image.storage
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/posts/{first.pk}/')
+        self.assertTrue(storage.exists(second.image.name))
+        self.assertEqual(MediaBlob.objects.get().refcount, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/posts/{second.pk}/')
+        self.assertFalse(storage.exists(second.image.name))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_replaced_image_is_released(self):
+        """
+        Ensure changing a profile image deletes the old file once nothing
+        references it.
+        """
+        profile = User.objects.get().profile
+        for content in (image_bytes(10, 10), image_bytes(12, 12)):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.put(f'/profiles/{profile.pk}/', {
+                    'image': SimpleUploadedFile('avatar.png', content),
+                }, format='multipart')
+            profile.refresh_from_db()
+        self.assertEqual(
+            list(MediaBlob.objects.values_list('name', flat=True)),
+            [profile.image.name],
+        )
+        self.assertEqual(
+            os.listdir(os.path.join(self.media_root, 'media', 'images')),
+            [os.path.basename(profile.image.name)],
+        )
+
+
+@override_settings(
+    IMAGE_MAX_UPLOAD_BYTES=64,
+    CHUNKED_UPLOADS={'MAX_BYTES': 4096, 'CHUNK_BYTES': 64,
+                     'EXPIRY_HOURS': 24},
+)
+class ChunkedUploadTest(MediaTestCase):
+    """
+    Tests for resumable chunked uploads.
+    """
+
+    def start(self, content, **data):
+        response = self.client.post('/uploads/', {
+            'filename': 'flyer.png', 'size': len(content),
+            'sha256': hashlib.sha256(content).hexdigest(), **data,
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['token']
+
+    def send(self, token, content, offset):
+        return self.client.put(
+            f'/uploads/{token}/', content[offset:offset + 64],
+            content_type='application/octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def send_all(self, token, content):
+        for offset in range(0, len(content), 64):
+            response = self.send(token, content, offset)
+            if response.status_code != status.HTTP_200_OK:
+                break
+        return response
+
+    def upload(self, content):
+        token = self.start(content)
+        self.assertTrue(self.send_all(token, content).data['complete'])
+        return token
+
+    def test_token_is_accepted_in_place_of_a_file(self):
+        """
+        Ensure a file larger than the multipart limit can be uploaded in
+        chunks and used as a post image.
+        """
+        content = image_bytes(300, 200)
+        self.assertGreater(len(content), 64)
+        token = self.upload(content)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/posts/', {
+                'event': 'Jazz night',
+                'location': 'Hall',
+                'date': date.today() + timedelta(days=1),
+                'time': '15:00',
+                'image_upload': token,
+            })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        post = Post.objects.get()
+        self.assertEqual((post.image_width, post.image_height), (300, 200))
+        self.assertEqual(post.image_state, ImageState.READY)
+        with post.image.open('rb') as file:
+            self.assertEqual(file.read(), content)
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_upload_resumes_from_received_offset(self):
+        """
+        Ensure a chunk sent at the wrong offset is refused with the offset
+        to resume from.
+        """
+        content = image_bytes(30, 20)
+        token = self.start(content)
+        self.send(token, content, 0)
+        response = self.send(token, content, 128)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['received'], 64)
+        response = self.client.get(f'/uploads/{token}/')
+        self.assertEqual(response.data['received'], 64)
+        self.assertFalse(response.data['complete'])
+
+    def test_checksum_mismatch_discards_upload(self):
+        """
+        Ensure an upload whose content does not match its checksum is
+        discarded.
+        """
+        content = image_bytes(10, 10)
+        token = self.start(content, sha256='0' * 64)
+        response = self.send_all(token, content)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('sha256', response.data)
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_non_image_is_rejected_from_its_header(self):
+        """
+        Ensure a file in which no image header turns up is rejected and
+        discarded.
+        """
+        content = b'not an image' * 20
+        token = self.start(content)
+        response = self.send_all(token, content)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', response.data)
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_tokens_are_private(self):
+        """
+        Ensure another user cannot use or inspect an upload's token.
+        """
+        token = self.upload(image_bytes(10, 10))
+        User.objects.create_user(username='other', password='password')
+        self.client.login(username='other', password='password')
+        response = self.client.get(f'/uploads/{token}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post('/posts/', {
+            'event': 'Jazz night', 'image_upload': token,
+        })
+        self.assertIn('image_upload', response.data)
+
+
+class MediaURLResolverTest(SimpleTestCase):
+    """
+    Tests for the memoized media URL resolver.
+    """
+
+    def setUp(self):
+        self.storage = mock.Mock()
+        self.storage.url.side_effect = lambda name: f'/media/{name}'
+
+    def test_urls_are_built_once(self):
+        """
+        Ensure repeated lookups are served from the cache.
+        """
+        resolver = MediaURLResolver(10)
+        for _ in range(3):
+            url = resolver.resolve(self.storage, 'images/a.png')
+        self.assertEqual(url, '/media/images/a.png')
+        self.storage.url.assert_called_once_with('images/a.png')
+        self.assertEqual(resolver.stats()['hits'], 2)
+        self.assertAlmostEqual(resolver.stats()['hit_rate'], 2 / 3)
+
+    def test_least_recently_used_url_is_evicted(self):
+        """
+        Ensure the cache keeps at most `maxsize` URLs, dropping the least
+        recently used one.
+        """
+        resolver = MediaURLResolver(2)
+        resolver.resolve(self.storage, 'a')
+        resolver.resolve(self.storage, 'b')
+        resolver.resolve(self.storage, 'a')
+        resolver.resolve(self.storage, 'c')
+        self.storage.url.reset_mock()
+        resolver.resolve(self.storage, 'a')
+        resolver.resolve(self.storage, 'b')
+        self.storage.url.assert_called_once_with('b')
+
+    def test_default_images_are_pinned(self):
+        """
+        Ensure pinned default images are kept outside the LRU.
+        """
+        resolver = MediaURLResolver(1)
+        resolver.pin('../default_post_xxhr8e')
+        resolver.resolve(self.storage, '../default_post_xxhr8e')
+        resolver.resolve(self.storage, 'a')
+        resolver.resolve(self.storage, 'b')
+        self.storage.url.reset_mock()
+        resolver.resolve(self.storage, '../default_post_xxhr8e')
+        self.storage.url.assert_not_called()
+        self.assertEqual(resolver.stats()['pinned'], 1)
+
+    def test_model_defaults_are_pinned(self):
+        """
+        Ensure the default images of the post and profile image fields are
+        pinned at startup.
+        """
+        self.assertIn('../default_post_xxhr8e', _resolver.pinned_names)
+        self.assertIn('../default_profile_twcgma', _resolver.pinned_names)
@@ -0,0 +1,9 @@
+from django.urls import path
+from media import views
+
+urlpatterns = [
+    path('uploads/', views.ChunkedUploadList.as_view(),
+         name='chunked-upload-list'),
+    path('uploads/<str:token>/', views.ChunkedUploadDetail.as_view(),
+         name='chunked-upload-detail'),
+]
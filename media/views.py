@@ -0,0 +1,49 @@
+from rest_framework import generics, permissions, serializers
+from rest_framework.response import Response
+from .chunked import ChunkedUploadSerializer, append_chunk, discard
+from .models import ChunkedUpload
+
+
+class ChunkedUploadList(generics.CreateAPIView):
+    """
+    API view to start a chunked upload.
+    - Declares the file's name, size and SHA-256 and returns the token to
+      send its chunks to.
+    """
+    serializer_class = ChunkedUploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+
+class ChunkedUploadDetail(generics.RetrieveDestroyAPIView):
+    """
+    API view for a chunked upload of the requesting user.
+    - GET reports the bytes received, the offset to resume from.
+    - PUT appends the raw request body at the `Upload-Offset` header.
+    - DELETE cancels the upload.
+    """
+    serializer_class = ChunkedUploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_field = 'token'
+
+    def get_queryset(self):
+        return ChunkedUpload.objects.filter(owner=self.request.user)
+
+    def put(self, request, *args, **kwargs):
+        upload = self.get_object()
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers.get('Content-Length') or 0)
+        except (KeyError, ValueError):
+            raise serializers.ValidationError({
+                'detail': 'Upload-Offset and Content-Length are required.'
+            })
+        # Read the body as a stream; it is never parsed into request.data
+        stream = request.stream if length else None
+        append_chunk(upload, stream, offset, length)
+        return Response(self.get_serializer(upload).data)
+
+    def perform_destroy(self, instance):
+        discard(instance)
@@ -0,0 +1,172 @@
+import random
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from drf_api.filters import semi_join
+from followers.models import Follower
+from likes.models import Like
+from posts.models import Post
+from posts.views import PostList
+from profiles.models import Profile
+from profiles.views import ProfileList
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the relationship filters of PostList and ProfileList,
+    compiled as JOINs (the original DjangoFilterBackend behaviour, with
+    `Count(..., distinct=True)` annotations) against EXISTS semi-joins on
+    the views' current querysets.
+
+    The dataset is seeded inside a transaction that is rolled back at the
+    end unless `--keep` is given, so the command can be pointed at a
+    development database without leaving rows behind.
+    """
+    help = 'Benchmark relationship filters as JOINs and EXISTS semi-joins.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--likes', type=int, default=1000000)
+        parser.add_argument(
+            '--follows', type=int, default=50,
+            help='Number of users each seeded user follows.',
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Commit the seeded rows instead of rolling them back.',
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        with transaction.atomic():
+            started = time.perf_counter()
+            users = self.seed(options)
+            self.stdout.write(
+                f'Seeded {len(users)} users, {options["posts"]} posts, '
+                f'{options["likes"]} likes in '
+                f'{time.perf_counter() - started:.1f}s'
+            )
+            target = Profile.objects.get(owner_id=self.random.choice(users))
+            for name, before, after in self.get_cases(target):
+                self.report(name, before, after, options['repeat'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def seed(self, options):
+        """
+        Bulk-inserts users with profiles, posts, likes and follows.
+        Signals are not sent, so counters and timelines are left alone.
+        """
+        prefix = f'bench{self.random.randrange(10 ** 6)}_'
+        User.objects.bulk_create(
+            [
+                User(username=f'{prefix}{index}', password='!')
+                for index in range(options['users'])
+            ],
+            batch_size=5000,
+        )
+        users = list(
+            User.objects.filter(username__startswith=prefix).values_list(
+                'id', flat=True
+            )
+        )
+        Profile.objects.bulk_create(
+            [Profile(owner_id=user_id) for user_id in users],
+            batch_size=5000,
+        )
+        Post.objects.bulk_create(
+            (
+                Post(owner_id=self.random.choice(users), event=f'event {n}')
+                for n in range(options['posts'])
+            ),
+            batch_size=5000,
+        )
+        posts = list(
+            Post.objects.filter(owner_id__in=users).values_list(
+                'id', flat=True
+            )
+        )
+        likes_per_user = min(options['likes'] // len(users), len(posts))
+        for user_id in users:
+            Like.objects.bulk_create(
+                [
+                    Like(owner_id=user_id, post_id=post_id)
+                    for post_id in self.random.sample(posts, likes_per_user)
+                ],
+                batch_size=5000,
+            )
+        follows = min(options['follows'], len(users) - 1)
+        for user_id in users:
+            followed = set(self.random.sample(users, follows + 1))
+            followed.discard(user_id)
+            Follower.objects.bulk_create(
+                [
+                    Follower(owner_id=user_id, followed_id=followed_id)
+                    for followed_id in list(followed)[:follows]
+                ],
+                batch_size=5000,
+            )
+        return users
+
+    def get_cases(self, target):
+        """
+        Returns `(name, before, after)` triples of querysets for every
+        relationship filter of the post and profile lists.
+        """
+        posts_before = Post.objects.annotate(
+            likes_total=Count('likes', distinct=True),
+            comments_total=Count('comment', distinct=True),
+            shares_total=Count('share_posts', distinct=True),
+        ).order_by('-created_at')
+        profiles_before = Profile.objects.annotate(
+            posts_total=Count('owner__post', distinct=True),
+            followers_total=Count('owner__followed', distinct=True),
+            following_total=Count('owner__following', distinct=True),
+        ).order_by('-created_at')
+        profiles_after = ProfileList.queryset
+        cases = [
+            (Post, posts_before, PostList.queryset,
+             'owner__followed__owner__profile'),
+            (Post, posts_before, PostList.queryset,
+             'likes__owner__profile'),
+            (Profile, profiles_before, profiles_after,
+             'owner__following__followed__profile'),
+            (Profile, profiles_before, profiles_after,
+             'owner__followed__owner__profile'),
+        ]
+        return [
+            (
+                f'{model.__name__} {path}',
+                before.filter(**{path: target}),
+                after.all().filter(semi_join(model, path, 'exact', target)),
+            )
+            for model, before, after, path in cases
+        ]
+
+    def report(self, name, before, after, repeat):
+        before_ms, before_ids = self.time_page(before, repeat)
+        after_ms, after_ids = self.time_page(after, repeat)
+        self.stdout.write(
+            f'{name}: JOIN {before_ms:.1f}ms, EXISTS {after_ms:.1f}ms '
+            f'({before_ms / max(after_ms, 0.001):.1f}x), '
+            f'results {"match" if before_ids == after_ids else "DIFFER"}'
+        )
+
+    @staticmethod
+    def time_page(queryset, repeat):
+        """
+        Returns the median time in milliseconds to fetch the first page of
+        `queryset`, and the IDs on it.
+        """
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            ids = [obj.id for obj in queryset[:10]]
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), set(ids)
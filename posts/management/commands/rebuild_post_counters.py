@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from comments.models import Comment
+from likes.models import Like
+from posts.models import Post
+from shares.models import Share
+
+
+def count_per_post(model):
+    """
+    Returns a correlated subquery counting the `model` rows of each post.
+    """
+    counts = model.objects.filter(post=OuterRef('pk')).order_by().values(
+        'post'
+    ).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts), 0)
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the stored `likes_count`, `comments_count` and `share_count`
+    of every post from the Like, Comment and Share tables.
+
+    Posts are updated in primary key batches, each in its own transaction,
+    so the rebuild never holds locks on the whole table.
+    """
+    help = 'Rebuild the stored like, comment and share counters on posts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of posts to update per transaction.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        post_ids = Post.objects.order_by('pk').values_list('pk', flat=True)
+        last_id = 0
+        updated = 0
+        while True:
+            batch = list(post_ids.filter(pk__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                updated += Post.objects.filter(
+                    pk__gte=batch[0], pk__lte=batch[-1]
+                ).update(
+                    likes_count=count_per_post(Like),
+                    comments_count=count_per_post(Comment),
+                    share_count=count_per_post(Share),
+                )
+            last_id = batch[-1]
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt counters for {updated} posts.')
+        )
@@ -0,0 +1,51 @@
+# Generated by Django 3.2.4 on 2026-10-17 02:17
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+
+    def count_per_post(app_label, model_name):
+        model = apps.get_model(app_label, model_name)
+        counts = model.objects.filter(post=OuterRef('pk')).order_by().values(
+            'post'
+        ).annotate(total=Count('pk')).values('total')
+        return Coalesce(Subquery(counts), 0)
+
+    Post.objects.update(
+        likes_count=count_per_post('likes', 'Like'),
+        comments_count=count_per_post('comments', 'Comment'),
+        share_count=count_per_post('shares', 'Share'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_post_share_posts'),
+        ('likes', '0001_initial'),
+        ('comments', '0001_initial'),
+        ('shares', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='share_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
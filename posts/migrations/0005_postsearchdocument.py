@@ -0,0 +1,85 @@
+# Generated by Django 3.2.4 on 2026-10-17 02:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+POSTGRES_FORWARD = [
+    "ALTER TABLE posts_postsearchdocument ADD COLUMN vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', document)) STORED",
+    "CREATE INDEX posts_postsearch_vector_idx "
+    "ON posts_postsearchdocument USING GIN (vector)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS posts_postsearch_vector_idx",
+    "ALTER TABLE posts_postsearchdocument DROP COLUMN IF EXISTS vector",
+]
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE posts_postsearch_fts USING fts5("
+    "document, content='posts_postsearchdocument', content_rowid='post_id')",
+    "CREATE TRIGGER posts_postsearch_ai AFTER INSERT "
+    "ON posts_postsearchdocument BEGIN "
+    "INSERT INTO posts_postsearch_fts(rowid, document) "
+    "VALUES (new.post_id, new.document); END",
+    "CREATE TRIGGER posts_postsearch_ad AFTER DELETE "
+    "ON posts_postsearchdocument BEGIN "
+    "INSERT INTO posts_postsearch_fts(posts_postsearch_fts, rowid, document) "
+    "VALUES ('delete', old.post_id, old.document); END",
+    "CREATE TRIGGER posts_postsearch_au AFTER UPDATE "
+    "ON posts_postsearchdocument BEGIN "
+    "INSERT INTO posts_postsearch_fts(posts_postsearch_fts, rowid, document) "
+    "VALUES ('delete', old.post_id, old.document); "
+    "INSERT INTO posts_postsearch_fts(rowid, document) "
+    "VALUES (new.post_id, new.document); END",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS posts_postsearch_ai",
+    "DROP TRIGGER IF EXISTS posts_postsearch_ad",
+    "DROP TRIGGER IF EXISTS posts_postsearch_au",
+    "DROP TABLE IF EXISTS posts_postsearch_fts",
+]
+
+
+def run_for_vendor(postgres, sqlite):
+    def run(apps, schema_editor):
+        statements = {
+            'postgresql': postgres, 'sqlite': sqlite,
+        }.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+def build_documents(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    PostSearchDocument = apps.get_model('posts', 'PostSearchDocument')
+    documents = (
+        PostSearchDocument(post_id=post.id, document='\n'.join([
+            post.event, post.description, post.location,
+            post.owner.username, str(post.date),
+        ]))
+        for post in Post.objects.select_related('owner').iterator()
+    )
+    PostSearchDocument.objects.bulk_create(documents, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_post_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchDocument',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='posts.post')),
+                ('document', models.TextField()),
+            ],
+        ),
+        migrations.RunPython(
+            run_for_vendor(POSTGRES_FORWARD, SQLITE_FORWARD),
+            run_for_vendor(POSTGRES_BACKWARD, SQLITE_BACKWARD),
+        ),
+        migrations.RunPython(build_documents, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,12 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
 from django.utils import timezone
+from media.blobs import release_image
+from media.models import ImageState
+from profiles.models import adjust_profile_counter
 
 
 class Post(models.Model):
@@ -20,15 +26,32 @@ class Post(models.Model):
         image (ImageField): Optional image for the event. Uploaded to
                             'images/' by default, with a fallback to a
                             default image ('../default_post_xxhr8e').
+        image_width, image_height (PositiveIntegerField): Dimensions of the
+                                  uploaded image, read from its header at
+                                  intake. Null for the default image.
+        image_state (CharField): Whether a newly uploaded image is still
+                                 pending in the upload pipeline, or failed.
         image_filter (CharField): Filter applied to the event image. Users
                                   can choose from predefined filters like
                                   'Hudson', 'Lo-Fi', etc. Default is 'Normal'.
+        image_derivatives (JSONField): Names of the pre-rendered resized
+                                       copies of the image, by width, and
+                                       the filter baked into them.
         share_posts (ManyToManyField): Represents users who have shared the
                                        post,linked through the `Share` model.
+        likes_count (PositiveIntegerField): Stored number of likes, kept up
+                                            to date by the `Like` signals.
+        comments_count (PositiveIntegerField): Stored number of comments,
+                                               kept up to date by the
+                                               `Comment` signals.
+        share_count (PositiveIntegerField): Stored number of shares, kept up
+                                            to date by the `Share` signals.
 
     Meta:
         - Posts are ordered by creation time in descending order
         (`-created_at`).
+        - Composite indexes on `created_at` and each counter, each ending
+        in `id`, back the keyset pagination of the post list.
 
     Methods:
         __str__: Returns a string representation of the post, displaying its
@@ -55,15 +78,173 @@ class Post(models.Model):
     image = models.ImageField(
         upload_to='images/', default='../default_post_xxhr8e', blank=True
     )
+    image_width = models.PositiveIntegerField(null=True, blank=True)
+    image_height = models.PositiveIntegerField(null=True, blank=True)
+    image_state = models.CharField(
+        max_length=16, choices=ImageState.choices, default=ImageState.READY
+    )
     image_filter = models.CharField(
         max_length=32, choices=image_filter_choices, default='normal'
     )
+    image_derivatives = models.JSONField(default=dict, blank=True)
     share_posts = models.ManyToManyField(
         User, through='shares.Share', related_name='post_share'
     )
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    share_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'], name='post_created_at_id_idx'
+            ),
+            models.Index(
+                fields=['-likes_count', '-id'], name='post_likes_count_id_idx'
+            ),
+            models.Index(
+                fields=['-comments_count', '-id'],
+                name='post_comments_count_id_idx',
+            ),
+            models.Index(
+                fields=['-share_count', '-id'], name='post_share_count_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.id} {self.event}'
+
+
+def adjust_post_counter(post_id, counter, delta):
+    """
+    Atomically add `delta` to one of the stored counters of a post.
+
+    The update is a single F() expression so concurrent likes, comments
+    and shares never overwrite each other, and it is clamped at zero so a
+    counter that has drifted can never fail the unsigned column check.
+
+    Args:
+        post_id (int): The ID of the post to update.
+        counter (str): The counter field name, e.g. 'likes_count'.
+        delta (int): The amount to add; negative to subtract.
+    """
+    Post.objects.filter(pk=post_id).update(
+        **{counter: Greatest(F(counter) + delta, 0)}
+    )
+
+
+class PostSearchDocument(models.Model):
+    """
+    The full-text search document of a post.
+
+    Holds the post's event, description, location, date and owner's
+    username as one text column. The database indexes it outside of the
+    ORM: a generated `tsvector` column with a GIN index on PostgreSQL, and
+    an FTS5 virtual table kept in sync by triggers on SQLite (see the
+    `0005_postsearchdocument` migration and `posts.search`).
+
+    Attributes:
+        post (OneToOneField): The post the document describes.
+        document (TextField): The searchable text of the post.
+    """
+    post = models.OneToOneField(
+        Post, primary_key=True, on_delete=models.CASCADE,
+        related_name='search_document',
+    )
+    document = models.TextField()
+
+    def __str__(self):
+        return f'Search document for {self.post_id}'
+
+
+def build_search_document(post, username):
+    """
+    Returns the searchable text of a post owned by `username`.
+    """
+    return '\n'.join([
+        post.event, post.description, post.location, username,
+        str(post.date),
+    ])
+
+
+def update_search_document(sender, instance, **kwargs):
+    """
+    Signal handler that rewrites the search document of a saved post.
+    """
+    PostSearchDocument.objects.update_or_create(
+        post=instance, defaults={
+            'document': build_search_document(
+                instance, instance.owner.username
+            ),
+        },
+    )
+
+
+def remember_stored_username(sender, instance, update_fields, **kwargs):
+    """
+    Signal handler that records the username a user is stored with
+    before the save, so `update_owner_search_documents` can tell whether
+    it changed.
+    """
+    if instance.pk is None or (
+            update_fields and 'username' not in update_fields):
+        return
+    instance._stored_username = User.objects.filter(
+        pk=instance.pk
+    ).values_list('username', flat=True).first()
+
+
+def update_owner_search_documents(sender, instance, created, update_fields,
+                                  **kwargs):
+    """
+    Signal handler that rewrites the search documents of a user's posts
+    when the user's username has changed.
+
+    Saves that only touch other fields, such as `last_login`, or that
+    keep the username are skipped. The documents are rewritten with one
+    UPDATE per batch of posts.
+    """
+    if created or (update_fields and 'username' not in update_fields):
+        return
+    if getattr(instance, '_stored_username', None) == instance.username:
+        return
+    posts = Post.objects.filter(owner=instance).only(
+        'event', 'description', 'location', 'date'
+    )
+    PostSearchDocument.objects.bulk_update(
+        [
+            PostSearchDocument(
+                post_id=post.pk,
+                document=build_search_document(post, instance.username),
+            )
+            for post in posts.iterator()
+        ],
+        ['document'],
+        batch_size=500,
+    )
+
+
+def increment_owner_posts_count(sender, instance, created, **kwargs):
+    """
+    Signal handler that increments the owner's `posts_count` when a new
+    Post is created.
+    """
+    if created:
+        adjust_profile_counter(instance.owner_id, 'posts_count', 1)
+
+
+def decrement_owner_posts_count(sender, instance, **kwargs):
+    """
+    Signal handler that decrements the owner's `posts_count` when a Post
+    is deleted, including cascaded deletes.
+    """
+    adjust_profile_counter(instance.owner_id, 'posts_count', -1)
+
+
+post_save.connect(update_search_document, sender=Post)
+pre_save.connect(remember_stored_username, sender=User)
+post_save.connect(update_owner_search_documents, sender=User)
+post_delete.connect(release_image, sender=Post)
+post_save.connect(increment_owner_posts_count, sender=Post)
+post_delete.connect(decrement_owner_posts_count, sender=Post)
@@ -0,0 +1,148 @@
+from collections import defaultdict
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from comments.models import Comment
+from comments.serializers import HumanizedTimes
+from likes.models import Like
+from media.resolver import resolve
+from profiles.models import Profile
+
+"""
+Comment and liker previews embedded in posts with `?include=`.
+
+`?include=comment_preview,liker_preview` adds each post's latest comments
+and most recent likers to the response, so feed cards need no request of
+their own per post. Each preview is loaded for a whole page at once: the
+page's comments (or likes) are numbered per post with `ROW_NUMBER() OVER
+(PARTITION BY post_id ...)` and only the first few of each post kept, in
+a single query per preview whatever the page size.
+
+Functions:
+    get_includes(request): Names of the previews a request includes.
+    first_per_post(queryset, order_by, limit): The first rows of each post.
+
+Classes:
+    PostPreviews: The previews of a page of posts.
+"""
+
+INCLUDE_PARAM = 'include'
+PREVIEW_FIELDS = ('comment_preview', 'liker_preview')
+
+
+def get_includes(request):
+    """
+    Returns the set of previews a read request asks for with `?include=`.
+
+    Raises:
+        ValidationError: If the request names an unknown preview.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return set()
+    value = request.query_params.get(INCLUDE_PARAM, '')
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = sorted(names.difference(PREVIEW_FIELDS))
+    if unknown:
+        raise serializers.ValidationError({
+            INCLUDE_PARAM: [f'Unknown preview: {name}.' for name in unknown]
+        })
+    return names
+
+
+def first_per_post(queryset, order_by, limit):
+    """
+    Returns the first `limit` rows of each post in `queryset` by
+    `order_by`, ordered by post and rank, in one query.
+
+    Django 3.2 cannot filter on a window function, so the ranked query is
+    compiled by the ORM and wrapped in a raw query that filters on the
+    rank. Rows come back as model instances with the queryset's
+    annotations.
+    """
+    ranked = queryset.annotate(preview_rank=Window(
+        RowNumber(), partition_by=[F('post_id')], order_by=order_by,
+    )).order_by()
+    sql, params = ranked.query.sql_with_params()
+    return list(queryset.model.objects.raw(
+        f'SELECT * FROM ({sql}) ranked WHERE preview_rank <= %s '
+        f'ORDER BY post_id, preview_rank',
+        (*params, limit),
+    ))
+
+
+def with_owner_profile(queryset):
+    return queryset.annotate(
+        owner_username=F('owner__username'),
+        owner_profile_id=F('owner__profile__id'),
+        owner_profile_image=F('owner__profile__image'),
+    )
+
+
+def owner_fields(row):
+    image = row.owner_profile_image
+    return {
+        'owner': row.owner_username,
+        'profile_id': row.owner_profile_id,
+        'profile_image': resolve(
+            Profile._meta.get_field('image').storage, image
+        ) if image else None,
+    }
+
+
+class PostPreviews:
+    """
+    Comment and liker previews for a page of posts, resolved in bulk.
+
+    Attributes:
+        post_ids (frozenset): IDs of the posts this was resolved for.
+        comments (dict): Maps post ID to its latest comments, newest
+                         first, at most `POST_PREVIEWS['COMMENTS']`.
+        likers (dict): Maps post ID to its most recent likers, at most
+                       `POST_PREVIEWS['LIKERS']`.
+    """
+
+    def __init__(self, post_ids, comments, likers):
+        self.post_ids = frozenset(post_ids)
+        self.comments = comments
+        self.likers = likers
+
+    @classmethod
+    def resolve(cls, posts, comments=True, likers=True):
+        """
+        Load the previews of `posts`, one query per preview asked for.
+        """
+        post_ids = [post.id for post in posts]
+        comment_previews = defaultdict(list)
+        liker_previews = defaultdict(list)
+        if not post_ids:
+            return cls(post_ids, comment_previews, liker_previews)
+
+        if comments:
+            humanize = HumanizedTimes()
+            rows = first_per_post(
+                with_owner_profile(
+                    Comment.objects.filter(post_id__in=post_ids)
+                ),
+                [F('created_at').desc(), F('id').desc()],
+                settings.POST_PREVIEWS['COMMENTS'],
+            )
+            for row in rows:
+                comment_previews[row.post_id].append({
+                    'id': row.id,
+                    **owner_fields(row),
+                    'description': row.description,
+                    'parent': row.parent_id,
+                    'created_at': humanize(row.created_at),
+                })
+
+        if likers:
+            rows = first_per_post(
+                with_owner_profile(Like.objects.filter(post_id__in=post_ids)),
+                [F('created_at').desc(), F('id').desc()],
+                settings.POST_PREVIEWS['LIKERS'],
+            )
+            for row in rows:
+                liker_previews[row.post_id].append(owner_fields(row))
+        return cls(post_ids, comment_previews, liker_previews)
@@ -0,0 +1,83 @@
+import re
+from django.db import connections
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+"""
+Indexed full-text search over post search documents.
+
+Functions:
+    search_terms(query): Splits a search query into index tokens.
+
+Classes:
+    PostSearchFilter: SearchFilter that matches `?search=` against the
+                      PostgreSQL GIN index or the SQLite FTS5 table, ranking
+                      results by relevance and matching word prefixes.
+"""
+
+# Ranks are cast to double precision so they survive a round trip through
+# a keyset pagination cursor unchanged.
+POSTGRES_MATCH = (
+    'SELECT post_id FROM posts_postsearchdocument '
+    "WHERE vector @@ to_tsquery('english', %s)"
+)
+POSTGRES_RANK = (
+    "SELECT ts_rank(vector, to_tsquery('english', %s))::float8 "
+    'FROM posts_postsearchdocument WHERE post_id = "posts_post"."id"'
+)
+SQLITE_MATCH = (
+    'SELECT rowid FROM posts_postsearch_fts '
+    'WHERE posts_postsearch_fts MATCH %s'
+)
+SQLITE_RANK = (
+    'SELECT -rank FROM posts_postsearch_fts '
+    'WHERE posts_postsearch_fts MATCH %s AND rowid = "posts_post"."id"'
+)
+
+
+def search_terms(query):
+    """
+    Splits a search query into the lowercase word tokens the indexes hold,
+    dropping punctuation and operators so user input is never interpreted
+    as query syntax.
+    """
+    return re.findall(r'[^\W_]+', query.lower())
+
+
+class PostSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter backed by the post search documents.
+
+    Every term must match the start of a word in the post's event,
+    description, location, date or owner's username. Results are annotated
+    with `search_rank` and, unless the request asks for another ordering,
+    sorted by it. On database backends without a full-text index it falls
+    back to the view's `search_fields`.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = []
+        for term in self.get_search_terms(request):
+            terms.extend(search_terms(term))
+        if not terms:
+            return queryset
+
+        vendor = connections[queryset.db].vendor
+        if vendor == 'postgresql':
+            query = ' & '.join(f'{term}:*' for term in terms)
+            match_sql, rank_sql = POSTGRES_MATCH, POSTGRES_RANK
+        elif vendor == 'sqlite':
+            query = ' '.join(f'"{term}"*' for term in terms)
+            match_sql, rank_sql = SQLITE_MATCH, SQLITE_RANK
+        else:
+            return super().filter_queryset(request, queryset, view)
+
+        queryset = queryset.filter(
+            pk__in=RawSQL(match_sql, [query])
+        ).annotate(
+            search_rank=RawSQL(rank_sql, [query], output_field=FloatField())
+        )
+        if not request.query_params.get(filters.OrderingFilter.ordering_param):
+            queryset = queryset.order_by('-search_rank', '-created_at')
+        return queryset
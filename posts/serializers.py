@@ -1,22 +1,54 @@
 from rest_framework import serializers
-from shares.models import Share
 from posts.models import Post
-from likes.models import Like
-from comments.models import Comment
 from datetime import datetime, timedelta
+from drf_api.sparse import SparseFieldsetSerializerMixin
+from media.derivatives import srcset
+from media.chunked import UploadTokenField
+from media.intake import ImageIntakeSerializerMixin, IntakeImageField
+from media.pipeline import StagedImageSerializerMixin
+from media.resolver import MediaURLField
+from .previews import PREVIEW_FIELDS, PostPreviews, get_includes
+from .viewer_state import PostViewerState
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostListSerializer(serializers.ListSerializer):
+    """
+    List serializer for pages of posts.
+    Resolves the viewer state, and the previews asked for with
+    `?include=`, for every post on the page up front so the per-post
+    fields are served from memory.
+    """
+
+    def to_representation(self, data):
+        posts = list(data.all() if hasattr(data, 'all') else data)
+        self.context['post_viewer_state'] = PostViewerState.resolve(
+            self.context['request'].user, posts,
+            **self.child.get_viewer_relations(),
+        )
+        previews = self.child.get_preview_relations()
+        if any(previews.values()):
+            self.context['post_previews'] = PostPreviews.resolve(
+                posts, **previews
+            )
+        return super().to_representation(posts)
+
+
+class PostSerializer(SparseFieldsetSerializerMixin,
+                     ImageIntakeSerializerMixin,
+                     StagedImageSerializerMixin,
+                     serializers.ModelSerializer):
     """
     Serializer for the Post model.
     Converts Post instances to and from JSON for API interactions,
     with validations and computed fields for user-specific details.
+    Supports sparse fieldsets through `?fields=` and `?omit=`, and embeds
+    comment and liker previews with `?include=`.
     """
 
     # Read-only fields for displaying data without modification
     owner = serializers.ReadOnlyField(source='owner.username')
     profile_id = serializers.ReadOnlyField(source='owner.profile.id')
-    profile_image = serializers.ReadOnlyField(source='owner.profile.image.url')
+    profile_image = MediaURLField(source='owner.profile.image')
 
     # Computed fields based on user interactions
     is_owner = serializers.SerializerMethodField()
@@ -25,33 +57,30 @@ class PostSerializer(serializers.ModelSerializer):
     shared_by = serializers.SerializerMethodField()
     is_shared_by_user = serializers.SerializerMethodField()
 
+    # Latest comments and likers, only with ?include=
+    comment_preview = serializers.SerializerMethodField()
+    liker_preview = serializers.SerializerMethodField()
+
     # Read-only aggregate data fields
-    likes_count = serializers.SerializerMethodField()
-    comments_count = serializers.SerializerMethodField()
-    share_count = serializers.SerializerMethodField()
+    likes_count = serializers.ReadOnlyField()
+    comments_count = serializers.ReadOnlyField()
+    share_count = serializers.ReadOnlyField()
+
+    # Checked from its header only: at most 2MB and 4096px on each side.
+    # New images are uploaded in the background while image_state is
+    # pending. Larger files are sent as chunked uploads and referenced by
+    # their token.
+    image = IntakeImageField(required=False)
+    image_upload = UploadTokenField(required=False)
+
+    # Pre-rendered sizes of the image, keyed by width ('320w', ...)
+    srcset = serializers.SerializerMethodField()
+    srcset_filter = serializers.SerializerMethodField()
 
     # Formatting fields for date and time
     date = serializers.DateField(format="%d %b %Y")
     time = serializers.TimeField(format="%H:%M")
 
-    def validate_image(self, value):
-        """
-        Validates the uploaded image:
-        - Ensures it is less than 2MB.
-        - Confirms that height and width are within 4096px.
-        """
-        if value.size > 2 * 1024 * 1024:
-            raise serializers.ValidationError('Image size larger than 2MB!')
-        if value.image.height > 4096:
-            raise serializers.ValidationError(
-                'Image height larger than 4096px!'
-            )
-        if value.image.width > 4096:
-            raise serializers.ValidationError(
-                'Image width larger than 4096px!'
-            )
-        return value
-
     def validate_date(self, value):
         """
         Validates the date field:
@@ -94,69 +123,137 @@ class PostSerializer(serializers.ModelSerializer):
         request = self.context['request']
         return request.user == obj.owner
 
-    def get_like_id(self, obj):
+    # Model fields read by the method fields, for sparse querysets
+    sparse_sources = {
+        'is_owner': ['owner__id'],
+        'like_id': [],
+        'is_liked_by_user': [],
+        'shared_by': [],
+        'is_shared_by_user': [],
+        'comment_preview': [],
+        'liker_preview': [],
+        'srcset': ['image_derivatives'],
+        'srcset_filter': ['image_derivatives'],
+    }
+
+    def get_srcset(self, obj):
         """
-        Retrieves the ID of the Like object if the authenticated user
-        has liked the post; returns None otherwise.
+        Maps each derivative width to its URL; empty until rendered.
         """
-        user = self.context['request'].user
-        if user.is_authenticated:
-            like = Like.objects.filter(
-                owner=user, post=obj
-            ).first()
-            return like.id if like else None
-        return None
+        return srcset(
+            obj.image_derivatives, Post._meta.get_field('image').storage
+        )
 
-    def get_is_liked_by_user(self, obj):
+    def get_srcset_filter(self, obj):
         """
-        Checks if the authenticated user has liked the post.
+        Returns the image_filter baked into the derivatives, if any.
         """
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return Like.objects.filter(owner=user, post=obj).exists()
-        return False  # Return False if the user is not authenticated
+        return obj.image_derivatives.get('filter')
 
-    def get_shared_by(self, obj):
-        shares = Share.objects.filter(post=obj)
-        shared_users = [share.user.username for share in shares]
-        # Return an empty list instead of None
-        return shared_users if shared_users else []
+    def get_fields(self):
+        fields = super().get_fields()
+        included = get_includes(self.context.get('request'))
+        for name in PREVIEW_FIELDS:
+            if name not in included:
+                fields.pop(name, None)
+        return fields
 
-    def get_is_shared_by_user(self, obj):
+    def get_viewer_relations(self):
         """
-        Checks if the authenticated user has shared the post.
+        Returns which viewer state relations the current fields need.
+        """
+        return {
+            'likes': bool({'like_id', 'is_liked_by_user'} & set(self.fields)),
+            'shares': bool(
+                {'shared_by', 'is_shared_by_user'} & set(self.fields)
+            ),
+        }
+
+    def get_viewer_state(self, obj):
+        """
+        Returns the PostViewerState covering the post, resolving it for
+        this single post when it is serialized outside of a list.
+        """
+        state = self.context.get('post_viewer_state')
+        if state is None or obj.id not in state.post_ids:
+            state = PostViewerState.resolve(
+                self.context['request'].user, [obj],
+                **self.get_viewer_relations(),
+            )
+            self.context['post_viewer_state'] = state
+        return state
+
+    def get_preview_relations(self):
+        """
+        Returns which previews the current fields need.
+        """
+        return {
+            'comments': 'comment_preview' in self.fields,
+            'likers': 'liker_preview' in self.fields,
+        }
+
+    def get_previews(self, obj):
+        """
+        Returns the PostPreviews covering the post, resolving them for
+        this single post when it is serialized outside of a list.
         """
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return Share.objects.filter(user=user, post=obj).exists()
-        return False  # Return False if the user is not authenticated
+        previews = self.context.get('post_previews')
+        if previews is None or obj.id not in previews.post_ids:
+            previews = PostPreviews.resolve(
+                [obj], **self.get_preview_relations()
+            )
+            self.context['post_previews'] = previews
+        return previews
 
-    def get_likes_count(self, obj):
+    def get_comment_preview(self, obj):
         """
-        Gets the total count of likes for the post, including shared posts.
+        Returns the post's latest comments, newest first.
         """
-        return Like.objects.filter(post=obj).count()
+        return self.get_previews(obj).comments.get(obj.id, [])
 
-    def get_share_count(self, obj):
+    def get_liker_preview(self, obj):
         """
-        Get the total number of shares for this post.
-        For shared posts, count shares on both the original post and any shared
-        posts.
+        Returns the owners of the post's most recent likes.
         """
-        return Share.objects.filter(post=obj).count()
+        return self.get_previews(obj).likers.get(obj.id, [])
 
-    def get_comments_count(self, obj):
+    def get_like_id(self, obj):
+        """
+        Retrieves the ID of the Like object if the authenticated user
+        has liked the post; returns None otherwise.
         """
-        Returns the count of comments for the post or shared post.
+        return self.get_viewer_state(obj).like_ids.get(obj.id)
+
+    def get_is_liked_by_user(self, obj):
+        """
+        Checks if the authenticated user has liked the post.
+        """
+        return obj.id in self.get_viewer_state(obj).like_ids
+
+    def get_shared_by(self, obj):
+        """
+        Returns the usernames of everyone who shared the post.
+        """
+        return self.get_viewer_state(obj).shared_by.get(obj.id, [])
+
+    def get_is_shared_by_user(self, obj):
+        """
+        Checks if the authenticated user has shared the post.
         """
-        return Comment.objects.filter(post=obj).count()
+        return obj.id in self.get_viewer_state(obj).shared_ids
 
     class Meta:
         model = Post
+        list_serializer_class = PostListSerializer
         fields = [
             'id', 'owner', 'created_at', 'updated_at', 'event',
-            'description', 'image', 'location', 'date', 'time', 'is_owner',
-            'profile_id', 'profile_image', 'image_filter', 'like_id',
+            'description', 'image', 'image_upload', 'image_width',
+            'image_height', 'image_state', 'srcset', 'srcset_filter',
+            'location', 'date',
+            'time', 'is_owner', 'profile_id', 'profile_image',
+            'image_filter', 'like_id',
             'likes_count', 'comments_count', 'share_count', 'shared_by',
-            'is_shared_by_user', 'is_liked_by_user'
+            'is_shared_by_user', 'is_liked_by_user', 'comment_preview',
+            'liker_preview',
         ]
+        read_only_fields = ['image_width', 'image_height', 'image_state']
@@ -1,5 +1,16 @@
+from datetime import date, timedelta
+from io import StringIO
 from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
 from .models import Post
+from comments.models import Comment
+from drf_api.filters import semi_join
+from followers.models import Follower
+from likes.models import Like
+from shares.models import Share
 from rest_framework import status
 from rest_framework.test import APITestCase
 
@@ -47,6 +58,28 @@ class PostListViewTest(APITestCase):
         self.assertEqual(count, 1)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    def test_list_resolves_viewer_state_per_page(self):
+        """
+        Ensure like and share state is served for every post on the page.
+        """
+        other = User.objects.create_user(username="other", password="pw")
+        liked = Post.objects.create(owner=other, event='liked')
+        shared = Post.objects.create(owner=other, event='shared')
+        like = Like.objects.create(owner=self.user, post=liked)
+        Share.objects.create(user=self.user, post=shared)
+        Share.objects.create(user=other, post=shared)
+        self.client.login(username='tester', password='password')
+        response = self.client.get('/posts/')
+        results = {post['id']: post for post in response.data['results']}
+        self.assertEqual(results[liked.id]['like_id'], like.id)
+        self.assertTrue(results[liked.id]['is_liked_by_user'])
+        self.assertFalse(results[liked.id]['is_shared_by_user'])
+        self.assertIsNone(results[shared.id]['like_id'])
+        self.assertTrue(results[shared.id]['is_shared_by_user'])
+        self.assertCountEqual(
+            results[shared.id]['shared_by'], ['tester', 'other']
+        )
+
     def test_logged_out_user_cant_create_post(self):
         """
         Ensure a logged-out user cannot create a post (403 Forbidden).
@@ -155,3 +188,665 @@ class PostDetailViewTest(APITestCase):
         self.client.login(username='tester1', password='password1')
         response = self.client.delete('/posts/2/')
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class PostCounterTest(APITestCase):
+    """
+    Tests for the stored like, comment and share counters on Post.
+    """
+
+    def setUp(self):
+        """
+        Create a test user and a post to interact with.
+        """
+        self.user = User.objects.create_user(
+            username="tester",
+            password="password",
+        )
+        self.post = Post.objects.create(owner=self.user, event='counted')
+
+    def test_counters_follow_creates_and_deletes(self):
+        """
+        Ensure creating and deleting likes and shares updates the counters.
+        """
+        like = Like.objects.create(owner=self.user, post=self.post)
+        share = Share.objects.create(user=self.user, post=self.post)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertEqual(self.post.share_count, 1)
+        like.delete()
+        share.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+        self.assertEqual(self.post.share_count, 0)
+
+    def test_rebuild_command_repairs_drift(self):
+        """
+        Ensure rebuild_post_counters recomputes counters from the tables.
+        """
+        Like.objects.create(owner=self.user, post=self.post)
+        Post.objects.filter(pk=self.post.pk).update(
+            likes_count=42, comments_count=7
+        )
+        call_command('rebuild_post_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertEqual(self.post.comments_count, 0)
+
+
+class PostListPaginationTest(APITestCase):
+    """
+    Tests for the keyset pagination of the PostList view.
+    """
+
+    def setUp(self):
+        """
+        Create a test user with more posts than fit on one page, some of
+        them sharing the same likes_count.
+        """
+        caches['responses'].clear()
+        self.user = User.objects.create_user(
+            username="tester",
+            password="password",
+        )
+        for index in range(15):
+            Post.objects.create(
+                owner=self.user, event=f'event {index}',
+                likes_count=index % 3,
+            )
+
+    def collect_pages(self, url):
+        """
+        Follow the `next` links from `url`, returning every post ID seen.
+        """
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(post['id'] for post in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_pages_cover_every_post_once(self):
+        """
+        Ensure paging by creation date visits every post exactly once.
+        """
+        ids = self.collect_pages('/posts/')
+        self.assertEqual(
+            ids,
+            list(Post.objects.order_by('-created_at', '-id').values_list(
+                'id', flat=True
+            ))
+        )
+
+    def test_pages_with_non_unique_ordering(self):
+        """
+        Ensure ties in an ordering field neither skip nor repeat posts.
+        """
+        ids = self.collect_pages('/posts/?ordering=-likes_count')
+        self.assertEqual(
+            ids,
+            list(Post.objects.order_by('-likes_count', '-id').values_list(
+                'id', flat=True
+            ))
+        )
+
+    def test_previous_link_returns_first_page(self):
+        """
+        Ensure the previous link of the second page leads back to the first.
+        """
+        first = self.client.get('/posts/')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+        self.assertIsNone(back.data['previous'])
+
+    def test_invalid_cursor_returns_not_found(self):
+        """
+        Ensure a malformed cursor is rejected with 404 Not Found.
+        """
+        response = self.client.get('/posts/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PostRelationFilterTest(APITestCase):
+    """
+    Tests for filtering the PostList view across multi-valued relations.
+    """
+
+    def setUp(self):
+        """
+        Create a liker, an author followed by two users, and two posts of
+        which the liker likes one.
+        """
+        self.liker = User.objects.create_user(username="liker", password="pw")
+        self.author = User.objects.create_user(
+            username="author", password="pw"
+        )
+        fan = User.objects.create_user(username="fan", password="pw")
+        Follower.objects.create(owner=self.liker, followed=self.author)
+        Follower.objects.create(owner=fan, followed=self.author)
+        self.liked = Post.objects.create(owner=self.author, event='liked')
+        Post.objects.create(owner=self.liker, event='not liked')
+        Like.objects.create(owner=self.liker, post=self.liked)
+        Like.objects.create(owner=fan, post=self.liked)
+
+    def test_filters_compile_to_exists(self):
+        """
+        Ensure reverse relation filters use EXISTS rather than a JOIN.
+        """
+        condition = semi_join(
+            Post, 'likes__owner__profile', 'exact', self.liker.profile
+        )
+        sql = str(Post.objects.filter(condition).query)
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('JOIN "likes_like"', sql.split('EXISTS')[0])
+
+    def test_filter_by_liker_returns_each_post_once(self):
+        """
+        Ensure posts liked by a profile are listed once each.
+        """
+        response = self.client.get(
+            f'/posts/?likes__owner__profile={self.liker.profile.id}'
+        )
+        self.assertEqual(
+            [post['id'] for post in response.data['results']],
+            [self.liked.id],
+        )
+
+    def test_filter_by_followed_owner(self):
+        """
+        Ensure the following feed filter lists posts of followed users.
+        """
+        response = self.client.get(
+            '/posts/?owner__followed__owner__profile='
+            f'{self.liker.profile.id}'
+        )
+        self.assertEqual(
+            [post['event'] for post in response.data['results']], ['liked']
+        )
+
+
+class PostSearchTest(APITestCase):
+    """
+    Tests for full-text search on the PostList view.
+    """
+
+    def setUp(self):
+        """
+        Create posts by two users with different events and locations.
+        """
+        caches['responses'].clear()
+        dj = User.objects.create_user(username="djmaria", password="pw")
+        band = User.objects.create_user(username="bandleader", password="pw")
+        Post.objects.create(
+            owner=dj, event='Techno night', location='Warehouse',
+            description='Techno until sunrise, techno all night',
+        )
+        Post.objects.create(
+            owner=band, event='Jazz evening', location='Riverside',
+            description='Smooth jazz with a little techno',
+        )
+        Post.objects.create(
+            owner=band, event='Folk festival', location='Old town',
+        )
+
+    def search(self, query):
+        response = self.client.get('/posts/', {'search': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['event'] for post in response.data['results']]
+
+    def test_search_matches_word_prefixes(self):
+        """
+        Ensure a partial word matches the start of words in any field.
+        """
+        self.assertEqual(self.search('jaz'), ['Jazz evening'])
+        self.assertEqual(self.search('river'), ['Jazz evening'])
+
+    def test_search_matches_owner_username(self):
+        """
+        Ensure posts can be found by their owner's username.
+        """
+        self.assertCountEqual(
+            self.search('bandleader'), ['Jazz evening', 'Folk festival']
+        )
+
+    def test_search_requires_every_term(self):
+        """
+        Ensure every term of a query must match.
+        """
+        self.assertEqual(self.search('jazz techno'), ['Jazz evening'])
+        self.assertEqual(self.search('folk techno'), [])
+
+    def test_search_ranks_by_relevance(self):
+        """
+        Ensure the most relevant post is listed first.
+        """
+        self.assertEqual(
+            self.search('techno'), ['Techno night', 'Jazz evening']
+        )
+
+    def test_search_ignores_query_syntax(self):
+        """
+        Ensure operators in the query are treated as plain text.
+        """
+        self.assertEqual(self.search('"jazz"* ^('), ['Jazz evening'])
+
+    def test_search_follows_post_updates(self):
+        """
+        Ensure the search document is rewritten when a post changes.
+        """
+        post = Post.objects.get(event='Folk festival')
+        post.event = 'Blues festival'
+        post.save()
+        self.assertEqual(self.search('blues'), ['Blues festival'])
+        self.assertEqual(self.search('folk'), [])
+
+    def test_search_follows_username_changes(self):
+        """
+        Ensure renaming a user rewrites their posts' search documents in
+        one batch, and saves keeping the username rewrite none.
+        """
+        band = User.objects.get(username='bandleader')
+        band.first_name = 'Band'
+        with CaptureQueriesContext(connection) as queries:
+            band.save()
+        self.assertFalse([
+            query for query in queries
+            if 'posts_postsearchdocument' in query['sql']
+        ])
+        band.username = 'brassband'
+        with CaptureQueriesContext(connection) as queries:
+            band.save()
+        self.assertEqual(len([
+            query for query in queries
+            if query['sql'].startswith('UPDATE')
+            and 'posts_postsearchdocument' in query['sql']
+        ]), 1)
+        self.assertCountEqual(
+            self.search('brassband'), ['Jazz evening', 'Folk festival']
+        )
+        self.assertEqual(self.search('bandleader'), [])
+
+
+class PostListCacheTest(APITestCase):
+    """
+    Tests for the anonymous response cache of the PostList view.
+    """
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.user = User.objects.create_user(
+            username='tester', password='password'
+        )
+        self.post = Post.objects.create(owner=self.user, event='Jazz night')
+
+    def test_anonymous_list_is_served_from_cache(self):
+        """
+        Ensure a repeated anonymous request is a cache hit.
+        """
+        first = self.client.get('/posts/')
+        second = self.client.get('/posts/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.data, second.data)
+
+    def test_equivalent_query_strings_share_an_entry(self):
+        """
+        Ensure parameter order and empty values do not split the cache.
+        """
+        self.client.get('/posts/?ordering=-likes_count&search=')
+        response = self.client.get('/posts/?ordering=-likes_count')
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_writes_invalidate_the_cache(self):
+        """
+        Ensure a like on a listed post is visible on the next request.
+        """
+        self.client.get('/posts/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.create(owner=self.user, post=self.post)
+        response = self.client.get('/posts/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['likes_count'], 1)
+
+    def test_uncommitted_writes_are_not_cached_as_new(self):
+        """
+        Ensure a request reading the old rows while a write is still
+        uncommitted cannot cache them past the commit.
+        """
+        self.client.get('/posts/')
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Like.objects.create(owner=self.user, post=self.post)
+                during = self.client.get('/posts/')
+        after = self.client.get('/posts/')
+        self.assertEqual(during['X-Cache'], 'HIT')
+        self.assertEqual(after['X-Cache'], 'MISS')
+        self.assertEqual(after.data['results'][0]['likes_count'], 1)
+
+    def test_authenticated_requests_bypass_the_cache(self):
+        """
+        Ensure personalised responses are never cached.
+        """
+        self.client.login(username='tester', password='password')
+        self.client.get('/posts/')
+        response = self.client.get('/posts/')
+        self.assertNotIn('X-Cache', response)
+        self.assertIsNotNone(response.data['results'][0]['is_owner'])
+
+    def test_metrics_report_hits_to_staff(self):
+        """
+        Ensure the metrics endpoint reports cache hits to staff only.
+        """
+        self.client.get('/posts/')
+        self.client.get('/posts/')
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        User.objects.create_user(
+            username='admin', password='password', is_staff=True
+        )
+        self.client.login(username='admin', password='password')
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.data['response_cache']['hits'], 1)
+        self.assertEqual(response.data['response_cache']['misses'], 1)
+
+
+class PostConditionalGetTest(APITestCase):
+    """
+    Tests for the ETag validator of the PostDetail view.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='tester', password='password'
+        )
+        self.post = Post.objects.create(owner=self.user, event='Jazz night')
+        self.url = f'/posts/{self.post.id}/'
+
+    def test_matching_etag_returns_not_modified(self):
+        """
+        Ensure a request with the current ETag gets a 304 without a body,
+        served from a single query.
+        """
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_like_changes_etag(self):
+        """
+        Ensure liking the post invalidates the ETag.
+        """
+        etag = self.client.get(self.url)['ETag']
+        Like.objects.create(owner=self.user, post=self.post)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['likes_count'], 1)
+
+    def test_unlike_and_relike_changes_etag(self):
+        """
+        Ensure the ETag changes when the like id does, even though the
+        count ends up where it was.
+        """
+        Like.objects.create(owner=self.user, post=self.post)
+        self.client.login(username='tester', password='password')
+        etag = self.client.get(self.url)['ETag']
+        Like.objects.filter(post=self.post).delete()
+        Like.objects.create(owner=self.user, post=self.post)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_etag_differs_per_user(self):
+        """
+        Ensure another user's ETag is not accepted, since is_owner differs.
+        """
+        etag = self.client.get(self.url)['ETag']
+        self.client.login(username='tester', password='password')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_if_modified_since_after_unlike_returns_full_response(self):
+        """
+        Ensure an unlike, which leaves no newer timestamp behind, is never
+        hidden behind a 304 for If-Modified-Since.
+        """
+        Like.objects.create(owner=self.user, post=self.post)
+        self.client.login(username='tester', password='password')
+        response = self.client.get(self.url)
+        self.assertNotIn('Last-Modified', response)
+        self.assertTrue(response.data['is_liked_by_user'])
+        Like.objects.filter(post=self.post).delete()
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['is_liked_by_user'])
+        self.assertIsNone(response.data['like_id'])
+
+
+class PostSparseFieldsetTest(APITestCase):
+    """
+    Tests for `?fields=` and `?omit=` on the post endpoints.
+    """
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.user = User.objects.create_user(
+            username='tester', password='password'
+        )
+        self.post = Post.objects.create(
+            owner=self.user, event='Jazz night', description='Long text'
+        )
+
+    def test_fields_restricts_the_response_and_query(self):
+        """
+        Ensure only the requested fields are serialized, the viewer state
+        is not resolved and unused columns are not loaded.
+        """
+        self.client.login(username='tester', password='password')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/posts/?fields=id,event,owner')
+        self.assertEqual(
+            list(response.data['results'][0]), ['id', 'owner', 'event']
+        )
+        sql = [query['sql'] for query in queries.captured_queries]
+        post_sql = [query for query in sql if 'FROM "posts_post"' in query]
+        self.assertEqual(len(post_sql), 1)
+        self.assertNotIn('description', post_sql[0])
+        self.assertFalse(any('shares_share' in query for query in sql))
+        self.assertFalse(any('likes_like' in query for query in sql))
+
+    def test_omit_drops_fields(self):
+        """
+        Ensure omitted fields are left out of a detail response.
+        """
+        response = self.client.get(
+            f'/posts/{self.post.id}/?omit=description,shared_by'
+        )
+        self.assertNotIn('description', response.data)
+        self.assertNotIn('shared_by', response.data)
+        self.assertEqual(response.data['event'], 'Jazz night')
+
+    def test_unknown_field_is_rejected(self):
+        """
+        Ensure an unknown field name is a bad request.
+        """
+        response = self.client.get('/posts/?fields=id,nonsense')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_writes_ignore_fields(self):
+        """
+        Ensure a write is validated and answered with every field.
+        """
+        self.client.login(username='tester', password='password')
+        response = self.client.put(
+            f'/posts/{self.post.id}/?fields=id',
+            {'event': 'Blues night', 'location': 'Hall',
+             'date': date.today() + timedelta(days=1), 'time': '15:00'},
+        )
+        self.assertEqual(response.data['event'], 'Blues night')
+        self.assertIn('likes_count', response.data)
+
+
+class PostBatchTest(APITestCase):
+    """
+    Tests for the /posts/batch/ endpoint.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='tester', password='password'
+        )
+        self.posts = [
+            Post.objects.create(owner=self.user, event=f'Event {n}')
+            for n in range(3)
+        ]
+        Share.objects.create(user=self.user, post=self.posts[0])
+
+    def test_returns_posts_in_request_order(self):
+        """
+        Ensure posts come back in the requested order, skipping missing
+        and duplicate ids.
+        """
+        first, second, third = (post.id for post in self.posts)
+        response = self.client.get(
+            f'/posts/batch/?ids={third},{first},999,{third},{second}'
+        )
+        self.assertEqual(
+            [post['id'] for post in response.data], [third, first, second]
+        )
+
+    def test_fixed_number_of_queries(self):
+        """
+        Ensure the posts and their share state cost two queries.
+        """
+        ids = ','.join(str(post.id) for post in self.posts)
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/posts/batch/?ids={ids}')
+        self.assertEqual(response.data[0]['shared_by'], ['tester'])
+
+    def test_rejects_invalid_and_oversized_batches(self):
+        """
+        Ensure non-integer ids and batches over the limit are rejected.
+        """
+        response = self.client.get('/posts/batch/?ids=1,two')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(POST_BATCH_MAX_SIZE=2):
+            response = self.client.get('/posts/batch/?ids=1,2,3')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PostPreviewTest(APITestCase):
+    """
+    Tests for the comment and liker previews embedded with ?include=
+    """
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f'user{index}', password='pw')
+            for index in range(4)
+        ]
+        self.posts = [
+            Post.objects.create(owner=self.users[0], event=f'event {index}')
+            for index in range(3)
+        ]
+        for post in self.posts[:2]:
+            for user in self.users:
+                Comment.objects.create(
+                    owner=user, post=post, description=user.username,
+                )
+                Like.objects.create(owner=user, post=post)
+        caches['default'].clear()
+
+    def test_previews_are_only_embedded_when_included(self):
+        """
+        Ensure posts carry no previews unless asked for.
+        """
+        response = self.client.get('/posts/')
+        self.assertNotIn('comment_preview', response.data['results'][0])
+        self.assertNotIn('liker_preview', response.data['results'][0])
+
+    def test_previews_hold_the_latest_comments_and_likers(self):
+        """
+        Ensure each post has its two latest comments and three latest
+        likers, and posts without any have empty previews.
+        """
+        response = self.client.get(
+            '/posts/?include=comment_preview,liker_preview'
+        )
+        results = {post['id']: post for post in response.data['results']}
+        for post in self.posts[:2]:
+            self.assertEqual(
+                [comment['description']
+                 for comment in results[post.id]['comment_preview']],
+                ['user3', 'user2'],
+            )
+            likers = results[post.id]['liker_preview']
+            self.assertEqual(
+                [liker['owner'] for liker in likers],
+                ['user3', 'user2', 'user1'],
+            )
+            liker = likers[0]
+            self.assertEqual(liker['profile_id'], self.users[3].profile.id)
+            self.assertTrue(liker['profile_image'])
+        self.assertEqual(results[self.posts[2].id]['comment_preview'], [])
+        self.assertEqual(results[self.posts[2].id]['liker_preview'], [])
+
+    def test_previews_cost_one_query_each_per_page(self):
+        """
+        Ensure each preview adds a single query whatever the page size.
+        """
+        with CaptureQueriesContext(connection) as plain:
+            self.client.get('/posts/?fields=id')
+        with CaptureQueriesContext(connection) as included:
+            self.client.get(
+                '/posts/?fields=id,comment_preview,liker_preview'
+                '&include=comment_preview,liker_preview'
+            )
+        self.assertEqual(len(included), len(plain) + 2)
+        self.assertIn('ROW_NUMBER', included[-1]['sql'].upper())
+
+    def test_comment_edit_changes_preview_etag(self):
+        """
+        Ensure editing a previewed comment invalidates the ETag of a post
+        requested with its comment preview.
+        """
+        url = f'/posts/{self.posts[0].id}/?include=comment_preview'
+        etag = self.client.get(url)['ETag']
+        comment = Comment.objects.filter(post=self.posts[0]).first()
+        comment.description = 'edited'
+        comment.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['comment_preview'][0]['description'], 'edited'
+        )
+
+    def test_liker_profile_edit_changes_preview_etag(self):
+        """
+        Ensure a liker's profile update invalidates the ETag of a post
+        requested with its liker preview.
+        """
+        url = f'/posts/{self.posts[0].id}/?include=liker_preview'
+        etag = self.client.get(url)['ETag']
+        profile = self.users[3].profile
+        profile.name = 'renamed'
+        profile.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_previews_and_unknown_includes(self):
+        """
+        Ensure a single post resolves its own previews and unknown
+        previews are rejected.
+        """
+        response = self.client.get(
+            f'/posts/{self.posts[0].id}/?include=liker_preview'
+        )
+        self.assertEqual(len(response.data['liker_preview']), 3)
+        self.assertNotIn('comment_preview', response.data)
+        response = self.client.get('/posts/?include=followers')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -3,5 +3,6 @@ from posts import views
 
 urlpatterns = [
     path('posts/', views.PostList.as_view(), name='post-list'),
+    path('posts/batch/', views.PostBatch.as_view(), name='post-batch'),
     path('posts/<int:pk>/', views.PostDetail.as_view(), name='post-detail'),
 ]
@@ -1,28 +1,42 @@
-from django.db.models import Count
-from rest_framework import generics, permissions, filters
-from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
+from django.db import transaction
+from rest_framework import generics, permissions, filters, serializers
+from rest_framework.response import Response
+from drf_api.pagination import KeysetPagination
+from drf_api.filters import SemiJoinFilterBackend
+from drf_api.cache import CachedListMixin
+from drf_api.conditional import ConditionalRetrieveMixin, latest, newest
 from drf_api.permissions import IsOwnerOrReadOnly
+from drf_api.sparse import SparseFieldsetMixin
+from comments.models import Comment
+from likes.models import Like
+from shares.models import Share
 from .models import Post
+from .previews import get_includes
+from .search import PostSearchFilter
 from .serializers import PostSerializer
 
 
-class PostList(generics.ListCreateAPIView):
+class PostList(CachedListMixin, SparseFieldsetMixin,
+               generics.ListCreateAPIView):
     """
     API view to list all posts or create a new post.
     - List all posts, with filtering, searching, and ordering options.
+    - Pages with a keyset cursor, so deep pages cost the same as the first.
+    - `?fields=` / `?omit=` restrict the fields and the columns loaded.
     - Authenticated users can create posts.
     """
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    queryset = Post.objects.annotate(
-        likes_count=Count('likes', distinct=True),
-        comments_count=Count('comment', distinct=True),
-        share_count=Count('share_posts', distinct=True)
+    pagination_class = KeysetPagination
+    cache_scope = 'posts'
+    queryset = Post.objects.select_related(
+        'owner__profile'
     ).order_by('-created_at')
     filter_backends = [
         filters.OrderingFilter,
-        filters.SearchFilter,
-        DjangoFilterBackend,
+        PostSearchFilter,
+        SemiJoinFilterBackend,
     ]
     filterset_fields = [
         # Filter posts by followers of the owner
@@ -45,19 +59,111 @@ class PostList(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         """
         Override perform_create to associate the post with the logged-in user.
+        The post is fanned out to its owner's followers' timelines in the
+        same transaction.
         """
-        serializer.save(owner=self.request.user)
+        with transaction.atomic():
+            serializer.save(owner=self.request.user)
 
 
-class PostDetail(generics.RetrieveUpdateDestroyAPIView):
+class PostDetail(ConditionalRetrieveMixin, SparseFieldsetMixin,
+                 generics.RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update, or delete a single post.
     - Only the owner of the post can edit or delete it.
+    - Answers `If-None-Match` with a 304 when the post, its counters and
+      its owner's profile are unchanged, and with `?include=` so are the
+      previewed comments and the profiles of their authors and likers.
     """
     serializer_class = PostSerializer
     permission_classes = [IsOwnerOrReadOnly]
-    queryset = Post.objects.annotate(
-        likes_count=Count('likes', distinct=True),
-        comments_count=Count('comment', distinct=True),
-        share_count=Count('share_posts', distinct=True)
+    queryset = Post.objects.select_related(
+        'owner__profile'
     ).order_by('-created_at')
+    validator_fields = (
+        'updated_at', 'likes_count', 'comments_count', 'share_count',
+        'image_width', 'owner__username', 'owner__profile__updated_at',
+        'latest_like', 'latest_share',
+    )
+
+    # The previews' content, on top of the counters and latest like
+    preview_validators = {
+        'comment_preview': {
+            'newest_comment_edit': (Comment, 'post', 'updated_at'),
+            'newest_commenter_profile': (
+                Comment, 'post', 'owner__profile__updated_at'
+            ),
+        },
+        'liker_preview': {
+            'newest_liker_profile': (
+                Like, 'post', 'owner__profile__updated_at'
+            ),
+        },
+    }
+
+    def get_preview_validators(self):
+        included = get_includes(self.request)
+        return {
+            alias: newest(*source)
+            for name, validators in self.preview_validators.items()
+            if name in included
+            for alias, source in validators.items()
+        }
+
+    def get_validator_fields(self):
+        return self.validator_fields + tuple(self.get_preview_validators())
+
+    def get_validator_queryset(self):
+        # The newest like and share change whenever like_id, shared_by or
+        # is_shared_by_user can, even if the counters end up unchanged
+        return Post.objects.annotate(
+            latest_like=latest(Like, 'post'),
+            latest_share=latest(Share, 'post'),
+            **self.get_preview_validators(),
+        )
+
+
+class PostBatch(SparseFieldsetMixin, generics.ListAPIView):
+    """
+    API view to fetch specific posts by id in one request.
+    - `?ids=1,2,3` returns the existing posts in the order requested.
+    - Posts, their owners' profiles and the viewer's like/share state are
+      loaded in a fixed number of queries, however many ids are given.
+    - At most `POST_BATCH_MAX_SIZE` ids may be requested.
+    """
+    serializer_class = PostSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = None
+    queryset = PostList.queryset
+
+    def get_ids(self):
+        """
+        Parses `?ids=` into a list of unique post ids in request order.
+        """
+        try:
+            ids = [
+                int(value) for value in
+                self.request.query_params.get('ids', '').split(',')
+                if value.strip()
+            ]
+        except ValueError:
+            raise serializers.ValidationError(
+                {'ids': ['Ids must be integers.']}
+            )
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > settings.POST_BATCH_MAX_SIZE:
+            raise serializers.ValidationError({'ids': [
+                f'At most {settings.POST_BATCH_MAX_SIZE} ids are allowed.'
+            ]})
+        return ids
+
+    def list(self, request, *args, **kwargs):
+        ids = self.get_ids()
+        posts = {
+            post.id: post
+            for post in self.get_queryset().filter(pk__in=ids)
+        } if ids else {}
+        serializer = self.get_serializer(
+            [posts[pk] for pk in ids if pk in posts], many=True
+        )
+        return Response(serializer.data)
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from followers.models import Follower
+from posts.models import Post
+from profiles.models import Profile
+
+
+def count_per_owner(model, field):
+    """
+    Returns a correlated subquery counting the `model` rows whose `field`
+    is each profile's owner.
+    """
+    counts = model.objects.filter(**{field: OuterRef('owner')}).order_by(
+    ).values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts), 0)
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the stored `posts_count`, `followers_count` and
+    `following_count` of every profile from the Post and Follower tables.
+
+    Profiles are updated in primary key batches, each in its own
+    transaction, so the rebuild never holds locks on the whole table.
+    """
+    help = 'Rebuild the stored post, follower and following counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of profiles to update per transaction.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        profile_ids = Profile.objects.order_by('pk').values_list(
+            'pk', flat=True
+        )
+        last_id = 0
+        updated = 0
+        while True:
+            batch = list(profile_ids.filter(pk__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                updated += Profile.objects.filter(
+                    pk__gte=batch[0], pk__lte=batch[-1]
+                ).update(
+                    posts_count=count_per_owner(Post, 'owner'),
+                    followers_count=count_per_owner(Follower, 'followed'),
+                    following_count=count_per_owner(Follower, 'owner'),
+                )
+            last_id = batch[-1]
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt counters for {updated} profiles.')
+        )
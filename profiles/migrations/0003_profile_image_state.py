@@ -0,0 +1,18 @@
+# Generated by Django 3.2.4 on 2026-10-17 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0002_image_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='image_state',
+            field=models.CharField(choices=[('ready', 'Ready'), ('pending', 'Pending'), ('failed', 'Failed')], default='ready', max_length=16),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 3.2.4 on 2026-10-17 02:54
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    Profile = apps.get_model('profiles', 'Profile')
+
+    def count_per_owner(app_label, model_name, field):
+        model = apps.get_model(app_label, model_name)
+        counts = model.objects.filter(
+            **{field: OuterRef('owner')}
+        ).order_by().values(field).annotate(total=Count('pk')).values(
+            'total'
+        )
+        return Coalesce(Subquery(counts), 0)
+
+    Profile.objects.update(
+        posts_count=count_per_owner('posts', 'Post', 'owner'),
+        followers_count=count_per_owner('followers', 'Follower', 'followed'),
+        following_count=count_per_owner('followers', 'Follower', 'owner'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0003_profile_image_state'),
+        ('posts', '0008_post_image_derivatives'),
+        ('followers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['-posts_count', '-id'], name='profile_posts_count_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['-followers_count', '-id'], name='profile_followers_count_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['-following_count', '-id'], name='profile_following_count_id_idx'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,10 @@
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
 from django.contrib.auth.models import User
+from media.blobs import release_image
+from media.models import ImageState
 
 
 class Profile(models.Model):
@@ -20,8 +24,18 @@ class Profile(models.Model):
         Can be left blank.
         image (ImageField): The user's profile image. Defaults to a placeholder
         image if not provided.
+        image_width, image_height (PositiveIntegerField): Dimensions of the
+        uploaded image, read from its header at intake. Null for the
+        default image.
+        image_state (CharField): Whether a newly uploaded image is still
+        pending in the upload pipeline, or failed.
+        posts_count, followers_count, following_count (PositiveIntegerField):
+        Stored counts of the owner's posts, followers and followed users,
+        kept up to date by the Post and Follower signal handlers.
     Meta:
         ordering: Orders profiles by creation date in descending order.
+        indexes: One per counter, so the list can be ordered by it with an
+        index scan.
 
     Methods:
         __str__(): Returns a string representation of the profile,
@@ -35,9 +49,31 @@ class Profile(models.Model):
     image = models.ImageField(
         upload_to='images/', default='../default_profile_twcgma'
     )
+    image_width = models.PositiveIntegerField(null=True, blank=True)
+    image_height = models.PositiveIntegerField(null=True, blank=True)
+    image_state = models.CharField(
+        max_length=16, choices=ImageState.choices, default=ImageState.READY
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['-posts_count', '-id'],
+                name='profile_posts_count_id_idx',
+            ),
+            models.Index(
+                fields=['-followers_count', '-id'],
+                name='profile_followers_count_id_idx',
+            ),
+            models.Index(
+                fields=['-following_count', '-id'],
+                name='profile_following_count_id_idx',
+            ),
+        ]
 
     def __str__(self):
         """
@@ -47,6 +83,21 @@ class Profile(models.Model):
         return f"{self.owner}'s profile"
 
 
+def adjust_profile_counter(user_id, counter, delta):
+    """
+    Atomically add `delta` to one of the stored counters of a user's
+    profile, clamped at zero like the post counters.
+
+    Args:
+        user_id (int): The ID of the profile's owner.
+        counter (str): The counter field name, e.g. 'followers_count'.
+        delta (int): The amount to add; negative to subtract.
+    """
+    Profile.objects.filter(owner_id=user_id).update(
+        **{counter: Greatest(F(counter) + delta, 0)}
+    )
+
+
 def create_profile(sender, instance, created, **kwargs):
     """
     Signal handler to automatically create a Profile instance whenever a
@@ -73,3 +124,4 @@ def create_profile(sender, instance, created, **kwargs):
 
 
 post_save.connect(create_profile, sender=User)
+post_delete.connect(release_image, sender=Profile)
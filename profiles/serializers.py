@@ -1,9 +1,34 @@
 from rest_framework import serializers
 from .models import Profile
-from followers.models import Follower
+from drf_api.sparse import SparseFieldsetSerializerMixin
+from media.chunked import UploadTokenField
+from media.intake import ImageIntakeSerializerMixin, IntakeImageField
+from media.pipeline import StagedImageSerializerMixin
+from .viewer_state import ProfileViewerState
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileListSerializer(serializers.ListSerializer):
+    """
+    List serializer for pages of profiles.
+    Resolves the viewer's follows of every profile on the page up front so
+    `following_id` is served from memory.
+    """
+
+    def to_representation(self, data):
+        profiles = list(data.all() if hasattr(data, 'all') else data)
+        if 'following_id' in self.child.fields:
+            self.context['profile_viewer_state'] = (
+                ProfileViewerState.resolve(
+                    self.context['request'].user, profiles
+                )
+            )
+        return super().to_representation(profiles)
+
+
+class ProfileSerializer(SparseFieldsetSerializerMixin,
+                        ImageIntakeSerializerMixin,
+                        StagedImageSerializerMixin,
+                        serializers.ModelSerializer):
     """
     ProfileSerializer serializes the Profile model and provides additional
     fields for user interaction.
@@ -16,11 +41,19 @@ class ProfileSerializer(serializers.ModelSerializer):
       `get_is_owner` method.
     - `following_id`: Shows the ID of the following relationship if the current
       user follows the profile owner; otherwise, it returns `None`.
+    - `image`: Validated from its header only; `image_width` and
+      `image_height` are stored from it. New images are uploaded in the
+      background, with `image_state` pending until they are swapped in.
+    - `image_upload`: The token of a completed chunked upload, accepted in
+      place of `image` for larger files.
     Methods:
-    - `get_is_owner`: Compares the current request user with the profile owner
-      and returns `True` if they match; otherwise, `False`.
+    - `get_is_owner`: Compares the current request user's id with the
+      profile's `owner_id`, without loading the owner.
     - `get_following_id`: Retrieves the ID of the following relationship if it
-      exists; otherwise, returns `None`.
+      exists; otherwise, returns `None`. Lists resolve it for the whole page
+      in one query through `ProfileViewerState`.
+    Sparse fieldsets:
+    - `?fields=` and `?omit=` restrict the serialized fields on reads.
     Meta:
     - `model`: The Profile model.
     - `fields`: Specifies which fields to include in the serialized output.
@@ -34,31 +67,69 @@ class ProfileSerializer(serializers.ModelSerializer):
     posts_count = serializers.ReadOnlyField()
     followers_count = serializers.ReadOnlyField()
     following_count = serializers.ReadOnlyField()
+    image = IntakeImageField(required=False)
+    image_upload = UploadTokenField(required=False)
+
+    # Model fields read by the method fields, for sparse querysets
+    sparse_sources = {
+        'is_owner': ['owner'],
+        'following_id': ['owner'],
+    }
 
     def get_is_owner(self, obj):
         """
         Determine if the current user is the owner of the profile.
         """
         request = self.context['request']
-        return request.user == obj.owner
+        return request.user.id == obj.owner_id
+
+    def get_viewer_state(self, obj):
+        """
+        Returns the ProfileViewerState covering the profile, resolving it
+        for this single profile when it is serialized outside of a list.
+        """
+        state = self.context.get('profile_viewer_state')
+        if state is None or obj.owner_id not in state.owner_ids:
+            state = ProfileViewerState.resolve(
+                self.context['request'].user, [obj]
+            )
+            self.context['profile_viewer_state'] = state
+        return state
 
     def get_following_id(self, obj):
         """
         Retrieve the ID of the following relationship if it exists.
         Returns None if the user is not authenticated or not following.
         """
-        user = self.context['request'].user
-        if user.is_authenticated:
-            following = Follower.objects.filter(
-                owner=user, followed=obj.owner
-            ).first()
-            return following.id if following else None
-        return None
+        return self.get_viewer_state(obj).following_ids.get(obj.owner_id)
 
     class Meta:
         model = Profile
+        list_serializer_class = ProfileListSerializer
         fields = [
             'id', 'owner', 'created_at', 'updated_at', 'name',
-            'description', 'image', 'is_owner', 'following_id',
+            'description', 'image', 'image_upload', 'image_width',
+            'image_height', 'image_state', 'is_owner', 'following_id',
             'posts_count', 'followers_count', 'following_count',
         ]
+        read_only_fields = ['image_width', 'image_height', 'image_state']
+
+
+class ProfileSuggestionSerializer(ProfileSerializer):
+    """
+    ProfileSerializer for follow suggestions, adding `mutual_count`: how
+    many of the users the viewer follows follow the suggested profile's
+    owner. The counts are passed in the `mutual_counts` context.
+    """
+    mutual_count = serializers.SerializerMethodField()
+
+    sparse_sources = {
+        **ProfileSerializer.sparse_sources,
+        'mutual_count': ['owner'],
+    }
+
+    def get_mutual_count(self, obj):
+        return self.context['mutual_counts'].get(obj.owner_id, 0)
+
+    class Meta(ProfileSerializer.Meta):
+        fields = ProfileSerializer.Meta.fields + ['mutual_count']
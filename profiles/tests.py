@@ -1,4 +1,11 @@
+from io import StringIO
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from followers.graph import reset_follow_graph
+from followers.models import Follower
+from posts.models import Post
 from .models import Profile
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -91,3 +98,244 @@ class ProfileDetailViewTests(APITestCase):
             '/profiles/2/', {'phone_number': '12345'}
         )
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ProfileConditionalGetTest(APITestCase):
+    """
+    Tests for the ETag validator of the ProfileDetail view.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='tester', password='password'
+        )
+        self.other = User.objects.create_user(
+            username='other', password='password'
+        )
+        self.url = f'/profiles/{self.user.profile.id}/'
+
+    def test_matching_etag_returns_not_modified(self):
+        """
+        Ensure a request with the current ETag gets a 304.
+        """
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_new_follower_changes_etag(self):
+        """
+        Ensure a new follower invalidates the ETag.
+        """
+        etag = self.client.get(self.url)['ETag']
+        Follower.objects.create(owner=self.other, followed=self.user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['followers_count'], 1)
+
+
+class ProfileSparseFieldsetTest(APITestCase):
+    """
+    Tests for `?fields=` on the profile list.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='tester', password='password'
+        )
+
+    def test_unrequested_counts_are_not_annotated(self):
+        """
+        Ensure counts are only computed when serialized or ordered by.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/profiles/?fields=id,name')
+        self.assertEqual(list(response.data['results'][0]), ['id', 'name'])
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('posts_post', sql)
+        self.assertNotIn('followers_follower', sql)
+        response = self.client.get(
+            '/profiles/?fields=id,name&ordering=-posts_count'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_ownership_is_served_without_joining_owner(self):
+        """
+        Ensure `is_owner` and `following_id` read only the owner_id column.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                '/profiles/?fields=id,is_owner,following_id'
+            )
+        self.assertEqual(response.data['results'][0]['is_owner'], False)
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('auth_user', sql)
+
+
+class ProfileCounterTest(APITestCase):
+    """
+    Tests for the stored post, follower and following counters on Profile.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='tester', password='password'
+        )
+        self.other = User.objects.create_user(
+            username='other', password='password'
+        )
+
+    def test_counters_follow_creates_and_deletes(self):
+        """
+        Ensure creating and deleting posts and follows updates the
+        counters of both profiles.
+        """
+        post = Post.objects.create(owner=self.user, event='counted')
+        follow = Follower.objects.create(owner=self.other, followed=self.user)
+        profile, other = self.user.profile, self.other.profile
+        profile.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(profile.posts_count, 1)
+        self.assertEqual(profile.followers_count, 1)
+        self.assertEqual(other.following_count, 1)
+        post.delete()
+        follow.delete()
+        profile.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(profile.posts_count, 0)
+        self.assertEqual(profile.followers_count, 0)
+        self.assertEqual(other.following_count, 0)
+
+    def test_ordering_by_counter_does_not_join(self):
+        """
+        Ensure the list orders by the stored counter without joining the
+        Follower table.
+        """
+        Follower.objects.create(owner=self.user, followed=self.other)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/profiles/?ordering=-followers_count')
+        self.assertEqual(response.data['results'][0]['owner'], 'other')
+        self.assertEqual(response.data['results'][0]['followers_count'], 1)
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('followers_follower', sql)
+
+    def test_rebuild_command_repairs_drift(self):
+        """
+        Ensure rebuild_profile_counters recomputes counters from the
+        tables.
+        """
+        Post.objects.create(owner=self.user, event='counted')
+        Profile.objects.filter(owner=self.user).update(
+            posts_count=42, followers_count=7
+        )
+        call_command('rebuild_profile_counters', stdout=StringIO())
+        profile = Profile.objects.get(owner=self.user)
+        self.assertEqual(profile.posts_count, 1)
+        self.assertEqual(profile.followers_count, 0)
+
+
+class ProfileViewerStateTest(APITestCase):
+    """
+    Tests for resolving the viewer's follows per page of profiles.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='tester', password='password'
+        )
+        self.client.login(username='tester', password='password')
+
+    def add_profiles(self, count):
+        for number in range(count):
+            other = User.objects.create_user(
+                username=f'user{User.objects.count()}', password='password'
+            )
+            if number % 2:
+                Follower.objects.create(owner=self.user, followed=other)
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/profiles/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries.captured_queries), response
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        """
+        Ensure a page of profiles costs the same number of queries
+        whatever its size.
+        """
+        self.add_profiles(2)
+        small, _ = self.count_queries()
+        self.add_profiles(6)
+        large, response = self.count_queries()
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.data['results']), 9)
+
+    def test_following_ids_and_ownership(self):
+        """
+        Ensure each profile reports the viewer's Follower row and whether
+        the viewer owns it.
+        """
+        self.add_profiles(4)
+        _, response = self.count_queries()
+        follows = dict(
+            Follower.objects.filter(owner=self.user).values_list(
+                'followed__username', 'id'
+            )
+        )
+        for profile in response.data['results']:
+            self.assertEqual(
+                profile['following_id'], follows.get(profile['owner'])
+            )
+            self.assertEqual(profile['is_owner'], profile['owner'] == 'tester')
+
+
+class ProfileSuggestionsTest(APITestCase):
+    """
+    Tests for the /profiles/suggestions/ endpoint.
+    """
+    def setUp(self):
+        reset_follow_graph()
+        self.addCleanup(reset_follow_graph)
+        self.users = {
+            name: User.objects.create_user(username=name, password='pass')
+            for name in ['tester', 'ann', 'bob', 'cat', 'dan']
+        }
+        for owner, followed in [
+            ('tester', 'ann'), ('tester', 'bob'), ('ann', 'cat'),
+            ('bob', 'cat'), ('bob', 'dan'), ('ann', 'tester'),
+        ]:
+            Follower.objects.create(
+                owner=self.users[owner], followed=self.users[followed]
+            )
+        self.client.login(username='tester', password='pass')
+
+    def suggested(self, **params):
+        response = self.client.get('/profiles/suggestions/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [
+            (profile['owner'], profile['mutual_count'])
+            for profile in response.data
+        ]
+
+    def test_suggests_friends_of_friends(self):
+        """
+        Ensure suggestions are ranked by mutual follows and exclude the
+        user and the users they follow.
+        """
+        self.assertEqual(self.suggested(), [('cat', 2), ('dan', 1)])
+        self.assertEqual(self.suggested(limit=1), [('cat', 2)])
+
+    def test_follows_update_the_graph(self):
+        """
+        Ensure following a suggested user removes it from the suggestions.
+        """
+        self.suggested()
+        with self.captureOnCommitCallbacks(execute=True):
+            Follower.objects.create(
+                owner=self.users['tester'], followed=self.users['cat']
+            )
+        self.assertEqual(self.suggested(), [('dan', 1)])
+
+    def test_requires_authentication(self):
+        """
+        Ensure anonymous users get no suggestions.
+        """
+        self.client.logout()
+        response = self.client.get('/profiles/suggestions/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
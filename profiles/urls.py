@@ -3,5 +3,6 @@ from profiles import views
 
 urlpatterns = [
     path('profiles/', views.ProfileList.as_view()),
+    path('profiles/suggestions/', views.ProfileSuggestions.as_view()),
     path('profiles/<int:pk>/', views.ProfileDetail.as_view()),
 ]
\ No newline at end of file
@@ -0,0 +1,37 @@
+from followers.models import Follower
+
+
+class ProfileViewerState:
+    """
+    Viewer-specific state for a page of profiles, resolved in bulk.
+
+    Holds the requesting user's follows of every profile owner on the
+    page, loaded with a single `IN` query instead of one query per
+    profile.
+
+    Attributes:
+        owner_ids (frozenset): IDs of the owners this state was resolved
+                               for.
+        following_ids (dict): Maps owner ID to the ID of the viewer's
+                              Follower row.
+    """
+
+    def __init__(self, owner_ids, following_ids):
+        self.owner_ids = frozenset(owner_ids)
+        self.following_ids = following_ids
+
+    @classmethod
+    def resolve(cls, user, profiles):
+        """
+        Load the viewer state for `profiles` on behalf of `user`.
+        Anonymous users follow no one, so they cost no query.
+        """
+        owner_ids = [profile.owner_id for profile in profiles]
+        following_ids = {}
+        if owner_ids and user.is_authenticated:
+            following_ids = dict(
+                Follower.objects.filter(
+                    owner=user, followed_id__in=owner_ids
+                ).order_by().values_list('followed_id', 'id')
+            )
+        return cls(owner_ids, following_ids)
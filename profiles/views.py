@@ -1,20 +1,28 @@
-from django.db.models import Count
-from rest_framework import generics, filters
-from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
+from rest_framework import generics, filters, permissions, serializers
+from rest_framework.response import Response
+from drf_api.filters import SemiJoinFilterBackend
+from drf_api.cache import CachedListMixin
+from drf_api.conditional import ConditionalRetrieveMixin, latest
 from drf_api.permissions import IsOwnerOrReadOnly
+from drf_api.sparse import SparseFieldsetMixin
+from followers.graph import get_follow_graph
+from followers.models import Follower
 from .models import Profile
-from .serializers import ProfileSerializer
+from .serializers import ProfileSerializer, ProfileSuggestionSerializer
 
 
-class ProfileList(generics.ListAPIView):
+class ProfileList(CachedListMixin, SparseFieldsetMixin,
+                  generics.ListAPIView):
     """
     API view to list all profiles.
 
-    - Profiles are annotated with additional fields:
+    - Profiles include stored counters:
         - `posts_count`: The number of posts created by the profile owner.
         - `followers_count`: The number of users following the profile owner.
         - `following_count`: The number of users the profile owner is following
     - Profiles are ordered by their creation date (descending) by default.
+    - `?fields=` / `?omit=` restrict the fields and columns.
 
     Filtering and ordering:
     - Filters:
@@ -26,20 +34,20 @@ class ProfileList(generics.ListAPIView):
         - `posts_count`: Total posts by the profile owner.
         - `followers_count`: Total followers of the profile owner.
         - `following_count`: Total users the profile owner follows.
+        The counters are indexed, so these orderings are index scans.
         - `owner__following__created_at`: Date of following activity.
         - `owner__followed__created_at`: Date of follower activity.
     """
-    queryset = Profile.objects.annotate(
-        posts_count=Count('owner__post', distinct=True),
-        followers_count=Count('owner__followed', distinct=True),
-        following_count=Count('owner__following', distinct=True),
-    ).order_by('-created_at')
+    queryset = Profile.objects.select_related('owner').order_by(
+        '-created_at'
+    )
     serializer_class = ProfileSerializer
+    cache_scope = 'profiles'
 
     # Add support for filtering and ordering
     filter_backends = [
         filters.OrderingFilter,  # Enable ordering by specified fields
-        DjangoFilterBackend,    # Enable filtering using DjangoFilterBackend
+        SemiJoinFilterBackend,  # Filter across relations with EXISTS
     ]
     filterset_fields = [
         # Filter profiles followed by the current user
@@ -56,16 +64,19 @@ class ProfileList(generics.ListAPIView):
     ]
 
 
-class ProfileDetail(generics.RetrieveUpdateAPIView):
+class ProfileDetail(ConditionalRetrieveMixin, SparseFieldsetMixin,
+                    generics.RetrieveUpdateAPIView):
     """
     API view to retrieve or update a single profile.
 
     - Only the owner of the profile can update it.
-    - The profile includes annotations for additional fields:
+    - The profile includes stored counters:
         - `posts_count`: The number of posts created by the profile owner.
         - `followers_count`: The number of users following the profile owner.
         - `following_count`: The number of users the profile owner is following
     - Profiles are ordered by their creation date (descending) by default.
+    - Conditional GETs are answered with a 304 when the profile, its counts
+      and its newest follower are unchanged.
 
     Permissions:
     - Read-only access is allowed for all users.
@@ -73,9 +84,73 @@ class ProfileDetail(generics.RetrieveUpdateAPIView):
     """
     # Custom permission to restrict updates to the owner
     permission_classes = [IsOwnerOrReadOnly]
-    queryset = Profile.objects.annotate(
-        posts_count=Count('owner__post', distinct=True),
-        followers_count=Count('owner__followed', distinct=True),
-        following_count=Count('owner__following', distinct=True),
-    ).order_by('-created_at')  # Default ordering by creation date
+    queryset = Profile.objects.select_related('owner').order_by(
+        '-created_at'
+    )
     serializer_class = ProfileSerializer
+    validator_fields = (
+        'updated_at', 'image_width', 'owner__username', 'posts_count',
+        'followers_count', 'following_count', 'latest_follower',
+    )
+
+    def get_validator_queryset(self):
+        return Profile.objects.annotate(
+            latest_follower=latest(Follower, 'followed', 'owner'),
+        )
+
+
+class ProfileSuggestions(SparseFieldsetMixin, generics.ListAPIView):
+    """
+    API view suggesting profiles for the requesting user to follow.
+    - Ranks the users followed by the people the user follows by how many
+      of them follow each one (`mutual_count`), from the in-memory follow
+      graph rather than the Follower table.
+    - Excludes the user and everyone they already follow.
+    - `?limit=` sets the number of suggestions, at most
+      `FOLLOW_GRAPH['MAX_LIMIT']`.
+    """
+    serializer_class = ProfileSuggestionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+    queryset = ProfileList.queryset
+
+    def get_limit(self):
+        """
+        Parses `?limit=`, defaulting to `FOLLOW_GRAPH['LIMIT']`.
+        """
+        limit = self.request.query_params.get('limit')
+        if limit is None:
+            return settings.FOLLOW_GRAPH['LIMIT']
+        max_limit = settings.FOLLOW_GRAPH['MAX_LIMIT']
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= max_limit:
+            raise serializers.ValidationError({'limit': [
+                f'Limit must be between 1 and {max_limit}.'
+            ]})
+        return limit
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['mutual_counts'] = getattr(self, 'mutual_counts', {})
+        return context
+
+    def list(self, request, *args, **kwargs):
+        suggestions = get_follow_graph().suggest(
+            request.user.id, self.get_limit()
+        )
+        self.mutual_counts = dict(suggestions)
+        profiles = {
+            profile.owner_id: profile
+            for profile in self.get_queryset().filter(
+                owner_id__in=self.mutual_counts
+            )
+        } if suggestions else {}
+        serializer = self.get_serializer(
+            [profiles[user_id] for user_id, _ in suggestions
+             if user_id in profiles],
+            many=True,
+        )
+        return Response(serializer.data)
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.4 on 2026-10-17 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shares', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='share',
+            index=models.Index(fields=['created_at'], name='share_created_at_idx'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
 from django.contrib.auth.models import User
-from posts.models import Post
+from posts.models import Post, adjust_post_counter
 
 
 class Share(models.Model):
@@ -21,6 +22,8 @@ class Share(models.Model):
         - `ordering`: Orders shares in descending order of creation date.
         - `unique_together`: Ensures a user can share a specific post only
         once.
+        - `indexes`: Indexes `created_at` so the trending computation reads
+        recent shares with a range scan.
     """
     user = models.ForeignKey(
         User,
@@ -40,6 +43,9 @@ class Share(models.Model):
         ordering = ['-created_at']  # Orders shares by the most recent first
         # Ensures a user cannot share the same post multiple times
         unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['created_at'], name='share_created_at_idx'),
+        ]
 
     def __str__(self):
         """
@@ -49,3 +55,24 @@ class Share(models.Model):
             str: A string in the format "username shared 'post_title'".
         """
         return f"{self.user.username} shared '{self.post.event}'"
+
+
+def increment_post_share_count(sender, instance, created, **kwargs):
+    """
+    Signal handler that increments the post's `share_count`
+    when a new Share is created.
+    """
+    if created:
+        adjust_post_counter(instance.post_id, 'share_count', 1)
+
+
+def decrement_post_share_count(sender, instance, **kwargs):
+    """
+    Signal handler that decrements the post's `share_count`
+    when a Share is deleted, including cascaded deletes.
+    """
+    adjust_post_counter(instance.post_id, 'share_count', -1)
+
+
+post_save.connect(increment_post_share_count, sender=Share)
+post_delete.connect(decrement_post_share_count, sender=Share)
@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import generics, permissions
 from rest_framework.exceptions import ValidationError
 from posts.models import Post
@@ -44,8 +45,10 @@ class ShareList(generics.ListCreateAPIView):
         if Share.objects.filter(user=user, post=post).exists():
             raise ValidationError("You have already shared this post.")
 
-        # Save the share instance with the logged-in user
-        serializer.save(user=user)
+        # Save the share instance with the logged-in user, bumping the
+        # post's share_count in the same transaction
+        with transaction.atomic():
+            serializer.save(user=user)
 
 
 class ShareDetail(generics.RetrieveDestroyAPIView):
@@ -122,6 +125,6 @@ class UserSharedPostsView(generics.ListAPIView):
             (i.e., shared_posts__isnull=False).
         """
         # Fetch distinct posts that have been shared
-        shared_posts = Post.objects.filter(
+        shared_posts = Post.objects.select_related('owner__profile').filter(
             shared_posts__isnull=False).distinct()
         return shared_posts
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from timelines.models import TimelineEntry, trim_timeline
+
+
+class Command(BaseCommand):
+    """
+    Deletes the timeline entries beyond the newest `TIMELINE_MAX_LENGTH`
+    of every timeline.
+
+    Fan-out on write appends to timelines without trimming them, so this
+    is meant to run periodically. Only timelines over the limit are
+    visited, each trimmed in its own transaction.
+    """
+    help = 'Trim home timelines to TIMELINE_MAX_LENGTH entries.'
+
+    def handle(self, *args, **options):
+        owner_ids = TimelineEntry.objects.order_by().values(
+            'owner_id'
+        ).annotate(entries=Count('pk')).filter(
+            entries__gt=settings.TIMELINE_MAX_LENGTH
+        ).values_list('owner_id', flat=True)
+        trimmed = 0
+        for owner_id in list(owner_ids):
+            with transaction.atomic():
+                trim_timeline(owner_id)
+            trimmed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Trimmed {trimmed} timelines to '
+            f'{settings.TIMELINE_MAX_LENGTH} entries.'
+        ))
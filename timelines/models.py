@@ -0,0 +1,201 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import models
+from django.db.models.signals import post_delete, post_save
+from followers.models import Follower
+from posts.models import Post
+from profiles.models import Profile
+
+
+class TimelineEntry(models.Model):
+    """
+    One post on one user's home timeline.
+
+    Entries are written when a post is created (fan-out on write), so the
+    "following" feed is read with a single range scan over the
+    `(owner, created_at, post)` index instead of joining through the
+    Follower table on every request.
+
+    Attributes:
+        owner (ForeignKey): The user whose timeline the entry belongs to.
+        post (ForeignKey): The post shown on the timeline.
+        created_at (DateTimeField): Copy of the post's creation time, used
+        to order the timeline.
+
+    Meta:
+        ordering: Newest posts first.
+        unique_together: A post appears on a timeline at most once.
+    """
+    owner = models.ForeignKey(
+        User, related_name='timeline_entries', on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post, related_name='timeline_entries', on_delete=models.CASCADE
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ['owner', 'post']
+        indexes = [
+            models.Index(
+                fields=['owner', '-created_at', '-post'],
+                name='timeline_owner_created_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.post} on {self.owner}\'s timeline'
+
+
+def is_merged_at_read(user_id):
+    """
+    Returns True if the posts of `user_id` are not fanned out because
+    they have more followers than `TIMELINE_FANOUT_LIMIT`.
+    """
+    return Profile.objects.filter(
+        owner_id=user_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+def authors_merged_at_read(user):
+    """
+    Returns the IDs of the accounts `user` follows whose posts are merged
+    into the timeline at read time rather than fanned out.
+    """
+    return list(
+        Follower.objects.filter(
+            owner=user,
+            followed__profile__followers_count__gt=(
+                settings.TIMELINE_FANOUT_LIMIT
+            ),
+        ).values_list('followed_id', flat=True)
+    )
+
+
+def trim_timeline(user_id):
+    """
+    Deletes the entries of `user_id`'s timeline beyond the newest
+    `TIMELINE_MAX_LENGTH`.
+    """
+    stale = TimelineEntry.objects.filter(owner_id=user_id).order_by(
+        '-created_at', '-post_id'
+    ).values_list('pk', flat=True)[settings.TIMELINE_MAX_LENGTH:]
+    stale = list(stale)
+    if stale:
+        TimelineEntry.objects.filter(pk__in=stale).delete()
+
+
+def fan_out_post(sender, instance, created, **kwargs):
+    """
+    Signal handler that writes a new post onto the timeline of every
+    follower of its owner, unless the owner is merged at read time.
+
+    Timelines are not trimmed here, which would cost a query per
+    follower on every post; the `trim_timelines` command cuts them back
+    to `TIMELINE_MAX_LENGTH` periodically instead.
+    """
+    if not created or is_merged_at_read(instance.owner_id):
+        return
+    follower_ids = Follower.objects.filter(
+        followed_id=instance.owner_id
+    ).values_list('owner_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                owner_id=follower_id, post=instance,
+                created_at=instance.created_at,
+            )
+            for follower_id in follower_ids.iterator()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_timeline(sender, instance, created, **kwargs):
+    """
+    Signal handler that copies the latest posts of a newly followed user
+    onto the follower's timeline, then trims it to its maximum length.
+    """
+    if not created or is_merged_at_read(instance.followed_id):
+        return
+    recent_posts = Post.objects.filter(
+        owner_id=instance.followed_id
+    ).order_by('-created_at', '-id').values_list(
+        'id', 'created_at'
+    )[:settings.TIMELINE_BACKFILL_SIZE]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                owner_id=instance.owner_id, post_id=post_id,
+                created_at=created_at,
+            )
+            for post_id, created_at in recent_posts
+        ],
+        ignore_conflicts=True,
+    )
+    trim_timeline(instance.owner_id)
+
+
+def remove_unfollowed_posts(sender, instance, **kwargs):
+    """
+    Signal handler that removes an unfollowed user's posts from the
+    former follower's timeline.
+    """
+    TimelineEntry.objects.filter(
+        owner_id=instance.owner_id, post__owner_id=instance.followed_id
+    ).delete()
+
+
+def resume_fan_out(sender, instance, **kwargs):
+    """
+    Signal handler that copies the latest posts of a user whose follower
+    count has just dropped back to `TIMELINE_FANOUT_LIMIT` onto the
+    timelines of their remaining followers.
+
+    Posts written while the user was over the limit were merged at read
+    time and never fanned out, so without this they would vanish from
+    those timelines once the user stops being merged at read time. The
+    follower counter is decremented by an earlier handler, so the
+    crossing is the delete that leaves the count at exactly the limit.
+    Timelines grown past `TIMELINE_MAX_LENGTH` are trimmed by the
+    `trim_timelines` command.
+    """
+    crossed = Profile.objects.filter(
+        owner_id=instance.followed_id,
+        followers_count=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+    if not crossed:
+        return
+    recent_posts = list(
+        Post.objects.filter(
+            owner_id=instance.followed_id
+        ).order_by('-created_at', '-id').values_list(
+            'id', 'created_at'
+        )[:settings.TIMELINE_BACKFILL_SIZE]
+    )
+    if not recent_posts:
+        return
+    follower_ids = Follower.objects.filter(
+        followed_id=instance.followed_id
+    ).values_list('owner_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                owner_id=follower_id, post_id=post_id,
+                created_at=created_at,
+            )
+            for follower_id in follower_ids.iterator()
+            for post_id, created_at in recent_posts
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+post_save.connect(fan_out_post, sender=Post)
+post_save.connect(backfill_timeline, sender=Follower)
+post_delete.connect(remove_unfollowed_posts, sender=Follower)
+post_delete.connect(resume_fan_out, sender=Follower)
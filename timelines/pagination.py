@@ -0,0 +1,69 @@
+from heapq import merge
+from django.db.models import F
+from drf_api.pagination import KeysetPagination
+
+
+class TimelinePagination(KeysetPagination):
+    """
+    Forward-only keyset pagination over a user's timeline.
+
+    Pages are cut from the TimelineEntry range scan, merged with the posts
+    of accounts that are not fanned out on write. Both sources are sought
+    from the same `(created_at, post_id)` position and merged in memory, so
+    a page costs one indexed query per source.
+    """
+    ordering = ('-created_at', '-post_id')
+    unique_field = 'post_id'
+
+    def paginate_timeline(self, entries, merged_posts, request):
+        """
+        Returns the posts of the requested page.
+
+        Args:
+            entries (QuerySet): The user's TimelineEntry rows.
+            merged_posts (QuerySet): Posts merged in at read time, or None.
+            request: The incoming request carrying the cursor.
+        """
+        self.page_size = self.get_page_size(request)
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.previous_position = None
+
+        terms = self.get_terms(entries)
+        annotations = {alias: F(field) for alias, field, *_ in terms}
+        entries = entries.annotate(**annotations)
+        position, _ = self.decode_cursor(request, entries, terms)
+        sources = [
+            (entry.post for entry in self.seek(
+                entries.select_related('post__owner__profile'),
+                terms, position,
+            )[:self.page_size + 1])
+        ]
+        if merged_posts is not None:
+            merged_posts = merged_posts.select_related(
+                'owner__profile'
+            ).annotate(post_id=F('id')).annotate(**annotations)
+            sources.append(
+                iter(self.seek(merged_posts, terms, position)[
+                    :self.page_size + 1
+                ])
+            )
+
+        def key(post):
+            # Entries copy the post's created_at, so posts from both sources
+            # share the same position
+            return [post.created_at, post.id]
+
+        page = []
+        seen = set()
+        for post in merge(*sources, key=key, reverse=True):
+            if post.id not in seen:
+                seen.add(post.id)
+                page.append(post)
+            if len(page) > self.page_size:
+                break
+
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.next_position = key(page[-1]) if has_more else None
+        return page
@@ -0,0 +1,162 @@
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from followers.models import Follower
+from posts.models import Post
+from .models import TimelineEntry
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+class TimelineFanOutTest(APITestCase):
+    """
+    Tests for keeping timelines in step with posts and follows.
+    """
+
+    def setUp(self):
+        """
+        Create a reader who follows an author.
+        """
+        self.reader = User.objects.create_user(
+            username="reader",
+            password="password",
+        )
+        self.author = User.objects.create_user(
+            username="author",
+            password="password",
+        )
+        Follower.objects.create(owner=self.reader, followed=self.author)
+
+    def test_new_post_is_written_to_followers_timelines(self):
+        """
+        Ensure creating a post adds it to each follower's timeline.
+        """
+        post = Post.objects.create(owner=self.author, event='fan out')
+        self.assertTrue(
+            TimelineEntry.objects.filter(owner=self.reader, post=post).exists()
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(owner=self.author).exists()
+        )
+
+    def test_follow_backfills_and_unfollow_removes_posts(self):
+        """
+        Ensure following copies existing posts to the timeline and
+        unfollowing removes them again.
+        """
+        other = User.objects.create_user(username="other", password="pw")
+        post = Post.objects.create(owner=other, event='older post')
+        follow = Follower.objects.create(owner=self.reader, followed=other)
+        self.assertTrue(
+            TimelineEntry.objects.filter(owner=self.reader, post=post).exists()
+        )
+        follow.delete()
+        self.assertFalse(
+            TimelineEntry.objects.filter(owner=self.reader, post=post).exists()
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_accounts_are_not_fanned_out(self):
+        """
+        Ensure posts of accounts above the fan-out limit are not written
+        to timelines.
+        """
+        Post.objects.create(owner=self.author, event='celebrity post')
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_posts_written_over_the_limit_are_backfilled_below_it(self):
+        """
+        Ensure posts not fanned out while an author was over the limit
+        reach the remaining followers once the author drops back to it.
+        """
+        other = User.objects.create_user(username="other", password="pw")
+        follow = Follower.objects.create(owner=other, followed=self.author)
+        with override_settings(TIMELINE_FANOUT_LIMIT=1):
+            post = Post.objects.create(owner=self.author, event='merged')
+            self.assertFalse(TimelineEntry.objects.exists())
+            follow.delete()
+        self.assertTrue(
+            TimelineEntry.objects.filter(owner=self.reader, post=post).exists()
+        )
+
+    @override_settings(TIMELINE_MAX_LENGTH=2)
+    def test_trim_timelines_command_cuts_timelines_to_max_length(self):
+        """
+        Ensure the trim_timelines command keeps only the newest entries
+        of timelines that fan-out has grown past the maximum length.
+        """
+        posts = [
+            Post.objects.create(owner=self.author, event=f'post {number}')
+            for number in range(3)
+        ]
+        self.assertEqual(TimelineEntry.objects.count(), 3)
+        call_command('trim_timelines', stdout=StringIO())
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list('post_id', flat=True)),
+            {posts[1].pk, posts[2].pk},
+        )
+
+
+class FeedViewTest(APITestCase):
+    """
+    Tests for the Feed view.
+    """
+
+    def setUp(self):
+        """
+        Create a reader following an author, and a stranger's post that
+        must not appear in the reader's feed.
+        """
+        self.reader = User.objects.create_user(
+            username="reader",
+            password="password",
+        )
+        self.author = User.objects.create_user(
+            username="author",
+            password="password",
+        )
+        stranger = User.objects.create_user(username="stranger", password="pw")
+        Follower.objects.create(owner=self.reader, followed=self.author)
+        Post.objects.create(owner=stranger, event='unrelated')
+
+    def test_logged_out_user_cant_read_feed(self):
+        """
+        Ensure the feed requires authentication.
+        """
+        response = self.client.get('/feed/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_feed_pages_through_followed_posts(self):
+        """
+        Ensure the feed lists followed users' posts newest first, across
+        pages.
+        """
+        for index in range(12):
+            Post.objects.create(owner=self.author, event=f'event {index}')
+        self.client.login(username='reader', password='password')
+        events = []
+        url = '/feed/'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            events.extend(post['event'] for post in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(
+            events, [f'event {index}' for index in range(11, -1, -1)]
+        )
+
+    def test_feed_merges_popular_accounts_at_read_time(self):
+        """
+        Ensure posts that were not fanned out still appear in the feed,
+        interleaved with timeline entries by creation time.
+        """
+        Post.objects.create(owner=self.author, event='fanned out')
+        with override_settings(TIMELINE_FANOUT_LIMIT=0):
+            Post.objects.create(owner=self.author, event='merged')
+            self.client.login(username='reader', password='password')
+            response = self.client.get('/feed/')
+        self.assertEqual(
+            [post['event'] for post in response.data['results']],
+            ['merged', 'fanned out'],
+        )
@@ -0,0 +1,6 @@
+from django.urls import path
+from timelines import views
+
+urlpatterns = [
+    path('feed/', views.Feed.as_view(), name='feed'),
+]
@@ -0,0 +1,38 @@
+from rest_framework import generics, permissions
+from posts.models import Post
+from posts.serializers import PostSerializer
+from .models import TimelineEntry, authors_merged_at_read
+from .pagination import TimelinePagination
+
+
+class Feed(generics.ListAPIView):
+    """
+    List the posts of the users the logged-in user follows, newest first.
+
+    - Reads the user's precomputed timeline with one indexed range scan.
+    - Posts of accounts with more than `TIMELINE_FANOUT_LIMIT` followers
+      are not fanned out; they are merged into the page at read time.
+    """
+    serializer_class = PostSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TimelinePagination
+
+    def get_queryset(self):
+        return TimelineEntry.objects.filter(owner=self.request.user)
+
+    def get_merged_posts(self):
+        """
+        Returns the posts merged in at read time, or None if the user
+        follows no accounts that are exempt from fan-out.
+        """
+        authors = authors_merged_at_read(self.request.user)
+        if not authors:
+            return None
+        return Post.objects.filter(owner_id__in=authors)
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginator.paginate_timeline(
+            self.get_queryset(), self.get_merged_posts(), request
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.paginator.get_paginated_response(serializer.data)
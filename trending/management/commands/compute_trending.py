@@ -0,0 +1,66 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from trending.models import TrendingCheckpoint, TrendingScore
+from trending.scoring import apply_deltas, collect_deltas
+
+
+class Command(BaseCommand):
+    """
+    Updates the trending scores; meant to run periodically (e.g. every
+    few minutes from a scheduler).
+
+    Each run only adds the activity created since the previous run, up
+    to `TRENDING_SETTLE_SECONDS` ago: rows are stamped before their
+    transaction commits, so a run stopping at `now` would skip those
+    still uncommitted and never read them again. A full rebuild restarts
+    from a fresh epoch over the last `TRENDING_WINDOW_DAYS` of activity;
+    it runs on the first run, when the epoch is older than
+    `TRENDING_REBASE_DAYS` (before scores grow too large), or with
+    `--full`. Deleted likes, comments and shares are only
+    subtracted by a full rebuild, so schedule one daily.
+    """
+    help = 'Incrementally update the trending post scores.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Rebuild every score from a fresh epoch.',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        until = now - timedelta(seconds=settings.TRENDING_SETTLE_SECONDS)
+        checkpoint = TrendingCheckpoint.objects.first()
+        full = (
+            options['full'] or
+            checkpoint is None or
+            now - checkpoint.epoch > timedelta(
+                days=settings.TRENDING_REBASE_DAYS
+            )
+        )
+        with transaction.atomic():
+            if full:
+                epoch = now
+                since = until - timedelta(
+                    days=settings.TRENDING_WINDOW_DAYS
+                )
+                TrendingScore.objects.all().delete()
+            else:
+                epoch = checkpoint.epoch
+                since = checkpoint.computed_at
+            deltas = collect_deltas(since, until, epoch)
+            apply_deltas(deltas)
+            if checkpoint is None:
+                checkpoint = TrendingCheckpoint(
+                    epoch=epoch, computed_at=until
+                )
+            checkpoint.epoch = epoch
+            checkpoint.computed_at = until
+            checkpoint.save()
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Rebuilt" if full else "Updated"} trending scores '
+            f'for {len(deltas)} posts.'
+        ))
@@ -0,0 +1,52 @@
+from django.db import models
+from posts.models import Post
+
+
+class TrendingScore(models.Model):
+    """
+    The precomputed trending score of a post.
+
+    Scores are written by the `compute_trending` management command and
+    read by the trending endpoint with a single top-K scan of the `score`
+    index.
+
+    Attributes:
+        post (OneToOneField): The scored post.
+        score (FloatField): Time-decayed sum of the post's weighted likes,
+        comments and shares, relative to the checkpoint's epoch.
+        updated_at (DateTimeField): When the score last changed.
+
+    Meta:
+        ordering: Highest score first.
+    """
+    post = models.OneToOneField(
+        Post, primary_key=True, on_delete=models.CASCADE,
+        related_name='trending_score',
+    )
+    score = models.FloatField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-score']
+
+    def __str__(self):
+        return f'{self.post_id} scored {self.score:.3f}'
+
+
+class TrendingCheckpoint(models.Model):
+    """
+    Bookkeeping for incremental trending computation; a single row.
+
+    Attributes:
+        epoch (DateTimeField): The reference time scores are expressed
+        against. Every score decays at the same rate, so scores relative
+        to a fixed epoch keep their order and only new activity has to be
+        added on each run.
+        computed_at (DateTimeField): Activity up to this time is included
+        in the scores.
+    """
+    epoch = models.DateTimeField()
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'Trending computed at {self.computed_at}'
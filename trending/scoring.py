@@ -0,0 +1,79 @@
+from collections import defaultdict
+from django.conf import settings
+from django.utils import timezone
+from comments.models import Comment
+from likes.models import Like
+from shares.models import Share
+from .models import TrendingScore
+
+"""
+Time-decayed trending scores.
+
+A like, comment or share made at time `t` contributes
+
+    weight * 2 ** ((t - epoch) / half_life)
+
+to its post's score. Relative to a fixed epoch, older activity is worth
+exponentially less than new activity, and because every score decays at
+the same rate as time passes, stored scores never need to be decayed:
+each run only adds the contributions of activity since the last run.
+
+Functions:
+    decayed_weight(weight, created_at, epoch): A single contribution.
+    collect_deltas(since, until, epoch): Score increments per post for
+                                         activity in `(since, until]`.
+    apply_deltas(deltas): Adds increments to the stored scores.
+"""
+
+ACTIVITY = (
+    (Like, 'likes'),
+    (Comment, 'comments'),
+    (Share, 'shares'),
+)
+
+
+def decayed_weight(weight, created_at, epoch):
+    hours = (created_at - epoch).total_seconds() / 3600
+    return weight * 2 ** (hours / settings.TRENDING_HALF_LIFE_HOURS)
+
+
+def collect_deltas(since, until, epoch):
+    """
+    Returns a dict mapping post IDs to the score increments of the likes,
+    comments and shares created in `(since, until]`.
+    """
+    deltas = defaultdict(float)
+    for model, kind in ACTIVITY:
+        weight = settings.TRENDING_WEIGHTS[kind]
+        events = model.objects.filter(
+            created_at__gt=since, created_at__lte=until
+        ).order_by().values_list('post_id', 'created_at')
+        for post_id, created_at in events.iterator():
+            deltas[post_id] += decayed_weight(weight, created_at, epoch)
+    return deltas
+
+
+def apply_deltas(deltas, batch_size=1000):
+    """
+    Adds `deltas` to the stored scores, creating missing rows, in batches
+    of `batch_size` posts.
+    """
+    now = timezone.now()
+    post_ids = list(deltas)
+    for start in range(0, len(post_ids), batch_size):
+        batch = post_ids[start:start + batch_size]
+        existing = TrendingScore.objects.in_bulk(batch)
+        changed = []
+        created = []
+        for post_id in batch:
+            if post_id in existing:
+                score = existing[post_id]
+                score.score += deltas[post_id]
+                score.updated_at = now
+                changed.append(score)
+            else:
+                created.append(
+                    TrendingScore(post_id=post_id, score=deltas[post_id])
+                )
+        TrendingScore.objects.bulk_update(changed, ['score', 'updated_at'])
+        TrendingScore.objects.bulk_create(created, ignore_conflicts=True)
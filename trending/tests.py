@@ -0,0 +1,105 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from likes.models import Like
+from posts.models import Post
+from .models import TrendingCheckpoint, TrendingScore
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+@override_settings(TRENDING_SETTLE_SECONDS=0)
+class TrendingTest(APITestCase):
+    """
+    Tests for computing trending scores and listing trending posts.
+    """
+
+    def setUp(self):
+        """
+        Create three users and two posts.
+        """
+        self.users = [
+            User.objects.create_user(username=f"tester{n}", password="pw")
+            for n in range(3)
+        ]
+        self.old = Post.objects.create(owner=self.users[0], event='old')
+        self.new = Post.objects.create(owner=self.users[0], event='new')
+
+    def compute(self, *args):
+        call_command('compute_trending', *args, stdout=StringIO())
+
+    def trending_events(self):
+        response = self.client.get('/posts/trending/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['event'] for post in response.data]
+
+    def test_recent_activity_outranks_older_activity(self):
+        """
+        Ensure likes from days ago are worth less than fresh likes, even
+        when there are more of them.
+        """
+        for user in self.users:
+            Like.objects.create(owner=user, post=self.old)
+        Like.objects.filter(post=self.old).update(
+            created_at=timezone.now() - timedelta(days=3)
+        )
+        Like.objects.create(owner=self.users[0], post=self.new)
+        self.compute()
+        self.assertEqual(self.trending_events(), ['new', 'old'])
+
+    def test_incremental_run_adds_new_activity(self):
+        """
+        Ensure a later run only adds the activity since the checkpoint.
+        """
+        Like.objects.create(owner=self.users[0], post=self.old)
+        self.compute()
+        first = TrendingScore.objects.get(post=self.old).score
+        Like.objects.create(owner=self.users[1], post=self.old)
+        Like.objects.create(owner=self.users[1], post=self.new)
+        self.compute()
+        self.assertGreater(TrendingScore.objects.get(post=self.old).score,
+                           first)
+        self.assertTrue(TrendingScore.objects.filter(post=self.new).exists())
+        self.assertEqual(TrendingCheckpoint.objects.count(), 1)
+
+    @override_settings(TRENDING_SETTLE_SECONDS=60)
+    def test_activity_committed_after_a_run_is_not_lost(self):
+        """
+        Ensure a like stamped before a run but committed after it is
+        counted by the next run.
+        """
+        stamped = timezone.now()
+        with mock.patch('django.utils.timezone.now',
+                        return_value=stamped + timedelta(seconds=5)):
+            self.compute()
+        like = Like.objects.create(owner=self.users[0], post=self.old)
+        Like.objects.filter(pk=like.pk).update(created_at=stamped)
+        with mock.patch('django.utils.timezone.now',
+                        return_value=stamped + timedelta(minutes=2)):
+            self.compute()
+        self.assertTrue(TrendingScore.objects.filter(post=self.old).exists())
+
+    def test_full_rebuild_drops_deleted_activity(self):
+        """
+        Ensure --full recomputes scores from the remaining activity.
+        """
+        like = Like.objects.create(owner=self.users[0], post=self.old)
+        self.compute()
+        like.delete()
+        self.compute('--full')
+        self.assertFalse(TrendingScore.objects.exists())
+        self.assertEqual(self.trending_events(), [])
+
+    def test_limit_is_capped(self):
+        """
+        Ensure the limit parameter bounds the number of posts returned.
+        """
+        Like.objects.create(owner=self.users[0], post=self.old)
+        Like.objects.create(owner=self.users[0], post=self.new)
+        self.compute()
+        response = self.client.get('/posts/trending/?limit=1')
+        self.assertEqual(len(response.data), 1)
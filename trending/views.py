@@ -0,0 +1,30 @@
+from django.conf import settings
+from rest_framework import generics, permissions
+from posts.models import Post
+from posts.serializers import PostSerializer
+
+
+class TrendingPostList(generics.ListAPIView):
+    """
+    List the top trending posts, highest score first.
+
+    - Scores are precomputed by the `compute_trending` command, so a
+      request is a single top-K scan of the score index.
+    - `?limit=` sets how many posts to return, up to
+      `TRENDING_MAX_RESULTS`.
+    """
+    serializer_class = PostSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = None
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params['limit'])
+        except (KeyError, ValueError):
+            limit = settings.TRENDING_DEFAULT_RESULTS
+        return max(1, min(limit, settings.TRENDING_MAX_RESULTS))
+
+    def get_queryset(self):
+        return Post.objects.select_related('owner__profile').filter(
+            trending_score__isnull=False
+        ).order_by('-trending_score__score')[:self.get_limit()]